@@ -1,3 +1,3 @@
-import torch
-print(torch.cuda.is_available())
-print(torch.cuda.get_device_name(0))
+import torch
+print(torch.cuda.is_available())
+print(torch.cuda.get_device_name(0))
@@ -0,0 +1,291 @@
+"""
+Agent caches
+ToolResultCache keeps Gmail tool results for a per-tool TTL, keyed on tool name and
+normalized arguments, and drops them when a write (send_email, mark_as_read) changes
+the mailbox. SemanticCache keeps final answers under an embedding of the question
+(local Ollama embeddings, cosine similarity in a small numpy index) so a rephrased
+repeat of a recent question is answered without the LLM.
+"""
+import collections
+import contextlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+# ---------------- CONFIG ----------------
+TOOL_CACHE_ENABLED = os.getenv("TOOL_CACHE", "1") == "1"
+MAX_TOOL_ENTRIES = 256
+# Seconds a result stays valid; tools not listed here are never cached
+TOOL_TTLS = {
+    "read_emails": 60,
+    "search_emails": 120,
+    "get_email_body": 3600,  # a message body never changes
+}
+# Writes and the cached tools whose results they make stale
+INVALIDATED_BY = {
+    "send_email": ["read_emails", "search_emails"],
+    "mark_as_read": ["read_emails", "search_emails"],
+}
+
+# Answers depend on the conversation, so the semantic cache is opt-in
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE", "0") == "1"
+EMBED_MODEL = os.getenv("EMBED_MODEL", "nomic-embed-text")
+SIMILARITY_THRESHOLD = 0.92  # cosine similarity needed to reuse an answer
+ANSWER_TTL = 600  # seconds
+MAX_ANSWERS = 512
+# ---------------------------------------
+
+# Results that are failures rather than data, never cached
+_FAILURES = ("An error", "Error", "Failed")
+
+
+def _normalize_arg(value):
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    return value
+
+
+def tool_key(name: str, args: tuple) -> str:
+    return name + json.dumps([_normalize_arg(arg) for arg in args], default=str)
+
+
+class ToolResultCache:
+    """
+    LRU of tool results with per-tool TTLs; get() returns None on a miss.
+
+    Each cached tool has a write generation that invalidate_after() bumps. Callers
+    take generation(name) before a read starts and pass it to put(), so a read that
+    overlapped a write can't store its pre-write result.
+    """
+
+    def __init__(self, ttls: dict = None, invalidated_by: dict = None, max_entries: int = MAX_TOOL_ENTRIES):
+        self.ttls = TOOL_TTLS if ttls is None else ttls
+        self.invalidated_by = INVALIDATED_BY if invalidated_by is None else invalidated_by
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()  # key -> (tool, result, expires_at, seconds it took)
+        self._generations = collections.Counter()  # tool -> writes that made its results stale
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.seconds_saved = 0.0
+
+    def cacheable(self, name: str) -> bool:
+        return TOOL_CACHE_ENABLED and self.ttls.get(name, 0) > 0
+
+    def get(self, name: str, args: tuple):
+        if not self.cacheable(name):
+            return None
+        key = tool_key(name, args)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.seconds_saved += entry[3]
+            return entry[1]
+
+    def generation(self, name: str) -> int:
+        """Take this before running a read and hand it to put()"""
+        with self._lock:
+            return self._generations[name]
+
+    def put(self, name: str, args: tuple, result: str, seconds: float, generation: int = None):
+        """
+        Store a result that took seconds to produce; failures and timeouts are skipped,
+        and so is a result whose read started before the latest write (generation changed)
+        """
+        if not self.cacheable(name) or not isinstance(result, str):
+            return
+        if result.startswith(_FAILURES) or "timed out" in result:
+            return
+        key = tool_key(name, args)
+        with self._lock:
+            if generation is not None and generation != self._generations[name]:
+                return
+            self._entries[key] = (name, result, time.monotonic() + self.ttls[name], seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_after(self, name: str):
+        """Drop the results a write by tool `name` made stale"""
+        stale = self.invalidated_by.get(name)
+        if not stale:
+            return
+        with self._lock:
+            for tool in stale:
+                self._generations[tool] += 1
+            keys = [key for key, entry in self._entries.items() if entry[0] in stale]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+            "invalidations": self.invalidations,
+            "seconds_saved": round(self.seconds_saved, 3),
+            "entries": len(self._entries),
+        }
+
+    def report(self) -> str:
+        return (f"[tool cache] {self.hits} hits / {self.misses} misses ({self.hit_rate:.0%}), "
+                f"{self.invalidations} invalidated, ~{self.seconds_saved:.1f}s of Gmail calls saved")
+
+
+class SemanticCache:
+    """
+    Answers indexed by unit-length question embeddings. lookup() embeds the question
+    once; put() for the same question reuses that embedding, so a miss costs one
+    embedding call and a matrix-vector product.
+
+    Args:
+        embed: callable(text) -> list of floats; defaults to Ollama's EMBED_MODEL
+        slot: optional callable returning a context manager held around each embedding
+            call, so embeddings count against a shared limit on model calls
+    """
+
+    def __init__(self, embed=None, threshold: float = SIMILARITY_THRESHOLD,
+                 ttl: float = ANSWER_TTL, max_entries: int = MAX_ANSWERS, slot=None):
+        self._embed = embed
+        self.slot = slot
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._vectors = None  # (n, dim) matrix, row i belongs to self._entries[i]
+        self._entries = []  # [question, answer, expires_at, seconds it took, last used]
+        self._pending = {}  # question -> (embedding, lookup time) until its answer is put
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self.embed_seconds = 0.0
+
+    def _embedding(self, text: str) -> np.ndarray:
+        if self._embed is None:
+            from langchain_ollama import OllamaEmbeddings
+            self._embed = OllamaEmbeddings(model=EMBED_MODEL).embed_query
+        with (self.slot() if self.slot is not None else contextlib.nullcontext()):
+            start = time.perf_counter()
+            vector = np.asarray(self._embed(text), dtype=np.float32)
+        self.embed_seconds += time.perf_counter() - start
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, question: str):
+        """The cached answer to a question close enough to this one, or None"""
+        vector = self._embedding(question)
+        now = time.monotonic()
+        with self._lock:
+            self._pending[question] = (vector, time.perf_counter())
+            if len(self._pending) > 16:  # lookups whose answers were never put
+                self._pending.pop(next(iter(self._pending)))
+            if self._vectors is not None and len(self._entries):
+                scores = self._vectors @ vector
+                best = int(np.argmax(scores))
+                entry = self._entries[best]
+                if scores[best] >= self.threshold and entry[2] >= now:
+                    entry[4] = now
+                    self.hits += 1
+                    self.seconds_saved += entry[3]
+                    del self._pending[question]
+                    return entry[1]
+            self.misses += 1
+        return None
+
+    def put(self, question: str, answer: str):
+        """Store the answer to a question that was just looked up (and missed)"""
+        if not answer:
+            return
+        with self._lock:
+            pending = self._pending.pop(question, None)
+        if pending is None:
+            vector, seconds = self._embedding(question), 0.0
+        else:
+            vector, seconds = pending[0], time.perf_counter() - pending[1]
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            self._entries.append([question, answer, now + self.ttl, seconds, now])
+            row = vector[None, :]
+            self._vectors = row if self._vectors is None else np.vstack([self._vectors, row])
+
+    def _evict(self, now: float):
+        """Drop expired answers and, when full, the least recently used one (caller holds the lock)"""
+        keep = [i for i, entry in enumerate(self._entries) if entry[2] >= now]
+        if len(keep) >= self.max_entries:
+            keep.remove(min(keep, key=lambda i: self._entries[i][4]))
+        if len(keep) != len(self._entries):
+            self._entries = [self._entries[i] for i in keep]
+            self._vectors = self._vectors[keep] if keep else None
+
+    def clear(self):
+        with self._lock:
+            self._entries = []
+            self._vectors = None
+            self._pending.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+            "seconds_saved": round(self.seconds_saved, 3),
+            "embed_seconds": round(self.embed_seconds, 3),
+            "entries": len(self._entries),
+        }
+
+    def report(self) -> str:
+        return (f"[answer cache] {self.hits} hits / {self.misses} misses ({self.hit_rate:.0%}), "
+                f"~{self.seconds_saved:.1f}s of generation saved, {self.embed_seconds:.1f}s spent embedding")
+
+
+_tool_cache = None
+_semantic_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_tool_cache() -> ToolResultCache:
+    """Get or create the shared tool result cache (singleton pattern)"""
+    global _tool_cache
+    with _cache_lock:
+        if _tool_cache is None:
+            _tool_cache = ToolResultCache()
+        return _tool_cache
+
+
+def get_semantic_cache():
+    """Get or create the shared answer cache (singleton pattern); None while SEMANTIC_CACHE is off"""
+    global _semantic_cache
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _semantic_cache is None:
+            _semantic_cache = SemanticCache()
+        return _semantic_cache
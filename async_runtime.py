@@ -0,0 +1,287 @@
+"""
+Async runtime for the assistant
+Input, LLM, TTS synthesis and playback run as separate asyncio stages joined by
+bounded queues, so a reply is generated, synthesized and played at the same time.
+Blocking engines (input(), speech_to_text, Piper, the audio device) and the turn hooks
+run in executors. Each reply is generated in its own task while the agent stage keeps
+reading input, so new input or a barge-in cancels the turn in flight.
+"""
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+
+from speech_pipeline import SentenceChunker
+import tracing
+
+# ---------------- CONFIG ----------------
+MAX_PENDING_INPUTS = 1  # utterances waiting for the agent
+MAX_PENDING_SENTENCES = 4  # sentences waiting for synthesis (backpressure on the LLM stream)
+MAX_PENDING_AUDIO = 2  # synthesized sentences waiting for playback
+EXIT_PHRASE = "go to sleep whistle!"
+# ---------------------------------------
+
+_END = object()  # end-of-turn marker that flows through the TTS stages
+
+
+class Turn:
+    """One user input and the reply being produced for it"""
+
+    def __init__(self, number: int, text: str, trace_turn: int = None):
+        self.number = number
+        self.text = text
+        self.trace_turn = trace_turn  # tracing turn, for the stages that serve every turn
+        self.started_at = time.perf_counter()
+        self.first_token_at = None
+        self.first_audio_at = None
+        self.cancelled = False
+        self.done = asyncio.Event()
+
+    def report(self) -> str:
+        def since(t):
+            return f"{t - self.started_at:.2f}s" if t else "n/a"
+        return (f"[latency] first token {since(self.first_token_at)}, "
+                f"first audio {since(self.first_audio_at)}, "
+                f"turn {time.perf_counter() - self.started_at:.2f}s")
+
+
+class AssistantRuntime:
+    """
+    Args:
+        app: the compiled LangGraph agent (uses app.astream)
+        listen: blocking callable() -> str, e.g. input() or speech_to_text()
+        synthesize: blocking callable(text) -> PCM bytes
+        play_audio: callable(pcm) that queues audio on the streaming player
+        wait_for_playback: blocking callable() that returns once queued audio has played
+        stop_playback: callable() that silences the player immediately
+        listen_while_speaking: keep listening during replies (text input, or voice with
+            barge-in); otherwise the next listen() starts once the reply has finished
+        on_turn_start / on_turn_end: optional hooks, e.g. to start and stop barge-in monitoring
+        is_exit: optional callable(text) -> bool; defaults to comparing with EXIT_PHRASE
+        on_history: optional callable(history) called once a turn's messages are in the history
+        turn_log: optional callable() -> str printed after each turn
+    """
+
+    def __init__(self, app, listen, synthesize, play_audio, wait_for_playback, stop_playback,
+                 listen_while_speaking: bool = True, on_turn_start=None, on_turn_end=None,
+                 is_exit=None, turn_log=None, on_history=None):
+        self.app = app
+        self.listen = listen
+        self.synthesize = synthesize
+        self.play_audio = play_audio
+        self.wait_for_playback = wait_for_playback
+        self.stop_playback = stop_playback
+        self.listen_while_speaking = listen_while_speaking
+        self.on_turn_start = on_turn_start
+        self.on_turn_end = on_turn_end
+        self.is_exit = is_exit or (lambda text: text.lower() == EXIT_PHRASE)
+        self.turn_log = turn_log
+        self.on_history = on_history
+
+        self.history = []
+        self.current = None
+        self._generating = None  # task running _generate for the current turn
+        self._turns = 0
+        self._ready_for_input = threading.Event()
+        self._ready_for_input.set()
+        # Dedicated pools: TTS and playback never wait behind a blocked input() call
+        self._tts_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
+        self._play_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="playback")
+
+    # ---------------- public ----------------
+
+    async def run(self, first_input: str = None):
+        """Run until the exit phrase is heard; first_input is handled before anything is read from listen()"""
+        self.loop = asyncio.get_running_loop()
+        self.inputs = asyncio.Queue(maxsize=MAX_PENDING_INPUTS)
+        self.sentences = asyncio.Queue(maxsize=MAX_PENDING_SENTENCES)
+        self.audio = asyncio.Queue(maxsize=MAX_PENDING_AUDIO)
+        self._stopping = asyncio.Event()
+
+        if first_input and first_input.strip():
+            self.inputs.put_nowait(first_input.strip())
+            if not self.listen_while_speaking:
+                self._ready_for_input.clear()
+        # input() and the mic block without a way to interrupt them, so the
+        # listener is a daemon thread rather than an executor task
+        threading.Thread(target=self._listen_worker, daemon=True).start()
+
+        stages = [
+            asyncio.create_task(self._agent_stage()),
+            asyncio.create_task(self._synth_stage()),
+            asyncio.create_task(self._play_stage()),
+        ]
+        await self._stopping.wait()
+        for task in stages:
+            task.cancel()
+        await asyncio.gather(*stages, return_exceptions=True)
+        self.stop_playback()
+        self._tts_executor.shutdown(wait=False, cancel_futures=True)
+        self._play_executor.shutdown(wait=False, cancel_futures=True)
+
+    def interrupt(self):
+        """Cancel the turn in flight; safe to call from any thread (e.g. a barge-in monitor)"""
+        self.loop.call_soon_threadsafe(self._cancel_current)
+
+    # ---------------- stages ----------------
+
+    def _listen_worker(self):
+        while not self._stopping.is_set():
+            self._ready_for_input.wait()
+            text = self.listen()
+            if text is None or not text.strip():
+                continue
+            if not self.listen_while_speaking:
+                self._ready_for_input.clear()
+            # Blocks this thread while the agent is busy with earlier input (backpressure)
+            asyncio.run_coroutine_threadsafe(self.inputs.put(text.strip()), self.loop).result()
+
+    async def _agent_stage(self):
+        try:
+            while True:
+                text = await self.inputs.get()
+                # New input supersedes whatever is still being generated or said; the
+                # cancelled turn's history is settled before the next one starts
+                self._cancel_current()
+                if self._generating is not None:
+                    await asyncio.gather(self._generating, return_exceptions=True)
+                    self._generating = None
+                if self.is_exit(text):
+                    print("\nAssistant: Goodbye! Have a great day!")
+                    self._stopping.set()
+                    return
+
+                self._turns += 1
+                turn = Turn(self._turns, text, tracing.start_turn())
+                self.current = turn
+                if self.on_turn_start is not None:
+                    await self.loop.run_in_executor(None, self.on_turn_start)
+                self._generating = asyncio.create_task(self._run_turn(turn))
+        finally:
+            if self._generating is not None:
+                self._generating.cancel()
+
+    async def _run_turn(self, turn: Turn):
+        try:
+            await self._generate(turn)
+        except asyncio.CancelledError:
+            if not turn.cancelled:
+                raise
+        except Exception as e:
+            print(f"\nError: {str(e)}\n")
+            print("Please try again.\n")
+        # A cancelled turn still sends its end marker: _finish runs on_turn_end and reopens input.
+        # _cancel_current cancels a turn once, so a second put can't be interrupted by it
+        try:
+            await self.sentences.put((turn, _END))
+        except asyncio.CancelledError:
+            if not turn.cancelled:
+                raise
+            await self.sentences.put((turn, _END))
+
+    async def _generate(self, turn: Turn):
+        self.history.append(HumanMessage(content=turn.text))
+        chunker = SentenceChunker()
+        final_state = None
+        partial = []
+
+        with tracing.span("agent", chars=len(turn.text), streaming=True) as span:
+            try:
+                async for mode, chunk in self.app.astream({"messages": self.history},
+                                                          stream_mode=["messages", "values"]):
+                    if mode == "messages":
+                        message, metadata = chunk
+                        if (isinstance(message, AIMessageChunk) and message.content
+                                and metadata.get("langgraph_node") == "our_agent"):
+                            if turn.first_token_at is None:
+                                turn.first_token_at = time.perf_counter()
+                                print("\nAssistant: ", end="", flush=True)
+                            print(message.content, end="", flush=True)
+                            partial.append(message.content)
+                            for sentence in chunker.feed(message.content):
+                                await self.sentences.put((turn, sentence))
+                    else:
+                        final_state = chunk
+                        partial = []
+            except asyncio.CancelledError:
+                # _cancel_current() cancels this task; keep what was generated so far.
+                # Any other cancellation (shutdown) propagates
+                if not turn.cancelled:
+                    raise
+                span.set(interrupted=True)
+        print("\n")
+
+        if final_state is not None:
+            self.history = list(final_state["messages"])
+        if partial:
+            self.history.append(AIMessage(content="".join(partial)))
+        if self.on_history is not None:
+            self.on_history(self.history)
+
+        if not turn.cancelled:
+            tail = chunker.flush()
+            if turn.first_token_at is None and self.history and self.history[-1].content:
+                # Nothing was streamed (e.g. the turn ended on a tool call), speak the final message
+                tail = self.history[-1].content
+                print(f"Assistant: {tail}\n")
+            if tail:
+                await self.sentences.put((turn, tail))
+
+    async def _synth_stage(self):
+        while True:
+            turn, sentence = await self.sentences.get()
+            if sentence is not _END and not turn.cancelled:
+                try:
+                    audio = await self.loop.run_in_executor(self._tts_executor,
+                                                            tracing.bind(self.synthesize, turn.trace_turn), sentence)
+                except Exception as e:
+                    print(f"Error during TTS: {e}")
+                    continue
+                if audio and not turn.cancelled:
+                    await self.audio.put((turn, audio))
+            elif sentence is _END:
+                await self.audio.put((turn, _END))
+
+    async def _play_stage(self):
+        while True:
+            turn, audio = await self.audio.get()
+            if audio is _END:
+                if not turn.cancelled:
+                    await self.loop.run_in_executor(self._play_executor, self.wait_for_playback)
+                await self._finish(turn)
+                continue
+            if turn.cancelled:
+                continue
+            if turn.first_audio_at is None:
+                turn.first_audio_at = time.perf_counter()
+            # play_audio only blocks when the ring buffer is full
+            await self.loop.run_in_executor(self._play_executor, self.play_audio, audio)
+
+    # ---------------- turn bookkeeping ----------------
+
+    def _cancel_current(self):
+        turn = self.current
+        if turn is None or turn.done.is_set() or turn.cancelled:
+            return
+        turn.cancelled = True
+        if self._generating is not None:
+            self._generating.cancel()
+        self.stop_playback()
+        # Sentences and audio of a cancelled turn are skipped by the stages as they come through
+        print("\n[interrupted]")
+
+    async def _finish(self, turn: Turn):
+        if turn.done.is_set():
+            return
+        turn.done.set()
+        if self.on_turn_end is not None:
+            # May block (stop_monitoring joins the barge-in thread), keep it off the loop
+            await self.loop.run_in_executor(None, self.on_turn_end)
+        if not turn.cancelled:
+            print(turn.report())
+            if self.turn_log is not None:
+                print(self.turn_log())
+            print()
+        self._ready_for_input.set()
@@ -0,0 +1,141 @@
+"""
+Shared streaming audio playback for the TTS backends
+PCM chunks go into a ring buffer that a callback-driven sounddevice stream drains,
+so playback starts with the first chunk and queued chunks play back to back without gaps
+"""
+import threading
+
+import numpy as np
+
+# ---------------- CONFIG ----------------
+RING_SECONDS = 30  # how much synthesized audio may be queued ahead of the speaker
+BLOCK_SIZE = 256  # frames per device callback (~11 ms at 22.05 kHz)
+# ---------------------------------------
+
+
+class StreamingPlayer:
+    """
+    Ring buffer of 16-bit mono PCM played by a sounddevice.OutputStream callback.
+
+    write() returns as soon as the samples are queued (it only blocks when the
+    ring is full), wait() blocks until everything written so far has been played.
+    """
+
+    def __init__(self, sample_rate: int, ring_seconds: float = RING_SECONDS, block_size: int = BLOCK_SIZE):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self._ring = np.zeros(int(sample_rate * ring_seconds), dtype=np.int16)
+        self._read_pos = 0
+        self._write_pos = 0
+        self._count = 0
+        self._generation = 0
+
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._drained = threading.Event()
+        self._drained.set()
+        self._stream = None
+
+    def start(self):
+        """Open the output device now instead of on the first write()"""
+        self._ensure_stream()
+
+    def _ensure_stream(self):
+        if self._stream is not None:
+            return
+        import sounddevice as sd
+
+        # Kept open for the whole session so each utterance doesn't pay device start-up
+        self._stream = sd.OutputStream(
+            samplerate=self.sample_rate,
+            channels=1,
+            dtype="int16",
+            blocksize=self.block_size,
+            latency="low",
+            callback=self._callback
+        )
+        self._stream.start()
+
+    def _callback(self, outdata, frames, time_info, status):
+        out = outdata[:, 0]
+        with self._lock:
+            n = min(frames, self._count)
+            first = min(n, len(self._ring) - self._read_pos)
+            out[:first] = self._ring[self._read_pos:self._read_pos + first]
+            out[first:n] = self._ring[:n - first]
+            self._read_pos = (self._read_pos + n) % len(self._ring)
+            self._count -= n
+            if n:
+                self._not_full.notify_all()
+            if self._count == 0:
+                self._drained.set()
+        # Underrun (or idle): pad with silence
+        out[n:] = 0
+
+    def write(self, pcm) -> bool:
+        """
+        Queue raw int16 PCM (bytes or ndarray) for playback.
+
+        Returns False if stop() was called while waiting for ring space.
+        """
+        samples = np.frombuffer(pcm, dtype=np.int16) if isinstance(pcm, (bytes, bytearray, memoryview)) else pcm
+        if len(samples) == 0:
+            return True
+        self._ensure_stream()
+
+        offset = 0
+        with self._lock:
+            generation = self._generation
+            while offset < len(samples):
+                while self._count == len(self._ring):
+                    self._not_full.wait()
+                    if self._generation != generation:
+                        return False
+                n = min(len(samples) - offset, len(self._ring) - self._count)
+                first = min(n, len(self._ring) - self._write_pos)
+                self._ring[self._write_pos:self._write_pos + first] = samples[offset:offset + first]
+                self._ring[:n - first] = samples[offset + first:offset + n]
+                self._write_pos = (self._write_pos + n) % len(self._ring)
+                self._count += n
+                offset += n
+                self._drained.clear()
+        return True
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until every queued sample has been played (signalled by the callback, no polling)"""
+        return self._drained.wait(timeout)
+
+    def is_playing(self) -> bool:
+        return not self._drained.is_set()
+
+    def stop(self):
+        """Drop everything still queued; the device goes silent on its next callback"""
+        with self._lock:
+            self._read_pos = self._write_pos = self._count = 0
+            self._generation += 1
+            self._not_full.notify_all()
+            self._drained.set()
+
+    def play(self, pcm):
+        """Queue the PCM and block until it has been played"""
+        self.write(pcm)
+        self.wait()
+
+    def close(self):
+        self.stop()
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+_players = {}
+_players_lock = threading.Lock()
+
+
+def get_player(sample_rate: int) -> StreamingPlayer:
+    """Get or create the shared player for a sample rate (singleton per rate)"""
+    with _players_lock:
+        if sample_rate not in _players:
+            _players[sample_rate] = StreamingPlayer(sample_rate)
+        return _players[sample_rate]
@@ -0,0 +1,140 @@
+"""
+Barge-in support: a shared, always-open microphone
+While the assistant is talking the mic keeps running through webrtcvad with an
+echo-aware gate; when the user starts speaking the TTS is cancelled and the
+captured audio is handed to the next speech_to_text() call without losing frames
+"""
+import collections
+import queue
+import threading
+import time
+
+import numpy as np
+import sounddevice as sd
+import webrtcvad
+
+from speechtotext import SAMPLE_RATE, FRAME_DURATION, FRAME_SIZE, VAD_MODE, FramePreprocessor
+
+# ---------------- CONFIG ----------------
+BARGE_IN_FRAMES = 3  # consecutive voiced frames needed to interrupt (90 ms)
+PRE_ROLL_MS = 300  # audio kept from before the trigger so the onset isn't clipped
+ECHO_MIN_RMS = 300.0  # int16 RMS a frame needs to count as the user while TTS plays
+ECHO_RATIO = 2.0  # ...and it must be this many times louder than the running echo level
+ECHO_SMOOTHING = 0.05  # EMA factor for the echo level estimate
+# ---------------------------------------
+
+
+class MicCapture:
+    """
+    Microphone stream that runs for the whole voice session.
+
+    The device callback only queues frames, so nothing is dropped while the
+    consumer switches between barge-in monitoring and speech_to_text().
+    """
+
+    def __init__(self):
+        self._frames = queue.Queue()
+        self._handover = collections.deque()
+        self._stream = None
+        self._monitor_thread = None
+        self._monitoring = threading.Event()
+        self.triggered = threading.Event()
+        self.triggered_at = None
+
+    def start(self):
+        if self._stream is not None:
+            return
+        self._stream = sd.RawInputStream(
+            samplerate=SAMPLE_RATE,
+            blocksize=FRAME_SIZE,
+            dtype="int16",
+            channels=1,
+            callback=self._callback
+        )
+        self._stream.start()
+
+    def close(self):
+        self.stop_monitoring()
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+    def _callback(self, indata, frames, time_info, status):
+        self._frames.put(bytes(indata))
+
+    def read(self) -> bytes:
+        """Next frame for speech_to_text(): handed-over audio first, then live audio"""
+        if self._handover:
+            return self._handover.popleft()
+        return self._frames.get()
+
+    # ---------------- barge-in monitoring ----------------
+
+    def start_monitoring(self, is_playing, on_barge_in):
+        """
+        Watch the mic in the background while the assistant responds.
+
+        Args:
+            is_playing: callable() -> bool, True while TTS audio is coming out of the speaker
+            on_barge_in: callable() run once, on the monitor thread, when the user interrupts
+        """
+        self.stop_monitoring()
+        self._handover.clear()
+        self.triggered.clear()
+        self.triggered_at = None
+        self._monitoring.set()
+        self._monitor_thread = threading.Thread(
+            target=self._monitor, args=(is_playing, on_barge_in), daemon=True
+        )
+        self._monitor_thread.start()
+
+    def stop_monitoring(self) -> bool:
+        """Stop watching; returns True if the user barged in"""
+        self._monitoring.clear()
+        if self._monitor_thread is not None:
+            self._monitor_thread.join()
+            self._monitor_thread = None
+        return self.triggered.is_set()
+
+    def _monitor(self, is_playing, on_barge_in):
+        vad = webrtcvad.Vad(VAD_MODE)
+        preprocessor = FramePreprocessor()
+        pre_roll = collections.deque(maxlen=int(PRE_ROLL_MS / FRAME_DURATION))
+        echo_rms = 0.0
+        voiced_run = 0
+
+        while self._monitoring.is_set():
+            try:
+                frame = self._frames.get(timeout=0.05)
+            except queue.Empty:
+                continue
+
+            raw_int16 = np.frombuffer(frame, dtype=np.int16)
+            is_speech = vad.is_speech(preprocessor.process(raw_int16), SAMPLE_RATE)
+
+            if is_playing():
+                # Echo-aware gate: the speaker output leaks into the mic, so the
+                # user must be clearly louder than the echo we've been hearing
+                rms = float(np.sqrt(np.mean(raw_int16.astype(np.float32) ** 2)))
+                gate = max(ECHO_MIN_RMS, echo_rms * ECHO_RATIO)
+                if is_speech and rms > gate:
+                    voiced_run += 1
+                else:
+                    voiced_run = 0
+                    echo_rms += ECHO_SMOOTHING * (rms - echo_rms)
+            else:
+                voiced_run = voiced_run + 1 if is_speech else 0
+
+            pre_roll.append(frame)
+
+            if voiced_run >= BARGE_IN_FRAMES:
+                self.triggered_at = time.perf_counter()
+                self.triggered.set()
+                on_barge_in()
+                break
+
+        if self.triggered.is_set():
+            # Hand the onset to the next turn, later frames are still in the live queue
+            self._handover.extend(pre_roll)
+        self._monitoring.clear()
@@ -0,0 +1,133 @@
+"""
+ASR backend benchmark: real-time factor and WER on a fixed set of WAV fixtures
+
+Fixtures are pairs of files in the fixtures directory:
+    hello.wav  - 16 kHz mono 16-bit PCM (other rates are resampled)
+    hello.txt  - reference transcript
+benchmarks/fixtures ships the transcripts; make_fixtures.py synthesizes the WAVs
+(or record your own with the same names).
+
+Usage:
+    python benchmarks/make_fixtures.py
+    python benchmarks/asr_benchmark.py
+    python benchmarks/asr_benchmark.py --configs openai-whisper:float32 faster-whisper:int8 --runs 3
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcriber import SAMPLE_RATE, get_transcriber  # noqa: E402
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+DEFAULT_CONFIGS = ["openai-whisper:auto", "faster-whisper:int8"]
+
+
+def load_wav(path: str) -> np.ndarray:
+    """Read a 16-bit PCM WAV as 16 kHz mono float32"""
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16-bit PCM")
+        rate = wav.getframerate()
+        channels = wav.getnchannels()
+        audio = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+
+    audio = audio.reshape(-1, channels).mean(axis=1).astype(np.float32) / 32768.0
+    if rate != SAMPLE_RATE:
+        n = int(len(audio) * SAMPLE_RATE / rate)
+        audio = np.interp(np.linspace(0, len(audio) - 1, n), np.arange(len(audio)), audio).astype(np.float32)
+    return audio
+
+
+def load_fixtures(directory: str) -> list:
+    """Return [(name, audio, reference_text)] for every .wav with a matching .txt"""
+    fixtures = []
+    for wav_path in sorted(glob.glob(os.path.join(directory, "*.wav"))):
+        txt_path = os.path.splitext(wav_path)[0] + ".txt"
+        if not os.path.exists(txt_path):
+            print(f"Skipping {wav_path}: no reference transcript")
+            continue
+        with open(txt_path, encoding="utf-8") as f:
+            fixtures.append((os.path.basename(wav_path), load_wav(wav_path), f.read().strip()))
+    return fixtures
+
+
+def _words(text: str) -> list:
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """Word-level Levenshtein distance divided by the reference length"""
+    ref, hyp = _words(reference), _words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (r != h))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def benchmark_config(backend: str, compute_type: str, model_size: str, fixtures: list, runs: int) -> dict:
+    engine = get_transcriber(model_size, compute_type=compute_type, backend=backend)
+
+    audio_seconds = 0.0
+    inference_seconds = 0.0
+    errors = []
+    for name, audio, reference in fixtures:
+        for _ in range(runs):
+            hypothesis = engine.transcribe(audio, condition_on_previous_text=False)
+            audio_seconds += engine.last_audio_seconds
+            inference_seconds += engine.last_inference_seconds
+        errors.append(word_error_rate(reference, hypothesis))
+
+    return {
+        "backend": backend,
+        "compute_type": engine.compute_type,
+        "model_size": model_size,
+        "device": engine.device,
+        "load_seconds": round(engine.load_seconds, 3),
+        "audio_seconds": round(audio_seconds, 3),
+        "inference_seconds": round(inference_seconds, 3),
+        "rtf": round(inference_seconds / audio_seconds, 4) if audio_seconds else None,
+        "wer": round(float(np.mean(errors)), 4) if errors else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="directory of .wav/.txt pairs")
+    parser.add_argument("--configs", nargs="+", default=DEFAULT_CONFIGS, help="backend:compute_type entries")
+    parser.add_argument("--model-size", default="small")
+    parser.add_argument("--runs", type=int, default=1, help="transcriptions per fixture")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        sys.exit(f"No fixtures found in {args.fixtures}; run benchmarks/make_fixtures.py to synthesize them")
+
+    results = []
+    for config in args.configs:
+        backend, _, compute_type = config.partition(":")
+        result = benchmark_config(backend, compute_type or "auto", args.model_size, fixtures, args.runs)
+        results.append(result)
+        print(f"{backend:15} {result['compute_type']:8} RTF {result['rtf']:.3f}  "
+              f"WER {result['wer']:.2%}  load {result['load_seconds']:.1f}s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
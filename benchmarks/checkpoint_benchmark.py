@@ -0,0 +1,139 @@
+"""
+Session checkpoint benchmark
+
+Grows a synthetic conversation turn by turn (a user message, sometimes a tool call
+and its result, then the reply), saving a checkpoint after every turn and folding
+older turns into a summary the way context_window does. Reports:
+    write      per-turn save latency, early turns vs. late turns (should be flat)
+    rewrite    the same turns saved by rewriting the whole history as one JSON blob
+    restore    latency to resume the session (tail after the summary, and full)
+    size       database bytes and bytes per message
+
+Usage:
+    python benchmarks/checkpoint_benchmark.py --turns 2000
+    python benchmarks/checkpoint_benchmark.py --turns 5000 --summary-every 40 --output checkpoint.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage, message_to_dict  # noqa: E402
+
+from checkpoint import Checkpointer  # noqa: E402
+
+PERCENTILES = [50, 95, 99]
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {}
+    values = np.asarray(values, dtype=np.float64) * 1000  # ms
+    summary = {f"p{p}_ms": round(float(np.percentile(values, p)), 4) for p in PERCENTILES}
+    summary.update(mean_ms=round(float(values.mean()), 4), n=int(len(values)))
+    return summary
+
+
+def make_turn(turn: int, reply_chars: int) -> list:
+    messages = [HumanMessage(content=f"Question {turn}: what should I know about item {turn}?")]
+    if turn % 4 == 0:
+        call_id = f"call_{turn}"
+        messages.append(AIMessage(content="", tool_calls=[
+            {"name": "read_emails", "args": {"max_results": 5}, "id": call_id}
+        ]))
+        messages.append(ToolMessage(content="From: someone\nSubject: update\n" * 5, tool_call_id=call_id))
+    messages.append(AIMessage(content=(f"Here is what I found about item {turn}. " * 40)[:reply_chars]))
+    return messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--summary-every", type=int, default=25, help="turns between summaries")
+    parser.add_argument("--keep-turns", type=int, default=6, help="recent turns left out of each summary")
+    parser.add_argument("--reply-chars", type=int, default=400)
+    parser.add_argument("--restores", type=int, default=20)
+    parser.add_argument("--output", help="write config and results as JSON")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="checkpoint-bench-")
+    path = os.path.join(directory, "sessions.sqlite3")
+    checkpointer = Checkpointer(path)
+    blob_path = os.path.join(directory, "history.json")
+
+    history = []
+    turn_starts = []  # index of each turn's HumanMessage
+    summary, summarized_upto = "", 0
+    writes, rewrites = [], []
+    for turn in range(args.turns):
+        turn_starts.append(len(history))
+        history.extend(make_turn(turn, args.reply_chars))
+        if turn and turn % args.summary_every == 0:
+            summarized_upto = turn_starts[turn - args.keep_turns]
+            summary = f"Summary of the conversation up to turn {turn - args.keep_turns}. " * 10
+
+        start = time.perf_counter()
+        checkpointer.save(history, "bench", summary, summarized_upto)
+        writes.append(time.perf_counter() - start)
+
+        # Naive alternative: rewrite everything every turn (only sampled, it's quadratic)
+        if turn % 50 == 0 or turn == args.turns - 1:
+            start = time.perf_counter()
+            with open(blob_path, "w") as f:
+                json.dump([message_to_dict(m) for m in history], f)
+            rewrites.append((turn, time.perf_counter() - start))
+
+    tail_restores, full_restores = [], []
+    for _ in range(args.restores):
+        fresh = Checkpointer(path)  # cold connection, like a restart
+        checkpoint = fresh.restore("bench")
+        tail_restores.append(checkpoint.restore_seconds)
+        full_restores.append(fresh.restore("bench", full=True).restore_seconds)
+        fresh.close()
+    tail_messages = len(checkpoint.history)
+
+    window = max(1, min(200, args.turns // 10))
+    size = checkpointer.size_bytes()
+    results = {
+        "messages": len(history),
+        "write_first_turns": percentiles(writes[:window]),
+        "write_last_turns": percentiles(writes[-window:]),
+        "rewrite_first_ms": round(rewrites[0][1] * 1000, 4),
+        "rewrite_last_ms": round(rewrites[-1][1] * 1000, 4),
+        "restore_tail": percentiles(tail_restores),
+        "restore_tail_messages": tail_messages,
+        "restore_full": percentiles(full_restores),
+        "db_bytes": size,
+        "bytes_per_message": round(size / len(history), 1),
+    }
+
+    print(f"{args.turns} turns, {len(history)} messages, database {size / 1024:.0f} KiB "
+          f"({results['bytes_per_message']:.0f} B/message)")
+    for name in ("write_first_turns", "write_last_turns"):
+        r = results[name]
+        print(f"  {name:18} p50 {r['p50_ms']:.3f} ms  p95 {r['p95_ms']:.3f} ms")
+    print(f"  {'full rewrite':18} {results['rewrite_first_ms']:.3f} ms at turn 0 -> "
+          f"{results['rewrite_last_ms']:.3f} ms at turn {rewrites[-1][0]}")
+    print(f"  {'restore (tail)':18} p50 {results['restore_tail']['p50_ms']:.3f} ms  ({tail_messages} messages + summary)")
+    print(f"  {'restore (full)':18} p50 {results['restore_full']['p50_ms']:.3f} ms  ({len(history)} messages)")
+
+    checkpointer.close()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "config": vars(args),
+                "platform": {"python": platform.python_version(), "machine": platform.machine()},
+                "results": results,
+            }, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
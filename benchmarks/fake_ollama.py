@@ -0,0 +1,176 @@
+"""
+Fake Ollama server for offline benchmarks
+
+Answers /api/chat with a canned reply, streamed as NDJSON one word at a time
+with a configurable time to first token and per-token delay, so the agent
+and TTS paths can be timed without a model or a GPU.
+
+Usage (standalone):
+    python benchmarks/fake_ollama.py --port 11435
+    OLLAMA_HOST=http://127.0.0.1:11435 python main2.py
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = ("Sure, I can help with that. Your next meeting is at three in the afternoon. "
+                 "Would you like me to send a reminder to the team?")
+
+
+class FakeOllama:
+    """
+    Threaded HTTP server speaking enough of the Ollama API for ChatOllama.
+
+    Args:
+        reply: text every /api/chat request answers with
+        first_token_delay: seconds before the first token (prompt evaluation)
+        token_delay: seconds between tokens (generation speed)
+        parallel: chats generated at once, further requests wait (0 = no limit)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, reply: str = DEFAULT_REPLY,
+                 first_token_delay: float = 0.15, token_delay: float = 0.02, parallel: int = 0):
+        self.reply = reply
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.requests = 0
+        self._lock = threading.Lock()
+        # Like OLLAMA_NUM_PARALLEL: at most this many chats are generated at once (0 = no limit)
+        self._slots = threading.BoundedSemaphore(parallel) if parallel else None
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, payload: dict):
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.startswith("/api/tags"):
+                    self._json({"models": [{"name": "fake", "model": "fake"}]})
+                elif self.path.startswith("/api/version"):
+                    self._json({"version": "0.0.0-fake"})
+                else:
+                    self._json({})
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                with fake._lock:
+                    fake.requests += 1
+
+                if self.path.startswith("/api/chat"):
+                    if fake._slots is None:
+                        self._chat(request)
+                    else:
+                        with fake._slots:
+                            self._chat(request)
+                else:
+                    self._json({})
+
+            def _chat(self, request: dict):
+                model = request.get("model", "fake")
+                tokens = [w + " " for w in fake.reply.split(" ")]
+                options = request.get("options") or {}
+                if options.get("num_predict"):
+                    tokens = tokens[:options["num_predict"]]
+                started = time.perf_counter()
+                time.sleep(fake.first_token_delay)
+
+                def line(content: str, done: bool) -> dict:
+                    payload = {
+                        "model": model,
+                        "created_at": datetime.now(timezone.utc).isoformat(),
+                        "message": {"role": "assistant", "content": content},
+                        "done": done,
+                    }
+                    if done:
+                        payload.update({
+                            "done_reason": "stop",
+                            "total_duration": int((time.perf_counter() - started) * 1e9),
+                            "prompt_eval_count": sum(len(str(m.get("content", ""))) // 4
+                                                     for m in request.get("messages", [])),
+                            "prompt_eval_duration": int(fake.first_token_delay * 1e9),
+                            "eval_count": len(tokens),
+                            "eval_duration": int(fake.token_delay * len(tokens) * 1e9),
+                        })
+                    return payload
+
+                if request.get("stream") is False:
+                    time.sleep(fake.token_delay * len(tokens))
+                    self._json(line("".join(tokens).strip(), True))
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i, token in enumerate(tokens):
+                    if i:
+                        time.sleep(fake.token_delay)
+                    self._chunk(json.dumps(line(token, False)) + "\n")
+                self._chunk(json.dumps(line("", True)) + "\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _chunk(self, text: str):
+                data = text.encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--first-token-delay", type=float, default=0.15)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--parallel", type=int, default=0, help="like OLLAMA_NUM_PARALLEL, 0 = no limit")
+    args = parser.parse_args()
+
+    server = FakeOllama(port=args.port, first_token_delay=args.first_token_delay, token_delay=args.token_delay,
+                        parallel=args.parallel)
+    print(f"Fake Ollama listening on {server.url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Generate the WAV fixtures used by asr_benchmark.py and vad_frame_benchmark.py
+
+benchmarks/fixtures/ ships the reference transcripts; this script speaks each one
+with a TTS backend of the assistant and writes the WAV next to it:
+    fixtures/weather.txt  - reference transcript (shipped)
+    fixtures/weather.wav  - mono 16-bit PCM at the backend's rate, with a little
+                            silence before and after (the benchmarks resample to 16 kHz)
+
+Existing WAVs are kept unless --force is given. A recording of your own voice
+with a matching .txt works just as well and gives more realistic WER figures.
+
+Usage:
+    python benchmarks/make_fixtures.py                      # Piper
+    python benchmarks/make_fixtures.py --backend google     # Google Cloud TTS
+"""
+import argparse
+import glob
+import os
+import sys
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PAD_SECONDS = 0.5  # silence around the speech, so the VAD sees an onset and an endpoint
+
+
+def get_backend(name: str):
+    """(synthesize, sample_rate) of a TTS backend"""
+    if name == "piper":
+        import texttospeech_piper as backend
+    elif name == "google":
+        import texttospeech as backend
+    else:
+        raise ValueError(f"unknown TTS backend {name!r}")
+    return backend.synthesize, backend.SAMPLE_RATE
+
+
+def write_wav(path: str, pcm: bytes, sample_rate: int):
+    silence = bytes(2 * int(PAD_SECONDS * sample_rate))
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(silence + pcm + silence)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="directory of .txt reference transcripts")
+    parser.add_argument("--backend", choices=["piper", "google"], default="piper")
+    parser.add_argument("--force", action="store_true", help="regenerate WAVs that already exist")
+    args = parser.parse_args()
+
+    references = sorted(glob.glob(os.path.join(args.fixtures, "*.txt")))
+    if not references:
+        sys.exit(f"No reference transcripts (.txt) in {args.fixtures}")
+
+    synthesize, sample_rate = get_backend(args.backend)
+    failed = 0
+    for txt_path in references:
+        wav_path = os.path.splitext(txt_path)[0] + ".wav"
+        if os.path.exists(wav_path) and not args.force:
+            print(f"{os.path.basename(wav_path)}: exists, skipped")
+            continue
+        with open(txt_path, encoding="utf-8") as f:
+            text = f.read().strip()
+        pcm = synthesize(text)
+        if not pcm:
+            print(f"{os.path.basename(wav_path)}: synthesis failed")
+            failed += 1
+            continue
+        write_wav(wav_path, pcm, sample_rate)
+        print(f"{os.path.basename(wav_path)}: {len(pcm) / 2 / sample_rate:.1f}s of speech")
+
+    if failed:
+        sys.exit(f"{failed} fixture(s) could not be synthesized")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Multi-session server load benchmark
+
+Starts the agent server against a fake Ollama server, then runs synthetic clients:
+each opens a session and sends --turns chat requests back to back, reading the
+NDJSON stream. Runs offline; no model, GPU or audio device needed.
+
+Reported (seconds):
+    first_token  request sent -> first token event received
+    turn         request sent -> stream finished
+plus throughput (turns/s over the whole run) and the server's Ollama queue stats.
+
+Usage:
+    python benchmarks/server_load_benchmark.py --clients 16 --turns 5
+    python benchmarks/server_load_benchmark.py --clients 32 --llm-workers 4 --ollama-parallel 4 --output load.json
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_ollama import FakeOllama  # noqa: E402
+
+PERCENTILES = [50, 90, 95, 99]
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {}
+    values = np.asarray(values, dtype=np.float64)
+    summary = {f"p{p}": round(float(np.percentile(values, p)), 4) for p in PERCENTILES}
+    summary.update(mean=round(float(values.mean()), 4), max=round(float(values.max()), 4), n=int(len(values)))
+    return summary
+
+
+def start_server(llm_workers: int):
+    """Run an AgentServer on its own event loop thread; returns (server, port)"""
+    import server as agent_server
+
+    ready = threading.Event()
+    result = {}
+
+    def run():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        instance = agent_server.AgentServer(llm_limit=llm_workers)
+        result["server"] = instance
+        result["port"] = loop.run_until_complete(instance.start("127.0.0.1", 0))[1]
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True, name="agent-server").start()
+    ready.wait()
+    return result["server"], result["port"]
+
+
+def run_client(port: int, client: int, turns: int, think: float) -> list:
+    """One synthetic user; returns a {first_token, turn, error} record per turn"""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    connection.request("POST", "/sessions")
+    session = json.loads(connection.getresponse().read())["session"]
+    records = []
+    for turn in range(turns):
+        # Distinct questions, so neither the intent router nor the answer cache short-circuits them
+        body = json.dumps({"text": f"Client {client} asks question {turn}: tell me about topic {client * turns + turn}"})
+        start = time.perf_counter()
+        connection.request("POST", f"/sessions/{session}/chat", body=body,
+                           headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        first_token = None
+        error = None
+        for line in response:
+            event = json.loads(line)
+            if event["type"] == "token" and first_token is None:
+                first_token = time.perf_counter() - start
+            elif event["type"] == "error":
+                error = event["message"]
+        records.append({"client": client, "turn": turn, "first_token": first_token,
+                        "seconds": time.perf_counter() - start, "error": error})
+        if think:
+            time.sleep(think)
+    connection.request("DELETE", f"/sessions/{session}")
+    connection.getresponse().read()
+    connection.close()
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=16, help="concurrent sessions")
+    parser.add_argument("--turns", type=int, default=5, help="chat requests per session")
+    parser.add_argument("--think", type=float, default=0.0, help="seconds between a client's turns")
+    parser.add_argument("--llm-workers", type=int, default=2, help="server's concurrent Ollama calls")
+    parser.add_argument("--ollama-parallel", type=int, default=0,
+                        help="fake Ollama's own concurrency limit, 0 = no limit")
+    parser.add_argument("--first-token-delay", type=float, default=0.15)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--output", help="write config, summary and per-turn records as JSON")
+    args = parser.parse_args()
+
+    ollama = FakeOllama(first_token_delay=args.first_token_delay, token_delay=args.token_delay,
+                        parallel=args.ollama_parallel).start()
+    # main2 builds its ChatOllama at import, so OLLAMA_HOST must be set first
+    os.environ["OLLAMA_HOST"] = ollama.url
+    server, port = start_server(args.llm_workers)
+
+    import concurrent.futures
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.clients) as pool:
+        futures = [pool.submit(run_client, port, client, args.turns, args.think) for client in range(args.clients)]
+        records = [record for future in futures for record in future.result()]
+    wall = time.perf_counter() - start
+    ollama.stop()
+
+    ok = [r for r in records if r["error"] is None]
+    summary = {
+        "turns": len(records),
+        "errors": len(records) - len(ok),
+        "wall_seconds": round(wall, 3),
+        "throughput_turns_per_s": round(len(ok) / wall, 3),
+        "first_token": percentiles([r["first_token"] for r in ok if r["first_token"] is not None]),
+        "turn": percentiles([r["seconds"] for r in ok]),
+        "server": server.stats(),
+    }
+
+    print(f"{args.clients} clients x {args.turns} turns, {args.llm_workers} LLM workers: "
+          f"{summary['throughput_turns_per_s']} turns/s over {wall:.1f}s, {summary['errors']} errors")
+    for stage in ("first_token", "turn"):
+        s = summary[stage]
+        if s:
+            print(f"  {stage:12} p50 {s['p50']:.3f}s  p95 {s['p95']:.3f}s  max {s['max']:.3f}s")
+    llm = summary["server"]["llm"]
+    print(f"  ollama queue: {llm['queued']} of {llm['calls']} calls waited, "
+          f"mean {llm['mean_wait']:.3f}s, max {llm['max_wait']:.3f}s, deepest queue {llm['max_queue']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "config": vars(args),
+                "platform": {"python": platform.python_version(), "machine": platform.machine()},
+                "summary": summary,
+                "runs": records,
+            }, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
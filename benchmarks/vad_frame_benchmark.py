@@ -0,0 +1,104 @@
+"""
+Microbenchmark for the per-frame capture path in speechtotext
+
+Compares the old preprocessing (astype copies, boolean-mask gating, tobytes,
+list of bytes joined at the end) with FramePreprocessor + UtteranceBuffer.
+Reports CPU time per frame and the transient memory allocated per frame.
+
+Usage:
+    python benchmarks/vad_frame_benchmark.py --frames 300
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from speechtotext import FRAME_SIZE, FramePreprocessor, UtteranceBuffer  # noqa: E402
+
+
+class LegacyPath:
+    """The capture loop as it used to be"""
+
+    def __init__(self):
+        self.audio_buffer = []
+
+    def frame(self, frame: bytes):
+        raw_int16 = np.frombuffer(frame, dtype=np.int16)
+        raw_bytes = raw_int16.tobytes()
+        vad_audio = raw_int16.astype(np.float32)
+        vad_audio -= vad_audio.mean()
+        vad_audio[np.abs(vad_audio) < 100] = 0
+        vad_audio.astype(np.int16).tobytes()
+        self.audio_buffer.append(raw_bytes)
+
+    def finish(self):
+        return np.frombuffer(b"".join(self.audio_buffer), dtype=np.int16).astype(np.float32) / 32768.0
+
+
+class PreallocatedPath:
+    """FramePreprocessor + UtteranceBuffer"""
+
+    def __init__(self):
+        self.preprocessor = FramePreprocessor()
+        self.utterance = UtteranceBuffer()
+
+    def frame(self, frame: bytes):
+        raw_int16 = np.frombuffer(frame, dtype=np.int16)
+        self.preprocessor.process(raw_int16)
+        self.utterance.append(raw_int16)
+
+    def finish(self):
+        return self.utterance.as_float32()
+
+
+def measure(path_cls, frames):
+    # CPU time, no tracing overhead
+    path = path_cls()
+    start = time.perf_counter()
+    for frame in frames:
+        path.frame(frame)
+    path.finish()
+    elapsed = time.perf_counter() - start
+
+    # Memory: transient bytes allocated inside each frame call, and the final hand-off
+    path = path_cls()
+    tracemalloc.start()
+    transient = 0
+    for frame in frames:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        path.frame(frame)
+        transient += tracemalloc.get_traced_memory()[1] - current
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    path.finish()
+    finish_peak = tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+
+    print(f"  {path_cls.__name__:17} {elapsed / len(frames) * 1e6:7.2f} us/frame   "
+          f"{transient / len(frames):8.0f} B allocated/frame   "
+          f"hand-off to Whisper {finish_peak / 1024:8.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=300, help="30 ms frames per utterance")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = [
+        (rng.standard_normal(FRAME_SIZE) * 800 + 40).astype(np.int16).tobytes()
+        for _ in range(args.frames)
+    ]
+    print(f"{args.frames} frames = {args.frames * 0.03:.0f}s of audio")
+    measure(LegacyPath, frames)
+    measure(PreallocatedPath, frames)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+End-to-end voice latency benchmark
+
+Each run feeds a WAV fixture through speech_to_text (VAD, endpointing and
+Whisper, with the microphone replaced by the file), sends the transcript to the
+agent backed by a fake Ollama server, and speaks the reply through the TTS
+backend into a null audio sink. Runs offline on a CPU-only box.
+
+Per-stage latencies (seconds):
+    endpoint_delay           end of speech in the file -> endpoint fired (audio time)
+    asr                      Whisper time after the endpoint
+    first_token              agent start -> first LLM token
+    first_audio              agent start -> first sentence handed to the sink
+    first_audio_after_speech end of speech -> first audio (what the user waits for)
+    turn                     end of speech -> last audio handed to the sink
+
+Fixtures are 16-bit PCM WAV files in benchmarks/fixtures (shared with asr_benchmark.py),
+ideally with some silence after the speech. The directory ships reference transcripts
+only; make_fixtures.py speaks them into WAVs, or drop in recordings of your own.
+
+Usage:
+    python benchmarks/make_fixtures.py
+    python benchmarks/voice_latency_benchmark.py --runs 20
+    python benchmarks/voice_latency_benchmark.py --tts null --realtime --output latency.json
+    python benchmarks/voice_latency_benchmark.py --tts null --realtime --speculative-asr
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from asr_benchmark import DEFAULT_FIXTURES, load_wav  # noqa: E402
+from fake_ollama import FakeOllama  # noqa: E402
+
+STAGES = ["endpoint_delay", "asr", "first_token", "first_audio", "first_audio_after_speech", "turn"]
+PERCENTILES = [50, 90, 95, 99]
+SPEECH_RMS = 500  # int16 RMS above which a fixture frame counts as speech (reference end of speech)
+
+
+class WavSource:
+    """
+    Microphone stand-in: returns the fixture frame by frame, then silence.
+
+    Args:
+        audio: float32 16 kHz mono samples
+        realtime: sleep one frame duration per read, like a real capture device
+        max_trailing_seconds: give up if no endpoint fires within this much trailing silence
+    """
+
+    def __init__(self, audio: np.ndarray, frame_size: int, frame_seconds: float, speech_threshold: int,
+                 realtime: bool = False, max_trailing_seconds: float = 10.0):
+        pcm = np.clip(audio * 32768.0, -32768, 32767).astype(np.int16)
+        n = len(pcm) // frame_size
+        self.frames = [pcm[i * frame_size:(i + 1) * frame_size].tobytes() for i in range(n)]
+        self.silence = bytes(frame_size * 2)
+        self.frame_seconds = frame_seconds
+        self.realtime = realtime
+        self.max_frames = n + int(max_trailing_seconds / frame_seconds)
+
+        # Reference end of speech: last frame whose RMS clears the noise gate
+        rms = [np.sqrt(np.mean(np.frombuffer(f, dtype=np.int16).astype(np.float32) ** 2)) for f in self.frames]
+        voiced = [i for i, value in enumerate(rms) if value >= speech_threshold]
+        self.speech_end_frame = (voiced[-1] + 1) if voiced else n
+        self.reset()
+
+    def reset(self):
+        self.position = 0
+        self._next_at = time.perf_counter()
+
+    def read(self) -> bytes:
+        if self.position >= self.max_frames:
+            raise RuntimeError("no endpoint detected in the trailing silence")
+        if self.realtime:
+            self._next_at += self.frame_seconds
+            delay = self._next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        frame = self.frames[self.position] if self.position < len(self.frames) else self.silence
+        self.position += 1
+        return frame
+
+
+def load_tts(name: str):
+    """Return synthesize(text) -> audio for the chosen backend; the audio itself goes to a null sink"""
+    if name == "piper":
+        import texttospeech_piper
+        texttospeech_piper.warmup()
+        return texttospeech_piper.synthesize
+    if name == "google":
+        import texttospeech
+        texttospeech.warmup()
+        return texttospeech.synthesize
+    # 20 ms of silence per character, roughly the size of real speech
+    return lambda text: bytes(len(text) * 441 * 2)
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {}
+    values = np.asarray(values, dtype=np.float64)
+    summary = {f"p{p}": round(float(np.percentile(values, p)), 4) for p in PERCENTILES}
+    summary.update(mean=round(float(values.mean()), 4), min=round(float(values.min()), 4),
+                   max=round(float(values.max()), 4), n=int(len(values)))
+    return summary
+
+
+def run_once(source: WavSource, fixture: str, stt, engine, agent, pipeline) -> dict:
+    # ---- capture + endpointing + ASR ----
+    source.reset()
+    text = stt.speech_to_text(read_frame=source.read)
+
+    # No frame is read after the endpoint fires, so the read position marks it
+    endpoint_delay = (source.position - source.speech_end_frame) * source.frame_seconds
+    # ASR time the user waits for after the endpoint (less than inference time with early transcribe)
+    asr = stt.last_endpoint.get("asr_wait", engine.last_inference_seconds)
+
+    # ---- agent + TTS ----
+    first_token_at = None
+    chunker = agent.SentenceChunker()
+
+    def on_token(token):
+        nonlocal first_token_at
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+        for sentence in chunker.feed(token):
+            pipeline.say(sentence)
+
+    pipeline.start_turn()
+    agent.run_agent_streaming(text or "What's on my calendar?", [], on_token)
+    pipeline.say(chunker.flush())
+    pipeline.wait()
+    reply_seconds = time.perf_counter() - pipeline.turn_started_at
+
+    first_token = first_token_at - pipeline.turn_started_at if first_token_at else None
+    first_audio = pipeline.time_to_first_audio
+    return {
+        "fixture": fixture,
+        "transcript": text,
+        "endpoint_delay": endpoint_delay,
+        "asr": asr,
+        "first_token": first_token,
+        "first_audio": first_audio,
+        "first_audio_after_speech": endpoint_delay + asr + first_audio if first_audio is not None else None,
+        "turn": endpoint_delay + asr + reply_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="directory of .wav files")
+    parser.add_argument("--runs", type=int, default=10, help="measured runs per fixture")
+    parser.add_argument("--warmup", type=int, default=1, help="unmeasured runs before measuring")
+    parser.add_argument("--tts", choices=["piper", "google", "null"], default="piper")
+    parser.add_argument("--realtime", action="store_true", help="pace the file like a live microphone")
+    parser.add_argument("--early-transcribe", action="store_true", help="enable speechtotext.EARLY_TRANSCRIBE")
+    parser.add_argument("--speculative-asr", action="store_true", help="enable speechtotext.SPECULATIVE_ASR")
+    parser.add_argument("--first-token-delay", type=float, default=0.15, help="fake Ollama prompt eval time")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="fake Ollama seconds per token")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    wav_paths = sorted(glob.glob(os.path.join(args.fixtures, "*.wav")))
+    if not wav_paths:
+        sys.exit(f"No fixtures found in {args.fixtures}; run benchmarks/make_fixtures.py to synthesize them")
+
+    # The agent reads OLLAMA_HOST when main2 builds its ChatOllama, so start the fake server first
+    ollama = FakeOllama(first_token_delay=args.first_token_delay, token_delay=args.token_delay).start()
+    os.environ["OLLAMA_HOST"] = ollama.url
+
+    import main2 as agent
+    import speechtotext as stt
+    from speech_pipeline import SpeechPipeline
+    from transcriber import get_transcriber
+
+    stt.EARLY_TRANSCRIBE = stt.EARLY_TRANSCRIBE or args.early_transcribe
+    stt.SPECULATIVE_ASR = stt.SPECULATIVE_ASR or args.speculative_asr
+    engine = get_transcriber(stt.MODEL_SIZE)
+    pipeline = SpeechPipeline(load_tts(args.tts), play=lambda audio: None)
+    frame_seconds = stt.FRAME_DURATION / 1000
+
+    runs = []
+    for path in wav_paths:
+        fixture = os.path.basename(path)
+        source = WavSource(load_wav(path), stt.FRAME_SIZE, frame_seconds, SPEECH_RMS, realtime=args.realtime)
+        for i in range(args.warmup + args.runs):
+            result = run_once(source, fixture, stt, engine, agent, pipeline)
+            if i >= args.warmup:
+                runs.append(result)
+    pipeline.close()
+    ollama.stop()
+
+    summary = {stage: percentiles([r[stage] for r in runs if r[stage] is not None]) for stage in STAGES}
+    print(f"\n{len(runs)} runs, tts={args.tts}, realtime={args.realtime}, "
+          f"early transcribe={stt.EARLY_TRANSCRIBE}, speculative asr={stt.SPECULATIVE_ASR}")
+    print(f"  {'stage':26} " + " ".join(f"{'p' + str(p):>7}" for p in PERCENTILES) + f" {'mean':>7}")
+    for stage in STAGES:
+        s = summary[stage]
+        if s:
+            print(f"  {stage:26} " + " ".join(f"{s['p' + str(p)]:7.3f}" for p in PERCENTILES) + f" {s['mean']:7.3f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "config": {
+                    "tts": args.tts,
+                    "realtime": args.realtime,
+                    "early_transcribe": stt.EARLY_TRANSCRIBE,
+                    "speculative_asr": stt.SPECULATIVE_ASR,
+                    "first_token_delay": args.first_token_delay,
+                    "token_delay": args.token_delay,
+                    "asr_backend": engine.backend,
+                    "asr_model": engine.model_size,
+                    "asr_compute_type": engine.compute_type,
+                    "machine": platform.platform(),
+                },
+                "summary": summary,
+                "runs": runs,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Session checkpoints
+Append-only SQLite log of conversation messages plus the rolling summaries from
+context_window. Each turn inserts only the messages added since the last save, so the
+write cost doesn't grow with the session; restore reads the latest summary and the
+messages after it, which is what the model would be sent anyway.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from langchain_core.messages import message_to_dict, messages_from_dict
+
+# ---------------- CONFIG ----------------
+CHECKPOINTS_ENABLED = os.getenv("CHECKPOINTS", "1") == "1"
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", "sessions.sqlite3")
+SESSION_ID = os.getenv("SESSION_ID", "default")
+# ---------------------------------------
+
+
+class Checkpoint:
+    """
+    What restore() returns. history holds the messages from `base` onwards (everything
+    after the latest summary, or the whole session with full=True); the summary covers
+    history[:summarized_upto] and everything before base.
+    """
+
+    def __init__(self, session: str, history: list, summary: str, base: int, summarized_upto: int,
+                 restore_seconds: float):
+        self.session = session
+        self.history = history
+        self.summary = summary
+        self.base = base
+        self.summarized_upto = summarized_upto
+        self.restore_seconds = restore_seconds
+
+
+class Checkpointer:
+    """SQLite message log keyed by (session, seq), safe to share between threads"""
+
+    def __init__(self, path: str = CHECKPOINT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                created REAL,
+                updated REAL,
+                messages INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                session TEXT,
+                seq INTEGER,
+                data TEXT,
+                PRIMARY KEY (session, seq)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS summaries (
+                session TEXT,
+                upto INTEGER,
+                summary TEXT,
+                created REAL,
+                PRIMARY KEY (session, upto)
+            ) WITHOUT ROWID;
+        """)
+        # session -> (base, messages saved, last summary saved) for sessions restored or saved here
+        self._state = {}
+        self.last_write_seconds = 0.0
+
+    def _saved(self, session: str):
+        state = self._state.get(session)
+        if state is None:
+            row = self._db.execute("SELECT messages FROM sessions WHERE id = ?", (session,)).fetchone()
+            summary = self._db.execute(
+                "SELECT summary FROM summaries WHERE session = ? ORDER BY upto DESC LIMIT 1", (session,)
+            ).fetchone()
+            state = self._state[session] = [0, row[0] if row else 0, summary[0] if summary else ""]
+        return state
+
+    def restore(self, session: str = SESSION_ID, full: bool = False) -> Checkpoint:
+        """
+        Load a session. By default only the messages after the latest summary are read;
+        the summary covers the rest, so restore time depends on the context budget,
+        not the length of the session.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT upto, summary FROM summaries WHERE session = ? ORDER BY upto DESC LIMIT 1", (session,)
+            ).fetchone()
+            upto, summary = row if row else (0, "")
+            base = 0 if full else upto
+            rows = self._db.execute(
+                "SELECT data FROM messages WHERE session = ? AND seq >= ? ORDER BY seq", (session, base)
+            ).fetchall()
+            total = self._db.execute("SELECT messages FROM sessions WHERE id = ?", (session,)).fetchone()
+            self._state[session] = [base, total[0] if total else 0, summary]
+        history = messages_from_dict([json.loads(data) for (data,) in rows])
+        return Checkpoint(session, history, summary, base, upto - base, time.perf_counter() - start)
+
+    def save(self, history: list, session: str = SESSION_ID, summary: str = "", summarized_upto: int = 0) -> int:
+        """
+        Append the messages of history not yet saved, and the summary if it changed.
+
+        history is the list restore() returned, grown by the new turns (its first
+        message is message number `base`); summarized_upto is ContextManager's index
+        into that list. Returns how many messages were written.
+        """
+        start = time.perf_counter()
+        with self._lock, self._db:
+            base, saved, last_summary = state = self._saved(session)
+            new = history[saved - base:]
+            now = time.time()
+            if new:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO messages (session, seq, data) VALUES (?, ?, ?)",
+                    [(session, saved + i, json.dumps(message_to_dict(m))) for i, m in enumerate(new)]
+                )
+            self._db.execute("""
+                INSERT INTO sessions (id, created, updated, messages) VALUES (?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET updated = excluded.updated, messages = excluded.messages
+            """, (session, now, now, saved + len(new)))
+            if summary and summary != last_summary:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO summaries (session, upto, summary, created) VALUES (?, ?, ?, ?)",
+                    (session, base + summarized_upto, summary, now)
+                )
+                state[2] = summary
+            state[1] = saved + len(new)
+        self.last_write_seconds = time.perf_counter() - start
+        return len(new)
+
+    def sessions(self) -> list:
+        """(id, messages, updated) of every stored session, most recent first"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT id, messages, updated FROM sessions ORDER BY updated DESC"
+            ).fetchall()
+
+    def delete(self, session: str):
+        with self._lock, self._db:
+            for table, column in (("messages", "session"), ("summaries", "session"), ("sessions", "id")):
+                self._db.execute(f"DELETE FROM {table} WHERE {column} = ?", (session,))
+            self._state.pop(session, None)
+
+    def size_bytes(self) -> int:
+        """Database size including the WAL"""
+        return sum(os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_checkpointer = None
+_checkpointer_lock = threading.Lock()
+
+
+def get_checkpointer() -> Checkpointer:
+    """Get or create the shared checkpointer (singleton pattern)"""
+    global _checkpointer
+    with _checkpointer_lock:
+        if _checkpointer is None:
+            _checkpointer = Checkpointer()
+        return _checkpointer
@@ -0,0 +1,151 @@
+"""
+Token-budgeted context window for the agent
+Recent turns are sent verbatim, older turns are folded into a rolling summary
+by a background step, and the system prompt stays a stable prefix so Ollama
+can reuse its prompt cache between turns
+"""
+import contextlib
+import threading
+import time
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+# ---------------- CONFIG ----------------
+CONTEXT_TOKEN_BUDGET = 3000  # tokens of history sent verbatim (system prompt and summary excluded)
+COMPACT_KEEP_TOKENS = 1500  # after a compaction roughly this much recent history stays verbatim
+CHARS_PER_TOKEN = 4  # rough estimate for English with the llama tokenizer
+# ---------------------------------------
+
+SUMMARY_PROMPT = """Summarize the conversation below for your own future reference.
+Keep names, facts, decisions, open requests and anything the user asked you to remember.
+Write at most 150 words of plain prose.
+
+{previous}Conversation:
+{transcript}"""
+
+
+def estimate_tokens(message) -> int:
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return len(content) // CHARS_PER_TOKEN + 4  # + role/formatting overhead
+
+
+class ContextManager:
+    """
+    Decides which messages go to the model each turn.
+
+    The full history is left untouched (callers keep it for display and
+    checkpointing); only the prompt is trimmed.
+    """
+
+    def __init__(self, summarizer, budget: int = CONTEXT_TOKEN_BUDGET, keep_tokens: int = COMPACT_KEEP_TOKENS,
+                 slot=None):
+        """
+        Args:
+            summarizer: a chat model (without tools) used for the rolling summary
+            slot: optional callable returning a context manager held around each summary
+                call, so summaries count against a shared limit on model calls
+        """
+        self.summarizer = summarizer
+        self.slot = slot
+        self.budget = budget
+        self.keep_tokens = keep_tokens
+        self.summary = ""
+        self.summarized_upto = 0  # messages before this index are covered by the summary
+        self._lock = threading.Lock()
+        self._compacting = None
+        self.last_log = ""
+
+    def build(self, system_prompt: SystemMessage, history: list) -> list:
+        """Prompt for this turn: stable system prompt, rolling summary, then verbatim recent turns"""
+        with self._lock:
+            summary = self.summary
+            recent = list(history[self.summarized_upto:])
+
+        prompt = [system_prompt]
+        if summary:
+            prompt.append(SystemMessage(content=f"Summary of the earlier conversation:\n{summary}"))
+        return prompt + recent
+
+    def _cut_index(self, history: list, start: int) -> int:
+        """
+        Index from which to keep messages verbatim so that about keep_tokens remain.
+        Always cut in front of a HumanMessage so a tool call is never split from its result.
+        """
+        kept = 0
+        cut = len(history)
+        for i in range(len(history) - 1, start - 1, -1):
+            kept += estimate_tokens(history[i])
+            if isinstance(history[i], HumanMessage):
+                cut = i
+                if kept >= self.keep_tokens:
+                    break
+        return cut
+
+    def maybe_compact(self, history: list):
+        """Start a background summary if the verbatim part of the history is over budget"""
+        with self._lock:
+            if self._compacting is not None and self._compacting.is_alive():
+                return
+            start = self.summarized_upto
+            tokens = sum(estimate_tokens(m) for m in history[start:])
+            if tokens <= self.budget:
+                return
+            cut = self._cut_index(history, start)
+            if cut <= start:
+                return
+            to_summarize = list(history[start:cut])
+            previous = self.summary
+
+        self._compacting = threading.Thread(
+            target=self._compact, args=(to_summarize, previous, cut), daemon=True
+        )
+        self._compacting.start()
+
+    def _compact(self, messages: list, previous: str, cut: int):
+        start = time.perf_counter()
+        transcript = "\n".join(
+            f"{type(m).__name__.replace('Message', '')}: {m.content}"
+            for m in messages if m.content
+        )
+        prompt = SUMMARY_PROMPT.format(
+            previous=f"Summary so far:\n{previous}\n\n" if previous else "",
+            transcript=transcript
+        )
+        try:
+            with (self.slot() if self.slot is not None else contextlib.nullcontext()):
+                summary = self.summarizer.invoke([HumanMessage(content=prompt)]).content.strip()
+        except Exception as e:
+            print(f"[context] summary failed: {e}")
+            return
+
+        with self._lock:
+            self.summary = summary
+            self.summarized_upto = cut
+        print(f"[context] folded {len(messages)} messages into the summary in {time.perf_counter() - start:.1f}s")
+
+    def snapshot(self):
+        """(summary, summarized_upto) for checkpointing"""
+        with self._lock:
+            return self.summary, self.summarized_upto
+
+    def restore(self, summary: str, summarized_upto: int = 0):
+        """Resume from a checkpoint: summary covers history[:summarized_upto] of the restored history"""
+        with self._lock:
+            self.summary = summary
+            self.summarized_upto = summarized_upto
+
+    def log_turn(self, prompt: list, response) -> str:
+        """Record estimated prompt size and Ollama's own prompt-eval numbers for this call"""
+        estimated = sum(estimate_tokens(m) for m in prompt)
+        metadata = getattr(response, "response_metadata", {}) or {}
+        evaluated = metadata.get("prompt_eval_count")
+        duration_ns = metadata.get("prompt_eval_duration")
+
+        line = f"[context] {len(prompt)} messages, ~{estimated} tokens"
+        if evaluated is not None:
+            # With a warm prompt cache Ollama only evaluates the tokens after the shared prefix
+            line += f" | prompt eval {evaluated} tokens"
+            if duration_ns:
+                line += f" in {duration_ns / 1e6:.0f} ms"
+        self.last_log = line
+        return line
@@ -1,282 +1,530 @@
-"""
-LangGraph Gmail Agent with OAuth2 authentication
-Reads credentials from .env file and provides Gmail operations
-"""
-
-import os
-from typing import TypedDict, Annotated, Literal
-from datetime import datetime
-import base64
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-
-from dotenv import load_dotenv
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-
-from langgraph.graph import StateGraph, END
-from langchain_core.messages import HumanMessage, AIMessage
-
-# Load environment variables
-load_dotenv()
-
-# Gmail API scopes
-SCOPES = ['https://www.googleapis.com/auth/gmail.modify']
-
-
-class GmailAgentState(TypedDict):
-    """State for the Gmail agent"""
-    messages: list
-    action: str
-    action_input: dict
-    result: str
-    error: str | None
-
-
-class GmailAgent:
-    """Gmail agent that can read, send, and manage emails"""
-
-    def __init__(self):
-        self.service = None
-        self._authenticate()
-
-    def _authenticate(self):
-        """Authenticate with Gmail API using credentials from .env"""
-        creds = None
-
-        # Check for token file
-        if os.path.exists('token.json'):
-            creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-
-        # If no valid credentials, get new ones
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                # Read credentials from .env
-                client_id = os.getenv('GMAIL_CLIENT_ID')
-                client_secret = os.getenv('GMAIL_CLIENT_SECRET')
-
-                if not client_id or not client_secret:
-                    raise ValueError(
-                        "GMAIL_CLIENT_ID and GMAIL_CLIENT_SECRET must be set in .env file"
-                    )
-
-                # Create credentials config
-                client_config = {
-                    "installed": {
-                        "client_id": client_id,
-                        "client_secret": client_secret,
-                        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                        "token_uri": "https://oauth2.googleapis.com/token",
-                        "redirect_uris": ["http://localhost"]
-                    }
-                }
-
-                flow = InstalledAppFlow.from_client_config(client_config, SCOPES)
-                creds = flow.run_local_server(port=0)
-
-            # Save credentials for next run
-            with open('token.json', 'w') as token:
-                token.write(creds.to_json())
-
-        self.service = build('gmail', 'v1', credentials=creds)
-
-    def read_emails(self, max_results: int = 10, query: str = "") -> str:
-        """Read emails from inbox"""
-        try:
-            results = self.service.users().messages().list(
-                userId='me',
-                maxResults=max_results,
-                q=query
-            ).execute()
-
-            messages = results.get('messages', [])
-
-            if not messages:
-                return "No messages found."
-
-            email_list = []
-            for msg in messages:
-                message = self.service.users().messages().get(
-                    userId='me',
-                    id=msg['id'],
-                    format='full'
-                ).execute()
-
-                headers = message['payload']['headers']
-                subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
-                sender = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown')
-                date = next((h['value'] for h in headers if h['name'] == 'Date'), 'Unknown')
-
-                # Get snippet
-                snippet = message.get('snippet', '')
-
-                email_list.append(f"From: {sender}\nSubject: {subject}\nDate: {date}\nPreview: {snippet}\n")
-
-            return "\n---\n".join(email_list)
-
-        except HttpError as error:
-            return f"An error occurred: {error}"
-
-    def send_email(self, to: str, subject: str, body: str) -> str:
-        """Send an email"""
-        try:
-            message = MIMEMultipart()
-            message['to'] = to
-            message['subject'] = subject
-
-            msg = MIMEText(body)
-            message.attach(msg)
-
-            raw = base64.urlsafe_b64encode(message.as_bytes()).decode()
-
-            send_message = self.service.users().messages().send(
-                userId='me',
-                body={'raw': raw}
-            ).execute()
-
-            return f"Email sent successfully! Message ID: {send_message['id']}"
-
-        except HttpError as error:
-            return f"An error occurred: {error}"
-
-    def search_emails(self, query: str, max_results: int = 10) -> str:
-        """Search emails with a query"""
-        return self.read_emails(max_results=max_results, query=query)
-
-    def mark_as_read(self, message_id: str) -> str:
-        """Mark an email as read"""
-        try:
-            self.service.users().messages().modify(
-                userId='me',
-                id=message_id,
-                body={'removeLabelIds': ['UNREAD']}
-            ).execute()
-            return f"Message {message_id} marked as read"
-        except HttpError as error:
-            return f"An error occurred: {error}"
-
-
-def parse_action(state: GmailAgentState) -> GmailAgentState:
-    """Parse the user's request to determine action"""
-    last_message = state["messages"][-1].content.lower()
-
-    # Simple keyword-based routing
-    if any(word in last_message for word in ["read", "show", "list", "get"]):
-        state["action"] = "read_emails"
-        # Extract max results if specified
-        state["action_input"] = {"max_results": 10}
-
-    elif "send" in last_message:
-        state["action"] = "send_email"
-        # You'd parse the to, subject, body from the message
-        state["action_input"] = {}
-
-    elif "search" in last_message or "find" in last_message:
-        state["action"] = "search_emails"
-        state["action_input"] = {}
-
-    else:
-        state["action"] = "unknown"
-        state["action_input"] = {}
-
-    return state
-
-
-def execute_action(state: GmailAgentState) -> GmailAgentState:
-    """Execute the Gmail action"""
-    agent = GmailAgent()
-
-    try:
-        if state["action"] == "read_emails":
-            max_results = state["action_input"].get("max_results", 10)
-            state["result"] = agent.read_emails(max_results=max_results)
-
-        elif state["action"] == "send_email":
-            to = state["action_input"].get("to")
-            subject = state["action_input"].get("subject")
-            body = state["action_input"].get("body")
-            state["result"] = agent.send_email(to, subject, body)
-
-        elif state["action"] == "search_emails":
-            query = state["action_input"].get("query", "")
-            state["result"] = agent.search_emails(query=query)
-
-        else:
-            state["result"] = "I don't understand that action. I can read, send, or search emails."
-
-        state["error"] = None
-
-    except Exception as e:
-        state["error"] = str(e)
-        state["result"] = f"Error executing action: {str(e)}"
-
-    return state
-
-
-def format_response(state: GmailAgentState) -> GmailAgentState:
-    """Format the response message"""
-    if state["error"]:
-        response = AIMessage(content=f"Error: {state['error']}")
-    else:
-        response = AIMessage(content=state["result"])
-
-    state["messages"].append(response)
-    return state
-
-
-# Build the graph
-def create_gmail_agent_graph():
-    """Create the LangGraph workflow for Gmail agent"""
-    workflow = StateGraph(GmailAgentState)
-
-    # Add nodes
-    workflow.add_node("parse_action", parse_action)
-    workflow.add_node("execute_action", execute_action)
-    workflow.add_node("format_response", format_response)
-
-    # Add edges
-    workflow.set_entry_point("parse_action")
-    workflow.add_edge("parse_action", "execute_action")
-    workflow.add_edge("execute_action", "format_response")
-    workflow.add_edge("format_response", END)
-
-    return workflow.compile()
-
-
-# Create a tool-callable interface for orchestrator
-def gmail_agent_tool(query: str) -> str:
-    """
-    Gmail agent tool that can be called by orchestrator agent.
-
-    Args:
-        query: Natural language query about Gmail operations
-
-    Returns:
-        Result of the Gmail operation
-    """
-    graph = create_gmail_agent_graph()
-
-    initial_state = {
-        "messages": [HumanMessage(content=query)],
-        "action": "",
-        "action_input": {},
-        "result": "",
-        "error": None
-    }
-
-    final_state = graph.invoke(initial_state)
-
-    # Return the last AI message content
-    return final_state["messages"][-1].content
-
-
-# Example usage
-if __name__ == "__main__":
-    # Test the agent
-    result = gmail_agent_tool("Read my last 5 emails")
+"""
+LangGraph Gmail Agent with OAuth2 authentication
+Reads credentials from .env file and provides Gmail operations
+"""
+
+import os
+import threading
+import time
+from typing import TypedDict, Annotated, Literal
+from datetime import datetime, timedelta
+import base64
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+from dotenv import load_dotenv
+from google.oauth2.credentials import Credentials
+from google.auth.transport.requests import Request
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+from gmail_cache import extract_body, get_mailbox_cache
+from intent_router import KeywordMatcher
+import tracing
+
+from langgraph.graph import StateGraph, END
+from langchain_core.messages import HumanMessage, AIMessage
+
+# Load environment variables
+load_dotenv()
+
+# Gmail API scopes
+SCOPES = ['https://www.googleapis.com/auth/gmail.modify']
+
+# Headers shown in list views, fetched with format='metadata' instead of full bodies
+LIST_HEADERS = ['From', 'Subject', 'Date']
+
+# Gmail allows up to 100 calls per batch request but rate-limits large batches, 50 is the recommended size
+BATCH_SIZE = 50
+
+# Sub-requests of a batch that were rate limited (or hit a 5xx) are retried this many
+# times, waiting BATCH_RETRY_BACKOFF seconds, doubled after every round
+BATCH_RETRIES = 3
+BATCH_RETRY_BACKOFF = 1.0
+
+# messages.list returns at most 500 IDs per page
+LIST_PAGE_SIZE = 500
+
+# Answer read/search calls from the local mirror in gmail_cache (set GMAIL_CACHE=0 to disable)
+USE_MAIL_CACHE = os.getenv("GMAIL_CACHE", "1") == "1"
+
+# Refresh the access token this long before it expires, so no tool call pays for a refresh
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+
+def _retryable(error: Exception) -> bool:
+    """Rate limits (429, 403 rateLimitExceeded) and server errors are worth retrying; 404 etc. are not"""
+    if not isinstance(error, HttpError):
+        return False
+    status = error.resp.status
+    if status == 403:
+        return b"ratelimitexceeded" in (error.content or b"").lower()
+    return status == 429 or status >= 500
+
+
+def extract_headers(headers: list, wanted=LIST_HEADERS) -> dict:
+    """Pick the wanted headers out of a message's header list in a single pass"""
+    wanted = set(wanted)
+    found = {}
+    for header in headers:
+        name = header['name']
+        if name in wanted and name not in found:
+            found[name] = header['value']
+    return found
+
+
+class GmailAgentState(TypedDict):
+    """State for the Gmail agent"""
+    messages: list
+    action: str
+    action_input: dict
+    result: str
+    error: str | None
+
+
+def load_credentials() -> Credentials:
+    """Load OAuth credentials from token.json, refreshing or running the consent flow if needed"""
+    creds = None
+
+    # Check for token file
+    if os.path.exists('token.json'):
+        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
+
+    # If no valid credentials, get new ones
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            creds.refresh(Request())
+        else:
+            # Read credentials from .env
+            client_id = os.getenv('GMAIL_CLIENT_ID')
+            client_secret = os.getenv('GMAIL_CLIENT_SECRET')
+
+            if not client_id or not client_secret:
+                raise ValueError(
+                    "GMAIL_CLIENT_ID and GMAIL_CLIENT_SECRET must be set in .env file"
+                )
+
+            # Create credentials config
+            client_config = {
+                "installed": {
+                    "client_id": client_id,
+                    "client_secret": client_secret,
+                    "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+                    "token_uri": "https://oauth2.googleapis.com/token",
+                    "redirect_uris": ["http://localhost"]
+                }
+            }
+
+            flow = InstalledAppFlow.from_client_config(client_config, SCOPES)
+            creds = flow.run_local_server(port=0)
+
+        _save_credentials(creds)
+
+    return creds
+
+
+def _save_credentials(creds: Credentials):
+    # Save credentials for next run
+    with open('token.json', 'w') as token:
+        token.write(creds.to_json())
+
+
+def build_gmail_service(creds: Credentials):
+    """
+    Build the Gmail service from the discovery document bundled with
+    google-api-python-client, so no discovery request goes over the network.
+    """
+    return build('gmail', 'v1', credentials=creds, static_discovery=True, cache_discovery=False)
+
+
+class GmailAgent:
+    """Gmail agent that can read, send, and manage emails"""
+
+    def __init__(self, service=None, credentials: Credentials = None, cache=None):
+        """
+        Args:
+            service: an already built Gmail service (e.g. one backed by a stub
+                discovery document in tests); if omitted we authenticate and build one
+            credentials: credentials to build the service with, shared between agents
+            cache: optional gmail_cache.MailboxCache that read/search calls are answered from
+        """
+        self.credentials = credentials
+        self.cache = cache
+        self.service = service
+        self.last_failed_ids = []  # messages the last get_messages_metadata() call gave up on after retries
+        if self.service is None:
+            if self.credentials is None:
+                self.credentials = load_credentials()
+            self.service = build_gmail_service(self.credentials)
+
+    def list_message_ids(self, max_results: int = 10, query: str = "") -> list:
+        """List up to max_results message IDs, following nextPageToken across pages"""
+        ids = []
+        page_token = None
+        with tracing.span("gmail.list", query=query) as span:
+            while len(ids) < max_results:
+                results = self.service.users().messages().list(
+                    userId='me',
+                    maxResults=min(max_results - len(ids), LIST_PAGE_SIZE),
+                    q=query,
+                    pageToken=page_token,
+                    fields='messages/id,nextPageToken'
+                ).execute()
+
+                ids.extend(msg['id'] for msg in results.get('messages', []))
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    break
+            span.set(messages=min(len(ids), max_results))
+        return ids[:max_results]
+
+    def get_messages_metadata(self, message_ids: list) -> list:
+        """
+        Fetch headers and snippet for many messages using batch requests.
+
+        Sub-requests that were rate limited or hit a server error are retried with
+        backoff. Returns message resources in the same order as message_ids; failed
+        ones are left out and logged, and those that were still rate limited (worth
+        asking for again later, unlike e.g. a 404 for a deleted message) are listed in
+        self.last_failed_ids.
+        """
+        fetched = {}
+        errors = {}
+
+        def on_response(request_id, response, exception):
+            if exception is not None:
+                errors[request_id] = exception
+            else:
+                fetched[request_id] = response
+                errors.pop(request_id, None)
+
+        with tracing.span("gmail.metadata", messages=len(message_ids)) as span:
+            pending = list(message_ids)
+            for attempt in range(BATCH_RETRIES + 1):
+                for start in range(0, len(pending), BATCH_SIZE):
+                    batch = self.service.new_batch_http_request(callback=on_response)
+                    for message_id in pending[start:start + BATCH_SIZE]:
+                        batch.add(
+                            self.service.users().messages().get(
+                                userId='me',
+                                id=message_id,
+                                format='metadata',
+                                metadataHeaders=LIST_HEADERS,
+                                fields='id,threadId,labelIds,snippet,internalDate,payload/headers'
+                            ),
+                            request_id=message_id
+                        )
+                    batch.execute()
+                pending = [message_id for message_id in pending if _retryable(errors.get(message_id))]
+                if not pending or attempt == BATCH_RETRIES:
+                    break
+                time.sleep(BATCH_RETRY_BACKOFF * 2 ** attempt)
+            span.set(errors=len(errors), retries=attempt)
+
+        self.last_failed_ids = [message_id for message_id in message_ids if _retryable(errors.get(message_id))]
+        if errors and not fetched:
+            raise next(iter(errors.values()))
+        if errors:
+            print(f"[gmail] {len(errors)} of {len(message_ids)} messages could not be fetched "
+                  f"({next(iter(errors.values()))})")
+        return [fetched[message_id] for message_id in message_ids if message_id in fetched]
+
+    @staticmethod
+    def format_message_summary(message: dict) -> str:
+        headers = extract_headers(message.get('payload', {}).get('headers', []))
+        return (f"From: {headers.get('From', 'Unknown')}\n"
+                f"Subject: {headers.get('Subject', 'No Subject')}\n"
+                f"Date: {headers.get('Date', 'Unknown')}\n"
+                f"Preview: {message.get('snippet', '')}\n"
+                f"ID: {message.get('id', '')}\n")
+
+    def read_emails(self, max_results: int = 10, query: str = "") -> str:
+        """Read emails from inbox"""
+        try:
+            messages = None
+            if self.cache is not None:
+                self.cache.sync_if_stale(self)
+                messages = self.cache.lookup(query, max_results)
+
+            missing = 0
+            if messages is None:
+                message_ids = self.list_message_ids(max_results=max_results, query=query)
+                messages = self.get_messages_metadata(message_ids) if message_ids else []
+                missing = len(self.last_failed_ids) if message_ids else 0
+
+            if not messages:
+                return "No messages found."
+
+            email_list = [self.format_message_summary(message) for message in messages]
+            summaries = "\n---\n".join(email_list)
+            if missing:
+                summaries += f"\n(Gmail did not return {missing} more matching messages; ask again shortly for the rest.)"
+            return summaries
+
+        except HttpError as error:
+            return f"An error occurred: {error}"
+
+    @tracing.traced("gmail.send")
+    def send_email(self, to: str, subject: str, body: str) -> str:
+        """Send an email"""
+        try:
+            message = MIMEMultipart()
+            message['to'] = to
+            message['subject'] = subject
+
+            msg = MIMEText(body)
+            message.attach(msg)
+
+            raw = base64.urlsafe_b64encode(message.as_bytes()).decode()
+
+            send_message = self.service.users().messages().send(
+                userId='me',
+                body={'raw': raw}
+            ).execute()
+
+            return f"Email sent successfully! Message ID: {send_message['id']}"
+
+        except HttpError as error:
+            return f"An error occurred: {error}"
+
+    def search_emails(self, query: str, max_results: int = 10) -> str:
+        """Search emails with a query"""
+        return self.read_emails(max_results=max_results, query=query)
+
+    def get_email_body(self, message_id: str) -> str:
+        """Get the plain-text body of a message, from the mirror when it has been fetched before"""
+        if self.cache is not None:
+            body = self.cache.get_body(message_id)
+            if body is not None:
+                return body
+        try:
+            with tracing.span("gmail.body") as span:
+                message = self.service.users().messages().get(
+                    userId='me',
+                    id=message_id,
+                    format='full'
+                ).execute()
+                span.set(bytes=message.get('sizeEstimate', 0))
+        except HttpError as error:
+            return f"An error occurred: {error}"
+
+        body = extract_body(message['payload'])
+        if self.cache is not None:
+            self.cache.store_body(message_id, body)
+        return body
+
+    @tracing.traced("gmail.modify")
+    def mark_as_read(self, message_id: str) -> str:
+        """Mark an email as read"""
+        try:
+            self.service.users().messages().modify(
+                userId='me',
+                id=message_id,
+                body={'removeLabelIds': ['UNREAD']}
+            ).execute()
+            if self.cache is not None:
+                self.cache.remove_label(message_id, 'UNREAD')
+            return f"Message {message_id} marked as read"
+        except HttpError as error:
+            return f"An error occurred: {error}"
+
+
+# ---------------- shared agent pool ----------------
+# googleapiclient services sit on httplib2, which is not thread-safe, so every
+# thread gets its own agent; all of them share one set of credentials.
+
+_credentials = None
+_credentials_lock = threading.Lock()
+_thread_local = threading.local()
+
+
+def _get_credentials() -> Credentials:
+    """Load the shared credentials once, and refresh them shortly before they expire"""
+    global _credentials
+    with _credentials_lock:
+        if _credentials is None:
+            start = time.perf_counter()
+            _credentials = load_credentials()
+            print(f"[gmail] credentials loaded in {time.perf_counter() - start:.2f}s")
+
+        expiry = _credentials.expiry  # naive UTC, as google-auth stores it
+        if _credentials.refresh_token and (
+                expiry is None or expiry - datetime.utcnow() < TOKEN_REFRESH_MARGIN):
+            start = time.perf_counter()
+            _credentials.refresh(Request())
+            _save_credentials(_credentials)
+            print(f"[gmail] access token refreshed in {time.perf_counter() - start:.2f}s")
+
+        return _credentials
+
+
+def get_gmail_agent() -> GmailAgent:
+    """Get this thread's GmailAgent, creating it on first use (lazy, one per thread)"""
+    creds = _get_credentials()
+    agent = getattr(_thread_local, "agent", None)
+    if agent is None:
+        start = time.perf_counter()
+        agent = GmailAgent(
+            service=build_gmail_service(creds),
+            credentials=creds,
+            cache=get_mailbox_cache() if USE_MAIL_CACHE else None
+        )
+        _thread_local.agent = agent
+        print(f"[gmail] service built in {time.perf_counter() - start:.2f}s")
+    return agent
+
+
+_ACTION_KEYWORDS = KeywordMatcher([
+    ("read_emails", ["read", "show", "list", "get"]),
+    ("send_email", ["send"]),
+    ("search_emails", ["search", "find"]),
+])
+
+
+def parse_action(state: GmailAgentState) -> GmailAgentState:
+    """Parse the user's request to determine action"""
+    last_message = state["messages"][-1].content.lower()
+
+    # Keyword routing, compiled once; earlier entries win when several match
+    action = _ACTION_KEYWORDS.match(last_message)
+
+    if action == "read_emails":
+        state["action"] = "read_emails"
+        # Extract max results if specified
+        state["action_input"] = {"max_results": 10}
+
+    elif action == "send_email":
+        state["action"] = "send_email"
+        # You'd parse the to, subject, body from the message
+        state["action_input"] = {}
+
+    elif action == "search_emails":
+        state["action"] = "search_emails"
+        state["action_input"] = {}
+
+    else:
+        state["action"] = "unknown"
+        state["action_input"] = {}
+
+    return state
+
+
+def execute_action(state: GmailAgentState) -> GmailAgentState:
+    """Execute the Gmail action"""
+    start = time.perf_counter()
+
+    with tracing.span("gmail.action", action=state["action"]) as span:
+        try:
+            agent = get_gmail_agent()
+
+            if state["action"] == "read_emails":
+                max_results = state["action_input"].get("max_results", 10)
+                state["result"] = agent.read_emails(max_results=max_results)
+
+            elif state["action"] == "send_email":
+                to = state["action_input"].get("to")
+                subject = state["action_input"].get("subject")
+                body = state["action_input"].get("body")
+                if not (to and subject and body):
+                    # parse_action doesn't extract these from free text; never send a half-empty email
+                    state["result"] = ("I can't send from a plain-language request. "
+                                       "Use send_email with a recipient, subject and body.")
+                else:
+                    state["result"] = agent.send_email(to, subject, body)
+
+            elif state["action"] == "search_emails":
+                query = state["action_input"].get("query", "")
+                state["result"] = agent.search_emails(query=query)
+
+            else:
+                state["result"] = "I don't understand that action. I can read, send, or search emails."
+
+            state["error"] = None
+
+        except Exception as e:
+            state["error"] = str(e)
+            span.set(error=str(e))
+            state["result"] = f"Error executing action: {str(e)}"
+
+    print(f"[gmail] {state['action']} took {time.perf_counter() - start:.2f}s")
+    return state
+
+
+def format_response(state: GmailAgentState) -> GmailAgentState:
+    """Format the response message"""
+    if state["error"]:
+        response = AIMessage(content=f"Error: {state['error']}")
+    else:
+        response = AIMessage(content=state["result"])
+
+    state["messages"].append(response)
+    return state
+
+
+# Build the graph
+def create_gmail_agent_graph():
+    """Create the LangGraph workflow for Gmail agent"""
+    workflow = StateGraph(GmailAgentState)
+
+    # Add nodes
+    workflow.add_node("parse_action", parse_action)
+    workflow.add_node("execute_action", execute_action)
+    workflow.add_node("format_response", format_response)
+
+    # Add edges
+    workflow.set_entry_point("parse_action")
+    workflow.add_edge("parse_action", "execute_action")
+    workflow.add_edge("execute_action", "format_response")
+    workflow.add_edge("format_response", END)
+
+    return workflow.compile()
+
+
+_gmail_graph = None
+_gmail_graph_lock = threading.Lock()
+
+
+def get_gmail_agent_graph():
+    """Get the compiled Gmail graph, compiling it on first use (singleton pattern)"""
+    global _gmail_graph
+    with _gmail_graph_lock:
+        if _gmail_graph is None:
+            start = time.perf_counter()
+            _gmail_graph = create_gmail_agent_graph()
+            print(f"[gmail] graph compiled in {time.perf_counter() - start:.2f}s")
+        return _gmail_graph
+
+
+# Create a tool-callable interface for orchestrator
+def gmail_agent_tool(query: str) -> str:
+    """
+    Gmail agent tool that can be called by orchestrator agent.
+
+    Args:
+        query: Natural language query about Gmail operations
+
+    Returns:
+        Result of the Gmail operation
+    """
+    graph = get_gmail_agent_graph()
+
+    initial_state = {
+        "messages": [HumanMessage(content=query)],
+        "action": "",
+        "action_input": {},
+        "result": "",
+        "error": None
+    }
+
+    final_state = graph.invoke(initial_state)
+
+    # Return the last AI message content
+    return final_state["messages"][-1].content
+
+
+# Example usage
+if __name__ == "__main__":
+    # Test the agent
+    result = gmail_agent_tool("Read my last 5 emails")
     print(result)
\ No newline at end of file
@@ -0,0 +1,398 @@
+"""
+Local Gmail mirror
+SQLite copy of the most recent messages (headers, snippet, labels and, on demand,
+bodies) with an FTS5 index. Filled once, then kept current incrementally through
+users.history.list, so read/search calls are answered locally in milliseconds
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from googleapiclient.errors import HttpError
+
+# ---------------- CONFIG ----------------
+CACHE_PATH = os.getenv("GMAIL_CACHE_PATH", "gmail_cache.sqlite3")
+INITIAL_SYNC_MESSAGES = 500  # messages mirrored by a full sync
+MAX_CACHED_MESSAGES = 5000  # oldest messages beyond this are dropped
+MAX_BODY_BYTES = 50 * 1024 * 1024  # oldest cached bodies are evicted beyond this
+SYNC_INTERVAL = 30  # seconds between history syncs triggered by lookups
+# ---------------------------------------
+
+_HEADERS = ('From', 'Subject', 'Date')
+
+# Gmail search operators we can answer exactly from the mirror, mapped to label IDs
+_LABEL_OPERATORS = {
+    ('is', 'unread'): ('UNREAD', True),
+    ('is', 'read'): ('UNREAD', False),
+    ('is', 'starred'): ('STARRED', True),
+    ('is', 'important'): ('IMPORTANT', True),
+    ('in', 'inbox'): ('INBOX', True),
+    ('in', 'sent'): ('SENT', True),
+    ('in', 'drafts'): ('DRAFT', True),
+    ('in', 'trash'): ('TRASH', True),
+    ('in', 'spam'): ('SPAM', True),
+}
+# messages.list leaves these out unless the query asks for them, and a full sync never
+# mirrors them, so they are filtered from local answers and queries naming them go to the API
+_HIDDEN_LABELS = ('TRASH', 'SPAM')
+_FTS_COLUMNS = {'from': 'sender', 'subject': 'subject'}
+
+_TOKEN = re.compile(r'(\w+):("[^"]*"|\S+)|"([^"]*)"|(\S+)')
+
+
+def parse_query(query: str):
+    """
+    Translate a Gmail search query into (fts_terms, label_filters, free_text).
+
+    Returns None when the query uses operators the mirror can't answer
+    (after:, has:attachment, OR, negation, ...), so the caller goes to the API.
+    """
+    fts_terms = []
+    label_filters = []
+    free_text = False
+    for match in _TOKEN.finditer(query or ""):
+        key, value, phrase, word = match.groups()
+        if key is not None:
+            key = key.lower()
+            value = value.strip('"')
+            if (key, value.lower()) in _LABEL_OPERATORS:
+                label_filters.append(_LABEL_OPERATORS[(key, value.lower())])
+            elif key in _FTS_COLUMNS and value:
+                fts_terms.append(f'{_FTS_COLUMNS[key]}:"{value.replace(chr(34), "")}"')
+            else:
+                return None
+        else:
+            text = phrase if phrase is not None else word
+            if text.upper() in ('OR', 'AND') or text.startswith(('-', '(', '{')):
+                return None
+            if text:
+                fts_terms.append('"' + text.replace('"', '') + '"')
+                free_text = True
+    return fts_terms, label_filters, free_text
+
+
+def extract_body(payload: dict) -> str:
+    """Return the text/plain body of a full-format message payload ('' if there is none)"""
+    import base64
+
+    stack = [payload]
+    while stack:
+        part = stack.pop(0)
+        if part.get('mimeType') == 'text/plain' and part.get('body', {}).get('data'):
+            return base64.urlsafe_b64decode(part['body']['data']).decode('utf-8', errors='replace')
+        stack.extend(part.get('parts', []))
+    return ''
+
+
+class MailboxCache:
+    """SQLite + FTS5 mirror of the mailbox, safe to share between threads"""
+
+    def __init__(self, path: str = CACHE_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS messages (
+                id TEXT PRIMARY KEY,
+                thread_id TEXT,
+                internal_date INTEGER,
+                sender TEXT,
+                subject TEXT,
+                date TEXT,
+                snippet TEXT,
+                labels TEXT,
+                body TEXT,
+                body_bytes INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS messages_by_date ON messages(internal_date DESC);
+            CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                id UNINDEXED, sender, subject, snippet, body
+            );
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        self.last_sync = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    # ---------------- meta ----------------
+
+    def _get_meta(self, key: str):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value):
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    @property
+    def history_id(self):
+        return self._get_meta('history_id')
+
+    @property
+    def complete(self) -> bool:
+        """True when the mirror holds every message in the mailbox, not just the newest ones"""
+        return self._get_meta('complete') == '1'
+
+    # ---------------- writes ----------------
+
+    def _index(self, message_id: str):
+        self._db.execute("DELETE FROM messages_fts WHERE id = ?", (message_id,))
+        self._db.execute("""
+            INSERT INTO messages_fts (id, sender, subject, snippet, body)
+            SELECT id, sender, subject, snippet, COALESCE(body, '') FROM messages WHERE id = ?
+        """, (message_id,))
+
+    def store_messages(self, messages: list):
+        """Insert or update metadata-format message resources (keeps any cached body)"""
+        with self._lock, self._db:
+            for message in messages:
+                headers = {}
+                for header in message.get('payload', {}).get('headers', []):
+                    if header['name'] in _HEADERS and header['name'] not in headers:
+                        headers[header['name']] = header['value']
+                self._db.execute("""
+                    INSERT INTO messages (id, thread_id, internal_date, sender, subject, date, snippet, labels)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(id) DO UPDATE SET
+                        thread_id = excluded.thread_id, internal_date = excluded.internal_date,
+                        sender = excluded.sender, subject = excluded.subject, date = excluded.date,
+                        snippet = excluded.snippet, labels = excluded.labels
+                """, (
+                    message['id'],
+                    message.get('threadId'),
+                    int(message.get('internalDate', 0)),
+                    headers.get('From'),
+                    headers.get('Subject'),
+                    headers.get('Date'),
+                    message.get('snippet', ''),
+                    ' ' + ' '.join(message.get('labelIds', [])) + ' ',
+                ))
+                self._index(message['id'])
+
+    def update_labels(self, message_id: str, label_ids: list):
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE messages SET labels = ? WHERE id = ?",
+                (' ' + ' '.join(label_ids) + ' ', message_id)
+            )
+
+    def remove_label(self, message_id: str, label_id: str):
+        """Apply a label change we made ourselves without waiting for the next sync"""
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE messages SET labels = REPLACE(labels, ?, ' ') WHERE id = ?",
+                (f' {label_id} ', message_id)
+            )
+
+    def delete_messages(self, message_ids: list):
+        with self._lock, self._db:
+            for message_id in message_ids:
+                self._db.execute("DELETE FROM messages WHERE id = ?", (message_id,))
+                self._db.execute("DELETE FROM messages_fts WHERE id = ?", (message_id,))
+
+    def store_body(self, message_id: str, body: str):
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE messages SET body = ?, body_bytes = ? WHERE id = ?",
+                (body, len(body.encode('utf-8')), message_id)
+            )
+            self._index(message_id)
+        self.enforce_limits()
+
+    def get_body(self, message_id: str):
+        with self._lock:
+            row = self._db.execute("SELECT body FROM messages WHERE id = ?", (message_id,)).fetchone()
+        return row[0] if row else None
+
+    def enforce_limits(self):
+        """Drop the oldest messages past MAX_CACHED_MESSAGES and the oldest bodies past MAX_BODY_BYTES"""
+        with self._lock, self._db:
+            old_ids = [row[0] for row in self._db.execute(
+                "SELECT id FROM messages ORDER BY internal_date DESC LIMIT -1 OFFSET ?",
+                (MAX_CACHED_MESSAGES,)
+            )]
+            if old_ids:
+                self.delete_messages(old_ids)
+                self._set_meta('complete', 0)
+
+            evict = [row[0] for row in self._db.execute("""
+                SELECT id FROM (
+                    SELECT id, SUM(body_bytes) OVER (ORDER BY internal_date DESC) AS running
+                    FROM messages WHERE body IS NOT NULL
+                ) WHERE running > ?
+            """, (MAX_BODY_BYTES,))]
+            for message_id in evict:
+                self._db.execute("UPDATE messages SET body = NULL, body_bytes = 0 WHERE id = ?", (message_id,))
+                self._index(message_id)
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM messages")
+            self._db.execute("DELETE FROM messages_fts")
+            self._db.execute("DELETE FROM meta")
+
+    # ---------------- sync ----------------
+
+    def full_sync(self, agent):
+        """Mirror the newest INITIAL_SYNC_MESSAGES messages from scratch"""
+        with self._lock:
+            start = time.perf_counter()
+            # Read the history ID first, so changes made while we list are replayed by the next sync
+            history_id = agent.service.users().getProfile(userId='me').execute()['historyId']
+            message_ids = agent.list_message_ids(max_results=INITIAL_SYNC_MESSAGES)
+            messages = agent.get_messages_metadata(message_ids)
+
+            self.clear()
+            self.store_messages(messages)
+            with self._db:
+                self._set_meta('history_id', history_id)
+                # Messages Gmail failed to return are missing, so the mirror can't answer for the whole mailbox
+                self._set_meta('complete', int(len(message_ids) < INITIAL_SYNC_MESSAGES and not agent.last_failed_ids))
+            self.last_sync = time.time()
+            print(f"[gmail] mirrored {len(messages)} messages in {time.perf_counter() - start:.2f}s")
+
+    def sync(self, agent):
+        """Apply changes since the stored historyId, or do a full sync if there is none (or it expired)"""
+        with self._lock:
+            if self.history_id is None:
+                self.full_sync(agent)
+                return
+
+            added, deleted, relabeled = set(), set(), {}
+            page_token = None
+            history_id = self.history_id
+            try:
+                while True:
+                    response = agent.service.users().history().list(
+                        userId='me',
+                        startHistoryId=self.history_id,
+                        historyTypes=['messageAdded', 'messageDeleted', 'labelAdded', 'labelRemoved'],
+                        pageToken=page_token
+                    ).execute()
+
+                    for record in response.get('history', []):
+                        for item in record.get('messagesAdded', []):
+                            added.add(item['message']['id'])
+                            deleted.discard(item['message']['id'])
+                        for item in record.get('messagesDeleted', []):
+                            deleted.add(item['message']['id'])
+                            added.discard(item['message']['id'])
+                        for key in ('labelsAdded', 'labelsRemoved'):
+                            for item in record.get(key, []):
+                                relabeled[item['message']['id']] = item['message'].get('labelIds', [])
+
+                    history_id = response.get('historyId', history_id)
+                    page_token = response.get('nextPageToken')
+                    if not page_token:
+                        break
+            except HttpError as error:
+                if error.resp.status == 404:
+                    # startHistoryId is too old for Gmail to replay
+                    self.full_sync(agent)
+                    return
+                raise
+
+            failed = []
+            if added:
+                self.store_messages(agent.get_messages_metadata(sorted(added)))
+                failed = agent.last_failed_ids
+            if deleted:
+                self.delete_messages(sorted(deleted))
+            for message_id, label_ids in relabeled.items():
+                if message_id not in added and message_id not in deleted:
+                    self.update_labels(message_id, label_ids)
+
+            if failed:
+                # Keep the old historyId so the next sync replays these changes and fetches them again
+                print(f"[gmail] {len(failed)} new messages not mirrored yet, will retry on the next sync")
+            else:
+                with self._db:
+                    self._set_meta('history_id', history_id)
+            self.enforce_limits()
+            self.last_sync = time.time()
+
+    def sync_if_stale(self, agent):
+        if time.time() - self.last_sync >= SYNC_INTERVAL:
+            self.sync(agent)
+
+    # ---------------- reads ----------------
+
+    def lookup(self, query: str, max_results: int):
+        """
+        Answer a read/search from the mirror.
+
+        Returns message resources shaped like format='metadata' responses, or None
+        on a miss (unsupported operators, free text, trash/spam, or too few local
+        hits to be sure). Only header (from:, subject:) and label operators are
+        answered locally: free text can match bodies that were never fetched or
+        were evicted, which the FTS index doesn't hold.
+        """
+        parsed = parse_query(query)
+        if parsed is None:
+            self.misses += 1
+            return None
+        fts_terms, label_filters, free_text = parsed
+        if free_text or any(label in _HIDDEN_LABELS for label, _ in label_filters):
+            self.misses += 1
+            return None
+        label_filters = label_filters + [(label, False) for label in _HIDDEN_LABELS]
+
+        sql = "SELECT m.* FROM messages m"
+        params = []
+        where = []
+        if fts_terms:
+            sql += " JOIN messages_fts f ON f.id = m.id"
+            where.append("messages_fts MATCH ?")
+            params.append(" ".join(fts_terms))
+        for label, present in label_filters:
+            where.append("m.labels " + ("LIKE" if present else "NOT LIKE") + " ?")
+            params.append(f"% {label} %")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY m.internal_date DESC LIMIT ?"
+        params.append(max_results)
+
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+
+        # Header and label matches are exact for every mirrored message and the mirror holds
+        # the newest ones, so a full page of hits is the right answer. A short page may be
+        # missing older messages unless the mirror holds the whole mailbox.
+        if len(rows) < max_results and not self.complete:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return [self._to_message(row) for row in rows]
+
+    @staticmethod
+    def _to_message(row) -> dict:
+        headers = [
+            {'name': name, 'value': row[column]}
+            for name, column in (('From', 'sender'), ('Subject', 'subject'), ('Date', 'date'))
+            if row[column] is not None
+        ]
+        return {
+            'id': row['id'],
+            'threadId': row['thread_id'],
+            'internalDate': str(row['internal_date']),
+            'labelIds': row['labels'].split(),
+            'snippet': row['snippet'],
+            'payload': {'headers': headers},
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_mailbox_cache() -> MailboxCache:
+    """Get or create the shared mailbox mirror (singleton pattern)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = MailboxCache()
+        return _cache
@@ -0,0 +1,230 @@
+"""
+Gmail tools for the main2 agent
+Every tool has a sync and an async entry point (for app.stream and app.astream).
+Both run the blocking GmailAgent call on a shared, bounded thread pool, so independent
+tool calls from one model message run concurrently, capped at MAX_CONCURRENT_TOOLS,
+and each call is cut off after its own timeout. Read results are served from the
+tool result cache (agent_cache) until their TTL runs out or a write invalidates them.
+A write that times out keeps running, so it is reported as "outcome unknown" rather
+than failed, and an identical write still in flight is never submitted twice.
+"""
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+from langchain_core.tools import StructuredTool
+
+from agent_cache import get_tool_cache, tool_key
+from gmail_agent import get_gmail_agent, gmail_agent_tool as _gmail_agent_query
+import tracing
+
+# ---------------- CONFIG ----------------
+MAX_CONCURRENT_TOOLS = 4  # Gmail calls in flight at once, across all tool calls
+DEFAULT_TOOL_TIMEOUT = 20.0  # seconds
+TOOL_TIMEOUTS = {
+    "read_emails": 15.0,
+    "search_emails": 15.0,
+    "get_email_body": 15.0,
+    "send_email": 20.0,
+    "mark_as_read": 10.0,
+    "gmail_agent_tool": 30.0,
+}
+# Tools that change the mailbox: a retry after a timeout could repeat the change
+WRITE_TOOLS = {
+    "send_email": "check the Sent folder before sending again",
+    "mark_as_read": "check whether the message is still unread",
+}
+# ---------------------------------------
+
+_pool = None
+_pool_lock = threading.Lock()
+_writes_in_flight = {}  # tool_key -> future of a write that hasn't finished yet
+_writes_lock = threading.Lock()
+
+
+def _get_pool() -> concurrent.futures.ThreadPoolExecutor:
+    """Get or create the tool thread pool (singleton pattern); its size is the concurrency cap"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=MAX_CONCURRENT_TOOLS, thread_name_prefix="gmail-tool"
+            )
+        return _pool
+
+
+def _traced(name: str, fn, *args):
+    """Runs on the pool: the call itself, then cache bookkeeping for its result"""
+    cache = get_tool_cache()
+    with tracing.span(f"tool.{name}"):
+        generation = cache.generation(name)
+        start = time.perf_counter()
+        try:
+            result = fn(*args)
+        finally:
+            # A write that failed part-way may still have changed the mailbox
+            cache.invalidate_after(name)
+        cache.put(name, args, result, time.perf_counter() - start, generation)
+        return result
+
+
+def _unknown_outcome(name: str, why: str) -> str:
+    return f"{why}, so the outcome is unknown. Do not retry it; {WRITE_TOOLS[name]}."
+
+
+def _timeout_message(name: str, timeout: float) -> str:
+    if name in WRITE_TOOLS:
+        return _unknown_outcome(name, f"{name} did not finish within {timeout:g}s and is still running")
+    return f"{name} timed out after {timeout:g}s, Gmail did not answer in time."
+
+
+def _submit(name: str, fn, args: tuple):
+    """Start the call on the pool; (future, None), or (None, message) when the same write is still running"""
+    if name not in WRITE_TOOLS:
+        return _get_pool().submit(tracing.bind(_traced), name, fn, *args), None
+    key = tool_key(name, args)
+    with _writes_lock:
+        running = _writes_in_flight.get(key)
+        if running is not None and not running.done():
+            return None, _unknown_outcome(name, f"The same {name} call is still running")
+        future = _writes_in_flight[key] = _get_pool().submit(tracing.bind(_traced), name, fn, *args)
+    future.add_done_callback(lambda done: _forget_write(key, done))
+    return future, None
+
+
+def _forget_write(key: str, future):
+    with _writes_lock:
+        if _writes_in_flight.get(key) is future:
+            del _writes_in_flight[key]
+
+
+def _timed_out(name: str, timeout: float) -> str:
+    if name in WRITE_TOOLS:
+        # Reads cached from now on must not outlive the write when it lands
+        get_tool_cache().invalidate_after(name)
+    return _timeout_message(name, timeout)
+
+
+def _call(name: str, fn, *args) -> str:
+    """Run fn(*args) on the tool pool and wait for it, up to the tool's timeout"""
+    cached = get_tool_cache().get(name, args)
+    if cached is not None:
+        return cached
+    timeout = TOOL_TIMEOUTS.get(name, DEFAULT_TOOL_TIMEOUT)
+    future, busy = _submit(name, fn, args)
+    if future is None:
+        return busy
+    try:
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        return _timed_out(name, timeout)
+
+
+async def _acall(name: str, fn, *args) -> str:
+    """Async form of _call; awaiting lets the other tool calls of the turn proceed"""
+    cached = get_tool_cache().get(name, args)
+    if cached is not None:
+        return cached
+    timeout = TOOL_TIMEOUTS.get(name, DEFAULT_TOOL_TIMEOUT)
+    future, busy = _submit(name, fn, args)
+    if future is None:
+        return busy
+    waiter = asyncio.wrap_future(future)
+    if name in WRITE_TOOLS:
+        # A timed-out write keeps running (or waiting for a worker); never drop it silently
+        waiter = asyncio.shield(waiter)
+    try:
+        return await asyncio.wait_for(waiter, timeout)
+    except asyncio.TimeoutError:
+        return _timed_out(name, timeout)
+
+
+# GmailAgent instances are per thread (httplib2 is not thread-safe),
+# so each body looks its agent up on the pool thread it runs on.
+
+def _read_emails(max_results: int) -> str:
+    return get_gmail_agent().read_emails(max_results=max_results)
+
+
+def _search_emails(query: str, max_results: int) -> str:
+    return get_gmail_agent().search_emails(query=query, max_results=max_results)
+
+
+def _get_email_body(message_id: str) -> str:
+    return get_gmail_agent().get_email_body(message_id)
+
+
+def _send_email(to: str, subject: str, body: str) -> str:
+    return get_gmail_agent().send_email(to, subject, body)
+
+
+def _mark_as_read(message_id: str) -> str:
+    return get_gmail_agent().mark_as_read(message_id)
+
+
+def read_emails(max_results: int = 10) -> str:
+    """Read the most recent emails in the inbox. Returns sender, subject, date, preview and ID of each."""
+    return _call("read_emails", _read_emails, max_results)
+
+
+async def aread_emails(max_results: int = 10) -> str:
+    return await _acall("read_emails", _read_emails, max_results)
+
+
+def search_emails(query: str, max_results: int = 10) -> str:
+    """Search emails with a Gmail query such as 'from:alice is:unread' or 'subject:invoice'."""
+    return _call("search_emails", _search_emails, query, max_results)
+
+
+async def asearch_emails(query: str, max_results: int = 10) -> str:
+    return await _acall("search_emails", _search_emails, query, max_results)
+
+
+def get_email_body(message_id: str) -> str:
+    """Get the full plain-text body of one email by its ID."""
+    return _call("get_email_body", _get_email_body, message_id)
+
+
+async def aget_email_body(message_id: str) -> str:
+    return await _acall("get_email_body", _get_email_body, message_id)
+
+
+def send_email(to: str, subject: str, body: str) -> str:
+    """Send an email to the given address."""
+    return _call("send_email", _send_email, to, subject, body)
+
+
+async def asend_email(to: str, subject: str, body: str) -> str:
+    return await _acall("send_email", _send_email, to, subject, body)
+
+
+def mark_as_read(message_id: str) -> str:
+    """Mark one email as read by its ID."""
+    return _call("mark_as_read", _mark_as_read, message_id)
+
+
+async def amark_as_read(message_id: str) -> str:
+    return await _acall("mark_as_read", _mark_as_read, message_id)
+
+
+def gmail_agent_tool(query: str) -> str:
+    """Hand a plain-language request to read or search Gmail to the Gmail agent. It cannot send; use send_email."""
+    return _call("gmail_agent_tool", _gmail_agent_query, query)
+
+
+async def agmail_agent_tool(query: str) -> str:
+    return await _acall("gmail_agent_tool", _gmail_agent_query, query)
+
+
+GMAIL_TOOLS = [
+    StructuredTool.from_function(func=func, coroutine=coroutine)
+    for func, coroutine in [
+        (read_emails, aread_emails),
+        (search_emails, asearch_emails),
+        (get_email_body, aget_email_body),
+        (send_email, asend_email),
+        (mark_as_read, amark_as_read),
+        (gmail_agent_tool, agmail_agent_tool),
+    ]
+]
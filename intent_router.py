@@ -0,0 +1,255 @@
+"""
+Zero-LLM fast path
+A router compiled into one regex that runs before the model: trigger phrases and
+unambiguous commands ("read my emails", "what time is it") are answered directly,
+anything else falls through to the LLM. Hit rate and LLM time saved are tracked.
+"""
+import re
+import threading
+from datetime import datetime
+
+# ---------------- CONFIG ----------------
+ROUTER_ENABLED = True
+DEFAULT_EMAIL_COUNT = 5  # "read my emails" without a number
+MAX_EMAIL_COUNT = 20
+# ---------------------------------------
+
+# User-defined trigger phrases (matched after normalization) and the reply to give
+TRIGGER_PHRASES = {
+    "thank you": "You're welcome!",
+    "thanks": "You're welcome!",
+    "never mind": "Okay.",
+}
+
+GOODBYE = "Goodbye! Have a great day!"
+
+_NUMBERS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+            "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10}
+_GROUP = re.compile(r"\(\?P<(\w+)>")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, punctuation to spaces, single spaces: Whisper's "Go to sleep, Whistle!" == typed text"""
+    return " ".join(re.sub(r"[^\w\s']", " ", text.lower()).split())
+
+
+class KeywordMatcher:
+    """
+    Ordered keyword lists compiled into one alternation; match() returns the name of
+    the earliest list with a keyword anywhere in the text (substring match, like `in`).
+    """
+
+    def __init__(self, entries: list):
+        self._names = [name for name, _ in entries]
+        self._pattern = re.compile("|".join(
+            f"(?P<k{i}>{'|'.join(re.escape(word) for word in words)})"
+            for i, (_, words) in enumerate(entries)
+        ))
+
+    def match(self, text: str):
+        found = {int(m.lastgroup[1:]) for m in self._pattern.finditer(text)}
+        return self._names[min(found)] if found else None
+
+
+class Route:
+    """A fast-path answer"""
+
+    def __init__(self, intent: str, reply: str, exit: bool = False):
+        self.intent = intent
+        self.reply = reply
+        self.exit = exit
+
+
+class IntentRouter:
+    """
+    Intents are regexes that must match the whole normalized input, so a command
+    buried in a longer request ("read my emails and tell me which is urgent") is
+    left to the LLM. Handlers get the intent's named groups and return the reply.
+    """
+
+    def __init__(self):
+        self._intents = []  # (name, pattern, handler, llm_calls)
+        self._compiled = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.intent_hits = {}
+        self.llm_seconds = 2.0  # running average of one model call, refined by record_llm_seconds
+        self.llm_seconds_saved = 0.0
+
+    def add(self, name: str, pattern: str, handler, llm_calls: int = 1):
+        """
+        Register an intent. llm_calls is how many model calls the LLM path would
+        have needed (2 for tool intents: the tool call, then the answer).
+        """
+        self._intents.append((name, pattern, handler, llm_calls))
+        self._compiled = None
+
+    def add_trigger(self, phrase: str, reply: str):
+        self.add(f"trigger:{phrase}", re.escape(normalize(phrase)), lambda: reply)
+
+    def _compile(self):
+        parts = []
+        for i, (_, pattern, _, _) in enumerate(self._intents):
+            # Prefix group names per intent so alternatives can reuse names like "n"
+            parts.append(f"(?P<i{i}>{_GROUP.sub(lambda m: f'(?P<i{i}_{m.group(1)}>', pattern)})")
+        self._compiled = re.compile("|".join(parts))
+
+    def match(self, text: str):
+        """(intent index, groups) for the input, or None; no handler is run and no stats change"""
+        if self._compiled is None:
+            self._compile()
+        m = self._compiled.fullmatch(normalize(text))
+        if m is None:
+            return None
+        index = int(m.lastgroup[1:])
+        prefix = f"i{index}_"
+        groups = {key[len(prefix):]: value for key, value in m.groupdict().items()
+                  if key.startswith(prefix) and value is not None}
+        return index, groups
+
+    def is_exit(self, text: str) -> bool:
+        matched = self.match(text)
+        return matched is not None and self._intents[matched[0]][0] == "exit"
+
+    def route(self, text: str):
+        """Route for the input, or None when the LLM should handle it"""
+        if not ROUTER_ENABLED or not text:
+            return None
+        matched = self.match(text)
+        if matched is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        index, groups = matched
+        name, _, handler, llm_calls = self._intents[index]
+        if name == "exit":
+            return Route(name, GOODBYE, exit=True)
+        try:
+            reply = handler(**groups)
+        except Exception as e:
+            print(f"[router] {name} failed ({e}), falling back to the LLM")
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            self.intent_hits[name] = self.intent_hits.get(name, 0) + 1
+            self.llm_seconds_saved += llm_calls * self.llm_seconds
+        return Route(name, reply)
+
+    def record_llm_seconds(self, seconds: float):
+        """Feed in measured model call times so the savings estimate tracks the real model"""
+        with self._lock:
+            self.llm_seconds += 0.2 * (seconds - self.llm_seconds)
+
+    @property
+    def hit_rate(self) -> float:
+        routed = self.hits + self.misses
+        return self.hits / routed if routed else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+            "llm_seconds_saved": round(self.llm_seconds_saved, 2),
+            "intents": dict(self.intent_hits),
+        }
+
+    def report(self) -> str:
+        return (f"[router] {self.hits} of {self.hits + self.misses} inputs answered without the LLM "
+                f"({self.hit_rate:.0%}), ~{self.llm_seconds_saved:.1f}s of generation saved")
+
+
+# ---------------- built-in intents ----------------
+
+_EMAILS = r"(?:e ?mails?|mails?|messages|inbox)"
+_COUNT = r"(?P<n>\d+|" + "|".join(_NUMBERS) + r")"
+
+
+def _count(n) -> int:
+    if n is None:
+        return DEFAULT_EMAIL_COUNT
+    return max(1, min(MAX_EMAIL_COUNT, _NUMBERS.get(n) or int(n)))
+
+
+def _speak_summaries(summaries: str, empty: str) -> str:
+    """Turn GmailAgent summaries into a short spoken list (the IDs etc. are for the model)"""
+    if not summaries or summaries.startswith(("No messages", "An error", "Error")) or "timed out" in summaries:
+        return empty if summaries.startswith("No messages") else summaries
+    items = []
+    for block in summaries.split("\n---\n"):
+        fields = dict(line.split(": ", 1) for line in block.strip().splitlines() if ": " in line)
+        sender = fields.get("From", "someone").split("<")[0].strip().strip('"') or "someone"
+        items.append(f"from {sender}: {fields.get('Subject', 'no subject')}")
+    count = f"{len(items)} email" + ("s" if len(items) != 1 else "")
+    return f"I found {count}. " + " ".join(f"{i}. {item}." for i, item in enumerate(items, 1))
+
+
+def _read_emails(n=None) -> str:
+    import gmail_tools
+    return _speak_summaries(gmail_tools.read_emails(max_results=_count(n)), "Your inbox is empty.")
+
+
+def _unread_emails(n=None) -> str:
+    import gmail_tools
+    return _speak_summaries(gmail_tools.search_emails("is:unread", max_results=_count(n)),
+                            "You have no unread emails.")
+
+
+def _emails_from(sender: str, n=None) -> str:
+    import gmail_tools
+    return _speak_summaries(gmail_tools.search_emails(f'from:"{sender}"', max_results=_count(n)),
+                            f"I found no emails from {sender}.")
+
+
+def _time() -> str:
+    return f"It's {datetime.now().strftime('%I:%M %p').lstrip('0')}."
+
+
+def _date() -> str:
+    now = datetime.now()
+    return f"Today is {now.strftime('%A, %B')} {now.day}, {now.year}."
+
+
+def build_default_router(email: bool = True) -> IntentRouter:
+    """email=False leaves out the intents that read the owner's mailbox (server mode)"""
+    router = IntentRouter()
+    router.add("exit", r"(?:please )?(?:go to )?sleep whistle", None)
+    if email:
+        _add_email_intents(router)
+    router.add("time", r"what time is it(?: now)?|what's the time(?: now)?", _time)
+    router.add("date", r"what's the date(?: today)?|what is the date(?: today)?|what day is it(?: today)?", _date)
+    for phrase, reply in TRIGGER_PHRASES.items():
+        router.add_trigger(phrase, reply)
+    return router
+
+
+def _add_email_intents(router: IntentRouter):
+    router.add("unread_emails",
+               rf"(?:(?:read|show|check|list|get)(?: me)? (?:my )?|(?:do i have |are there )?any )"
+               rf"(?:{_COUNT} )?(?:new )?unread {_EMAILS}(?: please)?",
+               _unread_emails, llm_calls=2)
+    router.add("read_emails",
+               rf"(?:please )?(?:read|show|list|check|get)(?: me)? (?:my )?(?:(?:last|latest|recent|newest|new) )?"
+               rf"(?:{_COUNT} )?(?:(?:new|recent|latest) )?{_EMAILS}(?: please)?",
+               _read_emails, llm_calls=2)
+    router.add("emails_from",
+               rf"(?:search|find|show|read|check)(?: me)? (?:my )?(?:{_COUNT} )?{_EMAILS} from (?P<sender>[\w' ]+)",
+               _emails_from, llm_calls=2)
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_intent_router() -> IntentRouter:
+    """Get or create the shared intent router (singleton pattern)"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = build_default_router()
+        return _router
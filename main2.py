@@ -1,155 +1,598 @@
-from pickle import NONE
-from typing import Annotated, Sequence, TypedDict
-from dotenv import load_dotenv
-from langchain_core.messages import BaseMessage
-from langchain_core.messages import ToolMessage
-from langchain_core.messages import SystemMessage
-from langchain_core.messages import HumanMessage
-from langchain_core.messages import AIMessage
-from langchain_core.tools import tool
-from langchain_ollama import ChatOllama
-from langgraph.graph.message import add_messages
-from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
-from speechtotext import speech_to_text
-from texttospeech_piper import text_to_speech_live  # Using local Piper TTS for faster response
-import concurrent.futures
-import time
-
-load_dotenv()
-
-
-class AgentState(TypedDict):
-    messages: Annotated[Sequence[BaseMessage], add_messages]
-
-
-# Define your tools here
-# Example:
-# @tool
-# def your_tool_name(param: type):
-#     """Tool description"""
-#     return result
-
-tools = []
-
-model = ChatOllama(model="llama3.1:8b").bind_tools(tools)
-
-
-def model_call(state: AgentState) -> AgentState:
-    system_prompt = SystemMessage(content="""You are a helpful AI assistant. 
-
-                        Respond naturally to user questions and engage in conversation.
-
-                        When tools are available and the user's request requires them, use the appropriate tool.""")
-
-    response = model.invoke([system_prompt] + state["messages"])
-    return {"messages": [response]}
-
-
-def should_continue(state: AgentState):
-    messages = state["messages"]
-    last_message = messages[-1]
-
-    if not last_message.tool_calls:
-        return "end"
-    else:
-        return "continue"
-
-
-graph = StateGraph(AgentState)
-graph.add_node("our_agent", model_call)
-
-tool_node = ToolNode(tools=tools)
-graph.add_node("tools", tool_node)
-
-graph.set_entry_point("our_agent")
-
-graph.add_conditional_edges(
-    "our_agent",
-    should_continue,
-    {
-        "continue": "tools",
-        "end": END,
-    }
-)
-graph.add_edge("tools", "our_agent")
-
-app = graph.compile()
-
-
-def run_agent(user_input: str, conversation_history: list):
-    """
-    Run the agent with user input and maintain conversation history
-    """
-    conversation_history.append(HumanMessage(content=user_input))
-
-    inputs = {"messages": conversation_history}
-
-    final_state = None
-    for s in app.stream(inputs, stream_mode="values"):
-        final_state = s
-
-    return final_state["messages"]
-
-
-def chat_loop():
-    """
-    Main chat loop for continuous conversation
-    """
-    print("=" * 60)
-    print("AI Assistant Chat - use \"Go to sleep whistle!\" to end")
-    print("=" * 60)
-    print()
-
-    conversation_history = []
-    choice_of_text = None
-
-    while True:
-        if choice_of_text is None:
-            user_input = input("press M to talk \n")
-            if user_input.lower() == "m":
-                user_input = speech_to_text()
-                choice_of_text = False
-
-            else:
-                choice_of_text = True
-        elif choice_of_text == False:
-            user_input = speech_to_text()
-        elif choice_of_text == True:
-            user_input = input("You: ").strip()
-
-        if user_input.lower() == "go to sleep whistle!":
-            print("\nAssistant: Goodbye! Have a great day!")
-            break
-        if not user_input:
-            continue
-
-        try:
-            conversation_history = run_agent(user_input, conversation_history)
-
-            last_message = conversation_history[-1]
-            if isinstance(last_message, AIMessage):
-                response_text = last_message.content if last_message.content else "[Tool call executed]"
-                print(f"\nAssistant: {response_text}\n")
-                # Play the response as audio
-                if response_text != "[Tool call executed]":
-                    text_to_speech_live(response_text)
-            else:
-                response_text = last_message.content
-                print(f"\nAssistant: {response_text}\n")
-                # Play the response as audio
-                text_to_speech_live(response_text)
-            
-            # # Ask user if they want to continue
-            # continue_input = input("Press 'M' for speech input, Enter to continue with text, or 'Q' to quit: ").strip().lower()
-            # if continue_input == 'q':
-            #     print("\nAssistant: Goodbye! Have a great day!")
-            #     break
-
-        except Exception as e:
-            print(f"\nError: {str(e)}\n")
-            print("Please try again.\n")
-
-
-if __name__ == "__main__":
-    chat_loop()
\ No newline at end of file
+from pickle import NONE
+from typing import Annotated, Sequence, TypedDict
+from dotenv import load_dotenv
+from langchain_core.messages import BaseMessage
+from langchain_core.messages import ToolMessage
+from langchain_core.messages import SystemMessage
+from langchain_core.messages import HumanMessage
+from langchain_core.messages import AIMessage
+from langchain_core.messages import AIMessageChunk
+from langchain_core.tools import tool
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langchain_ollama import ChatOllama
+from langgraph.graph.message import add_messages
+from langgraph.graph import StateGraph, END
+from langgraph.prebuilt import ToolNode
+from speech_pipeline import SentenceChunker, SpeechPipeline
+from context_window import ContextManager, estimate_tokens
+from tts_cache import get_phrase_cache
+from intent_router import get_intent_router
+from agent_cache import get_semantic_cache, get_tool_cache
+from checkpoint import CHECKPOINTS_ENABLED, SESSION_ID, get_checkpointer
+import tracing
+# speechtotext / barge_in (sounddevice, webrtcvad, Whisper) are imported on first voice use,
+# so text-only sessions never pay for them. The Piper backend (audio output) and the Gmail
+# tools (Google client libraries) are imported by startup()'s warmup, off the import path
+import asyncio
+import concurrent.futures
+import contextlib
+import threading
+import time
+
+load_dotenv()
+
+# Speak the reply sentence by sentence while the LLM is still generating
+STREAMING_TTS = True
+
+# Run the conversation on the asyncio runtime (async_runtime.py) instead of the blocking chat_loop
+ASYNC_RUNTIME = True
+
+# In voice mode keep the mic open while the assistant talks and stop talking when the user speaks
+BARGE_IN = True
+
+OLLAMA_MODEL = "llama3.1:8b"
+# How long Ollama keeps the model in memory after a request, so idle pauses don't force a cold reload
+OLLAMA_KEEP_ALIVE = "30m"
+
+
+class AgentState(TypedDict):
+    messages: Annotated[Sequence[BaseMessage], add_messages]
+
+
+# Define your tools here
+# Example:
+# @tool
+# def your_tool_name(param: type):
+#     """Tool description"""
+#     return result
+
+base_model = ChatOllama(model=OLLAMA_MODEL, keep_alive=OLLAMA_KEEP_ALIVE)
+_model = None
+_tool_node = None
+
+
+def get_model():
+    """base_model with the tools bound (singleton pattern); imports the Gmail tools on first use"""
+    global _model
+    if _model is None:
+        _model = base_model.bind_tools(get_tools())
+    return _model
+
+
+def get_tools() -> list:
+    # Gmail tools run on a bounded pool with per-tool timeouts (see gmail_tools)
+    from gmail_tools import GMAIL_TOOLS
+    return [*GMAIL_TOOLS]
+
+
+def _get_tool_node() -> ToolNode:
+    """ToolNode executes the independent tool calls of one model message concurrently"""
+    global _tool_node
+    if _tool_node is None:
+        _tool_node = ToolNode(tools=get_tools())
+    return _tool_node
+
+
+def _tts():
+    """The Piper TTS backend (local, faster response), imported on first use"""
+    import texttospeech_piper
+    return texttospeech_piper
+
+# Built once and always sent first, so Ollama can reuse the cached prompt prefix across turns
+SYSTEM_PROMPT = SystemMessage(content="""You are a helpful AI assistant. 
+
+                        Respond naturally to user questions and engage in conversation.
+
+                        When tools are available and the user's request requires them, use the appropriate tool.
+                        If a request needs several independent tool calls, make them all in one step.""")
+
+# Keeps recent turns verbatim and folds older ones into a rolling summary in the background
+context = ContextManager(summarizer=base_model)
+
+# Trigger phrases and unambiguous commands are answered without the LLM (see intent_router)
+router = get_intent_router()
+# Opt-in (SEMANTIC_CACHE=1): reuse recent answers to near-identical questions, None when off
+answers = get_semantic_cache()
+
+
+def _session(config: RunnableConfig):
+    """
+    Per-session objects: the server passes its own context manager, answer cache, LLM
+    slot, model (without the Gmail tools) and router in config["configurable"]; the CLI
+    uses the module globals
+    """
+    configurable = (config or {}).get("configurable", {})
+    return {
+        "context": configurable.get("context", context),
+        "answers": configurable.get("answers", answers),
+        "llm_slot": configurable.get("llm_slot"),
+        "model": configurable.get("model") or get_model(),
+        "router": configurable.get("router", router),
+    }
+
+
+def _record_response(span, session: dict, prompt: list, response, seconds: float):
+    session["router"].record_llm_seconds(seconds)
+    if tracing.is_enabled():
+        metadata = response.response_metadata or {}
+        span.set(prompt_tokens=metadata.get("prompt_eval_count") or sum(estimate_tokens(m) for m in prompt),
+                 completion_tokens=metadata.get("eval_count", 0),
+                 tool_calls=len(response.tool_calls))
+
+
+def _after_response(state: AgentState, session: dict, prompt: list, response):
+    session["context"].log_turn(prompt, response)
+    if not response.tool_calls:
+        session["context"].maybe_compact(list(state["messages"]) + [response])
+        question = _turn_question(state["messages"])
+        if session["answers"] is not None and question is not None and response.content:
+            session["answers"].put(question, response.content)
+    return {"messages": [response]}
+
+
+def model_call(state: AgentState, config: RunnableConfig) -> AgentState:
+    session = _session(config)
+    prompt = session["context"].build(SYSTEM_PROMPT, state["messages"])
+    with tracing.span("llm", model=OLLAMA_MODEL, messages=len(prompt)) as span:
+        start = time.perf_counter()
+        response = session["model"].invoke(prompt)
+        _record_response(span, session, prompt, response, time.perf_counter() - start)
+    return _after_response(state, session, prompt, response)
+
+
+async def amodel_call(state: AgentState, config: RunnableConfig) -> AgentState:
+    """Used by app.astream; waits for a free Ollama slot when the server hands one out"""
+    session = _session(config)
+    prompt = session["context"].build(SYSTEM_PROMPT, state["messages"])
+    llm_slot = session["llm_slot"]
+    with tracing.span("llm", model=OLLAMA_MODEL, messages=len(prompt)) as span:
+        async with (llm_slot() if llm_slot is not None else contextlib.nullcontext()):
+            start = time.perf_counter()
+            response = await session["model"].ainvoke(prompt)
+        _record_response(span, session, prompt, response, time.perf_counter() - start)
+    return _after_response(state, session, prompt, response)
+
+
+def _turn_question(messages):
+    """The user message of the current turn, or None if the turn used tools (fresh data, not cached)"""
+    for message in reversed(messages):
+        if isinstance(message, ToolMessage):
+            return None
+        if isinstance(message, HumanMessage):
+            return message.content
+    return None
+
+
+def should_continue(state: AgentState):
+    messages = state["messages"]
+    last_message = messages[-1]
+
+    if not last_message.tool_calls:
+        return "end"
+    else:
+        return "continue"
+
+
+def route_input(state: AgentState, config: RunnableConfig) -> AgentState:
+    """Answer the new user message directly: intent router first, then the answer cache"""
+    session = _session(config)
+    session_answers = session["answers"]
+    last_message = state["messages"][-1]
+    if not isinstance(last_message, HumanMessage):
+        return {"messages": []}
+    with tracing.span("router") as span:
+        route = session["router"].route(last_message.content)
+        span.set(intent=route.intent if route else None)
+    if route is not None:
+        return {"messages": [AIMessage(content=route.reply)]}
+    if session_answers is not None:
+        with tracing.span("answer_cache") as span:
+            answer = session_answers.lookup(last_message.content)
+            span.set(hit=answer is not None)
+        if answer is not None:
+            return {"messages": [AIMessage(content=answer)]}
+    return {"messages": []}
+
+
+def after_router(state: AgentState):
+    return "end" if isinstance(state["messages"][-1], AIMessage) else "agent"
+
+
+def run_tools(state: AgentState, config: RunnableConfig):
+    calls = [call["name"] for call in state["messages"][-1].tool_calls]
+    with tracing.span("tools", tools=",".join(calls), calls=len(calls)):
+        return _get_tool_node().invoke(state, config)
+
+
+async def arun_tools(state: AgentState, config: RunnableConfig):
+    """Used by app.astream: the tools' coroutines run together on the event loop"""
+    calls = [call["name"] for call in state["messages"][-1].tool_calls]
+    with tracing.span("tools", tools=",".join(calls), calls=len(calls)):
+        return await _get_tool_node().ainvoke(state, config)
+
+
+def build_graph(with_tools: bool = True):
+    """
+    router -> our_agent (<-> tools). with_tools=False leaves the tools node out, for
+    callers that also pass a model without tools bound (the server)
+    """
+    graph = StateGraph(AgentState)
+    graph.add_node("router", route_input)
+    graph.add_node("our_agent", RunnableLambda(model_call, afunc=amodel_call))
+
+    graph.set_entry_point("router")
+
+    graph.add_conditional_edges(
+        "router",
+        after_router,
+        {
+            "agent": "our_agent",
+            "end": END,
+        }
+    )
+
+    if not with_tools:
+        graph.add_edge("our_agent", END)
+        return graph.compile()
+
+    graph.add_node("tools", RunnableLambda(run_tools, afunc=arun_tools))
+    graph.add_conditional_edges(
+        "our_agent",
+        should_continue,
+        {
+            "continue": "tools",
+            "end": END,
+        }
+    )
+    graph.add_edge("tools", "our_agent")
+    return graph.compile()
+
+
+app = build_graph()
+
+
+def restore_session() -> list:
+    """
+    Resume SESSION_ID from its checkpoint: returns the messages after the latest
+    summary and loads that summary into the context manager
+    """
+    if not CHECKPOINTS_ENABLED:
+        return []
+    checkpoint = get_checkpointer().restore(SESSION_ID)
+    if checkpoint.history or checkpoint.summary:
+        context.restore(checkpoint.summary, checkpoint.summarized_upto)
+        print(f"[checkpoint] resumed '{SESSION_ID}': {len(checkpoint.history)} recent messages"
+              f"{' and a summary' if checkpoint.summary else ''} in {checkpoint.restore_seconds * 1000:.1f} ms\n")
+    return checkpoint.history
+
+
+def save_session(conversation_history: list):
+    """Append this turn's messages (and a new summary, if any) to the checkpoint"""
+    if not CHECKPOINTS_ENABLED:
+        return
+    summary, summarized_upto = context.snapshot()
+    try:
+        get_checkpointer().save(conversation_history, SESSION_ID, summary, summarized_upto)
+    except Exception as e:
+        print(f"[checkpoint] save failed: {e}")
+
+
+def print_session_report():
+    """Hit rates and time saved by the caches and the intent router"""
+    print(get_phrase_cache().report())
+    print(get_tool_cache().report())
+    if answers is not None:
+        print(answers.report())
+    print(router.report())
+
+
+def run_agent(user_input: str, conversation_history: list):
+    """
+    Run the agent with user input and maintain conversation history
+    """
+    conversation_history.append(HumanMessage(content=user_input))
+
+    inputs = {"messages": conversation_history}
+
+    final_state = None
+    with tracing.span("agent", chars=len(user_input)):
+        for s in app.stream(inputs, stream_mode="values"):
+            final_state = s
+
+    return final_state["messages"]
+
+
+def run_agent_streaming(user_input: str, conversation_history: list, on_token, should_stop=None):
+    """
+    Like run_agent, but calls on_token(text) for every token the model
+    generates in the our_agent node while the graph is still running.
+
+    If should_stop() becomes true the generation is abandoned and the
+    partial reply is kept in the history.
+    """
+    conversation_history.append(HumanMessage(content=user_input))
+
+    inputs = {"messages": conversation_history}
+
+    final_state = None
+    partial_reply = []
+    with tracing.span("agent", chars=len(user_input), streaming=True) as span:
+        for mode, chunk in app.stream(inputs, stream_mode=["messages", "values"]):
+            if mode == "messages":
+                message, metadata = chunk
+                if (isinstance(message, AIMessageChunk) and message.content
+                        and metadata.get("langgraph_node") == "our_agent"):
+                    partial_reply.append(message.content)
+                    on_token(message.content)
+            else:
+                final_state = chunk
+                partial_reply = []
+            if should_stop is not None and should_stop():
+                span.set(interrupted=True)
+                break
+
+    messages = list(final_state["messages"]) if final_state else list(conversation_history)
+    if partial_reply:
+        messages.append(AIMessage(content="".join(partial_reply)))
+    return messages
+
+
+def speak_streaming(user_input: str, conversation_history: list, pipeline: SpeechPipeline,
+                    mic=None):
+    """
+    Run one turn, printing tokens as they arrive and handing each finished
+    sentence to the speech pipeline. Returns the updated history.
+
+    With a mic, the user can barge in: speaking cancels the rest of the reply
+    and the captured audio is left on the mic for the next speech_to_text().
+    """
+    chunker = SentenceChunker()
+    first_token_at = None
+    interrupted = threading.Event()
+
+    tts = _tts()
+
+    def on_barge_in():
+        interrupted.set()
+        pipeline.cancel()
+        tts.stop_playback()
+        print("\n[barge-in] stopped speaking")
+
+    def on_token(token):
+        nonlocal first_token_at
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+            print("\nAssistant: ", end="", flush=True)
+        print(token, end="", flush=True)
+        for sentence in chunker.feed(token):
+            if not interrupted.is_set():
+                pipeline.say(sentence)
+
+    pipeline.start_turn()
+    if mic is not None:
+        mic.start_monitoring(tts.is_playing, on_barge_in)
+
+    try:
+        conversation_history = run_agent_streaming(
+            user_input, conversation_history, on_token, should_stop=interrupted.is_set
+        )
+        if not interrupted.is_set():
+            pipeline.say(chunker.flush())
+        print("\n")
+
+        if first_token_at is None and not interrupted.is_set():
+            # Nothing was streamed (e.g. the turn ended on a tool call), speak the final message
+            last_message = conversation_history[-1]
+            if last_message.content:
+                print(f"Assistant: {last_message.content}\n")
+                pipeline.say(last_message.content)
+
+        pipeline.wait()
+    finally:
+        if mic is not None:
+            mic.stop_monitoring()
+
+    if interrupted.is_set():
+        print(f"[latency] barge-in after {mic.triggered_at - pipeline.turn_started_at:.2f}s\n")
+        return conversation_history
+
+    total = time.perf_counter() - pipeline.turn_started_at
+    ttft = f"{first_token_at - pipeline.turn_started_at:.2f}s" if first_token_at else "n/a"
+    ttfa = pipeline.time_to_first_audio
+    ttfa = f"{ttfa:.2f}s" if ttfa is not None else "n/a"
+    print(f"[latency] first token {ttft}, first audio {ttfa}, turn {total:.2f}s")
+    print(f"{context.last_log}\n")
+
+    return conversation_history
+
+
+def warm_ollama():
+    """
+    Make Ollama load the model now, and evaluate the system prompt and tool
+    schemas once so later turns hit the prompt cache.
+    """
+    get_model().invoke([SYSTEM_PROMPT, HumanMessage(content="Hi")], options={"num_predict": 1})
+
+
+def warm_whisper():
+    from transcriber import get_transcriber
+    get_transcriber()  # loads the model and runs its own dummy inference
+
+
+def startup(voice_input: bool) -> dict:
+    """
+    Load and warm every component in parallel and print a readiness report.
+
+    Returns {component: seconds} for the components that came up.
+    """
+    tasks = {
+        "ollama": warm_ollama,
+        "tts": lambda: _tts().warmup(),
+    }
+    if voice_input:
+        tasks["whisper"] = warm_whisper
+
+    def timed(fn):
+        start = time.perf_counter()
+        fn()
+        return time.perf_counter() - start
+
+    print("Starting up...")
+    start = time.perf_counter()
+    ready = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(tasks)) as pool:
+        futures = {name: pool.submit(timed, fn) for name, fn in tasks.items()}
+        for name, future in futures.items():
+            try:
+                ready[name] = future.result()
+                print(f"  [ready]  {name:8} {ready[name]:6.2f}s")
+            except Exception as e:
+                print(f"  [failed] {name:8} {e}")
+    print(f"Startup took {time.perf_counter() - start:.2f}s\n")
+    return ready
+
+
+def chat_loop():
+    """
+    Main chat loop for continuous conversation
+    """
+    print("=" * 60)
+    print("AI Assistant Chat - use \"Go to sleep whistle!\" to end")
+    print("=" * 60)
+    print()
+
+    conversation_history = restore_session()
+    choice_of_text = None
+    tts = _tts()
+    pipeline = SpeechPipeline(tts.synthesize, tts.play_audio, tts.wait_for_playback) if STREAMING_TTS else None
+    mic = None
+
+    while True:
+        tracing.start_turn()
+        if choice_of_text is None:
+            user_input = input("press M to talk \n")
+            if user_input.lower() == "m":
+                choice_of_text = False
+                startup(voice_input=True)
+                from speechtotext import speech_to_text
+                if BARGE_IN and pipeline is not None:
+                    from barge_in import MicCapture
+                    mic = MicCapture()
+                    mic.start()
+                user_input = speech_to_text(read_frame=mic.read if mic else None)
+
+            else:
+                choice_of_text = True
+                startup(voice_input=False)
+        elif choice_of_text == False:
+            user_input = speech_to_text(read_frame=mic.read if mic else None)
+        elif choice_of_text == True:
+            user_input = input("You: ").strip()
+
+        if router.is_exit(user_input):
+            print("\nAssistant: Goodbye! Have a great day!")
+            print_session_report()
+            break
+        if not user_input:
+            continue
+
+        try:
+            if pipeline is not None:
+                conversation_history = speak_streaming(user_input, conversation_history, pipeline, mic)
+                save_session(conversation_history)
+                continue
+
+            conversation_history = run_agent(user_input, conversation_history)
+            save_session(conversation_history)
+
+            last_message = conversation_history[-1]
+            if isinstance(last_message, AIMessage):
+                response_text = last_message.content if last_message.content else "[Tool call executed]"
+                print(f"\nAssistant: {response_text}\n")
+                print(f"{context.last_log}\n")
+                # Play the response as audio
+                if response_text != "[Tool call executed]":
+                    tts.text_to_speech_live(response_text)
+            else:
+                response_text = last_message.content
+                print(f"\nAssistant: {response_text}\n")
+                # Play the response as audio
+                tts.text_to_speech_live(response_text)
+            
+            # # Ask user if they want to continue
+            # continue_input = input("Press 'M' for speech input, Enter to continue with text, or 'Q' to quit: ").strip().lower()
+            # if continue_input == 'q':
+            #     print("\nAssistant: Goodbye! Have a great day!")
+            #     break
+
+        except Exception as e:
+            print(f"\nError: {str(e)}\n")
+            print("Please try again.\n")
+
+
+def async_chat_loop():
+    """
+    chat_loop on the asyncio runtime: input, LLM, synthesis and playback run
+    as concurrent stages, so typing (or barging in) cancels the reply in flight
+    """
+    from async_runtime import AssistantRuntime
+
+    print("=" * 60)
+    print("AI Assistant Chat - use \"Go to sleep whistle!\" to end")
+    print("=" * 60)
+    print()
+
+    user_input = input("press M to talk \n")
+    voice_input = user_input.lower() == "m"
+    startup(voice_input=voice_input)
+    tts = _tts()
+
+    mic = None
+    if voice_input:
+        from speechtotext import speech_to_text
+        if BARGE_IN:
+            from barge_in import MicCapture
+            mic = MicCapture()
+            mic.start()
+        listen = lambda: speech_to_text(read_frame=mic.read if mic else None)
+        first_input = None
+    else:
+        listen = lambda: input("You: ")
+        first_input = user_input
+
+    runtime = AssistantRuntime(
+        app, listen, tts.synthesize, tts.play_audio, tts.wait_for_playback, tts.stop_playback,
+        # During a reply the mic belongs to the barge-in monitor (and would otherwise hear the assistant)
+        listen_while_speaking=not voice_input,
+        is_exit=router.is_exit,
+        turn_log=lambda: context.last_log,
+        on_history=save_session,
+    )
+    runtime.history = restore_session()
+    if mic is not None:
+        runtime.on_turn_start = lambda: mic.start_monitoring(tts.is_playing, runtime.interrupt)
+        runtime.on_turn_end = mic.stop_monitoring
+
+    try:
+        asyncio.run(runtime.run(first_input))
+        print_session_report()
+    finally:
+        if mic is not None:
+            mic.close()
+
+
+if __name__ == "__main__":
+    if ASYNC_RUNTIME:
+        async_chat_loop()
+    else:
+        chat_loop()
\ No newline at end of file
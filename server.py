@@ -0,0 +1,533 @@
+"""
+Multi-session agent server
+Hosts the main2 graph for many clients over HTTP (stdlib asyncio, no extra dependencies).
+Each session has its own history, context summary and answer cache; replies stream back
+as NDJSON events: tokens as they are generated, then base64 PCM per sentence when audio
+is requested. Ollama calls share a bounded pool with round-robin queuing across sessions,
+and utterances that arrive together are transcribed by Whisper in one batch.
+The Gmail tools and email intents act on the owner's mailbox, so server sessions run
+without them: the graph has no tools node and the router has no email intents.
+
+    python server.py --port 8765
+    curl -X POST localhost:8765/sessions                        -> {"session": "..."}
+    curl -N -d '{"text": "hello"}' localhost:8765/sessions/<id>/chat
+
+Endpoints:
+    POST   /sessions                   new session
+    POST   /sessions/<id>/chat         {"text": ...} or {"pcm": base64 int16 16 kHz}, optional "audio": true
+    POST   /sessions/<id>/transcribe   raw int16 16 kHz PCM body -> {"text": ...}
+    DELETE /sessions/<id>
+    GET    /health                     sessions, Ollama pool and ASR batch stats
+    GET    /metrics                    tracing metrics (Prometheus text, needs TRACING=1)
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+import collections
+import concurrent.futures
+import contextlib
+import json
+import time
+import uuid
+
+import numpy as np
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+
+import main2
+from agent_cache import SEMANTIC_CACHE_ENABLED, SemanticCache
+from context_window import ContextManager
+from intent_router import build_default_router
+from speech_pipeline import SentenceChunker
+import tracing
+from transcriber import SAMPLE_RATE
+
+# ---------------- CONFIG ----------------
+HOST = "127.0.0.1"
+PORT = 8765
+MAX_CONCURRENT_LLM = 2  # Ollama generations at once (match OLLAMA_NUM_PARALLEL)
+MAX_SESSIONS = 1000
+SESSION_IDLE_TIMEOUT = 1800  # seconds; idle sessions are dropped when new ones are created
+MAX_BODY_BYTES = 10 * 1024 * 1024  # ~5 minutes of 16 kHz int16 audio
+ASR_BATCH_WINDOW = 0.05  # seconds to wait for more utterances before running a Whisper batch
+ASR_MAX_BATCH = 8
+MAX_TTS_WORKERS = 1  # Piper's voice is not shared across threads
+# ---------------------------------------
+
+_STATUS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+
+class FairLimiter:
+    """
+    Caps concurrent Ollama calls. When all slots are busy, waiters are queued per
+    session and served round-robin, so a session running a long tool loop can't
+    starve the others. slot() is used from the event loop; blocking calls made on
+    worker threads (context summaries, answer-cache embeddings) take thread_slot().
+    """
+
+    def __init__(self, limit: int = MAX_CONCURRENT_LLM):
+        self.limit = limit
+        self.active = 0
+        self._waiting = collections.OrderedDict()  # session -> deque of futures, in rotation order
+        self.calls = 0
+        self.queued = 0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+        self.max_queue = 0
+        self.loop = None  # the event loop slots are handed out on, set by AgentServer.start
+
+    @contextlib.asynccontextmanager
+    async def slot(self, key: str):
+        await self._acquire(key)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @contextlib.contextmanager
+    def thread_slot(self, key: str):
+        """slot() for a blocking call on a worker thread; never call it on the event loop"""
+        if self.loop is None:
+            raise RuntimeError("FairLimiter.loop is not set")
+        asyncio.run_coroutine_threadsafe(self._acquire(key), self.loop).result()
+        try:
+            yield
+        finally:
+            self.loop.call_soon_threadsafe(self._release)
+
+    async def _acquire(self, key: str):
+        start = time.perf_counter()
+        await self._wait_for_slot(key)
+        waited = time.perf_counter() - start
+        self.calls += 1
+        self.wait_seconds += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    async def _wait_for_slot(self, key: str):
+        if self.active < self.limit and not self._waiting:
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(key, collections.deque()).append(future)
+        self.queued += 1
+        self.max_queue = max(self.max_queue, sum(len(q) for q in self._waiting.values()))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()  # the slot was handed over just as the client went away
+            else:
+                waiters = self._waiting.get(key)
+                if waiters is not None and future in waiters:
+                    waiters.remove(future)
+                    if not waiters:
+                        del self._waiting[key]
+            raise
+
+    def _release(self):
+        # Hand the slot straight to the next session in the rotation
+        while self._waiting:
+            key, waiters = next(iter(self._waiting.items()))
+            del self._waiting[key]
+            future = waiters.popleft()
+            if waiters:
+                self._waiting[key] = waiters  # back of the rotation
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": sum(len(q) for q in self._waiting.values()),
+            "calls": self.calls,
+            "queued": self.queued,
+            "mean_wait": round(self.wait_seconds / self.calls, 4) if self.calls else 0.0,
+            "max_wait": round(self.max_wait, 4),
+            "max_queue": self.max_queue,
+        }
+
+
+class TranscriptionBatcher:
+    """
+    Collects utterances that arrive within ASR_BATCH_WINDOW of each other and runs
+    them through one transcribe_batch() call on a single ASR thread.
+    """
+
+    def __init__(self, engine=None, window: float = ASR_BATCH_WINDOW, max_batch: int = ASR_MAX_BATCH):
+        self._engine = engine
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []
+        self._flush_handle = None
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="asr")
+        self.batches = 0
+        self.utterances = 0
+
+    def _get_engine(self):
+        if self._engine is None:
+            from transcriber import get_transcriber
+            self._engine = get_transcriber()
+        return self._engine
+
+    async def transcribe(self, audio: np.ndarray) -> str:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((audio, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: list):
+        audios = [audio for audio, _ in batch]
+        self.batches += 1
+        self.utterances += len(batch)
+        try:
+            with tracing.span("stt.batch", utterances=len(batch),
+                              audio_seconds=sum(len(a) for a in audios) / SAMPLE_RATE):
+                texts = await asyncio.get_running_loop().run_in_executor(
+                    self._executor, self._get_engine().transcribe_batch, audios
+                )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), text in zip(batch, texts):
+            if not future.done():
+                future.set_result(text)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "utterances": self.utterances,
+            "mean_batch": round(self.utterances / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+class Session:
+    """One client's conversation; turns of a session run one at a time"""
+
+    def __init__(self, session_id: str, llm: FairLimiter):
+        self.id = session_id
+        self.history = []
+        # Summaries and embeddings run on worker threads and share the session's Ollama slots
+        slot = lambda: llm.thread_slot(session_id)
+        self.context = ContextManager(summarizer=main2.base_model, slot=slot)
+        self.answers = SemanticCache(slot=slot) if SEMANTIC_CACHE_ENABLED else None
+        self.lock = asyncio.Lock()
+        self.last_active = time.monotonic()
+        self.turns = 0
+
+
+class AgentServer:
+    """
+    Args:
+        app: the compiled graph (main2.build_graph(with_tools=False)); sessions run it
+            with app.astream and the plain model, never the owner's Gmail tools
+        synthesize: blocking callable(text) -> PCM bytes, loaded from Piper on first use
+        transcriber: engine with transcribe_batch(), loaded on first use
+    """
+
+    def __init__(self, app=None, synthesize=None, transcriber=None, llm_limit: int = MAX_CONCURRENT_LLM):
+        self.app = app or main2.build_graph(with_tools=False)
+        self.router = build_default_router(email=False)
+        self._synthesize = synthesize
+        self.sessions = {}
+        self.llm = FairLimiter(llm_limit)
+        self.asr = TranscriptionBatcher(transcriber)
+        self._tts_executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_TTS_WORKERS,
+                                                                   thread_name_prefix="tts")
+        self.server = None
+        self.turns = 0
+
+    async def start(self, host: str = HOST, port: int = PORT):
+        self.llm.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self._handle_connection, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self, host: str = HOST, port: int = PORT):
+        host, port = await self.start(host, port)
+        print(f"[server] listening on http://{host}:{port}")
+        async with self.server:
+            await self.server.serve_forever()
+
+    # ---------------- sessions ----------------
+
+    def create_session(self):
+        now = time.monotonic()
+        for session_id, session in list(self.sessions.items()):
+            if now - session.last_active > SESSION_IDLE_TIMEOUT and not session.lock.locked():
+                del self.sessions[session_id]
+        if len(self.sessions) >= MAX_SESSIONS:
+            return None
+        session = Session(uuid.uuid4().hex, self.llm)
+        self.sessions[session.id] = session
+        return session
+
+    def synthesize(self, text: str) -> bytes:
+        if self._synthesize is None:
+            from texttospeech_piper import synthesize
+            self._synthesize = synthesize
+        return self._synthesize(text)
+
+    async def chat(self, session: Session, text: str, send, audio: bool = False):
+        """Run one turn, passing events to the coroutine send(event) as they happen"""
+        async with session.lock:
+            session.last_active = time.monotonic()
+            session.turns += 1
+            self.turns += 1
+            tracing.start_turn()
+            started = time.perf_counter()
+            first_token_at = None
+            session.history.append(HumanMessage(content=text))
+            config = {"configurable": {
+                "context": session.context,
+                "answers": session.answers,
+                "llm_slot": lambda: self.llm.slot(session.id),
+                "model": main2.base_model,
+                "router": self.router,
+            }}
+
+            sentences = asyncio.Queue()
+            speaker = asyncio.create_task(self._speak(sentences, send)) if audio else None
+            chunker = SentenceChunker()
+            final_state = None
+            partial = []
+            try:
+                with tracing.span("agent", chars=len(text), streaming=True, session=session.id):
+                    async for mode, chunk in self.app.astream({"messages": session.history}, config,
+                                                              stream_mode=["messages", "values"]):
+                        if mode == "messages":
+                            message, metadata = chunk
+                            if (isinstance(message, AIMessageChunk) and message.content
+                                    and metadata.get("langgraph_node") == "our_agent"):
+                                if first_token_at is None:
+                                    first_token_at = time.perf_counter()
+                                partial.append(message.content)
+                                await send({"type": "token", "text": message.content})
+                                for sentence in chunker.feed(message.content):
+                                    sentences.put_nowait(sentence)
+                        else:
+                            final_state = chunk
+                            partial = []
+            except BaseException:
+                if speaker is not None:
+                    speaker.cancel()
+                raise
+            finally:
+                # Keep what was said even if the client went away mid-reply
+                if final_state is not None:
+                    session.history = list(final_state["messages"])
+                if partial:
+                    session.history.append(AIMessage(content="".join(partial)))
+                session.last_active = time.monotonic()
+
+            reply = session.history[-1].content if isinstance(session.history[-1], AIMessage) else ""
+            tail = chunker.flush()
+            if first_token_at is None and reply:
+                # Nothing was streamed (router, answer cache or a reply after tools), send it whole
+                first_token_at = time.perf_counter()
+                await send({"type": "token", "text": reply})
+                tail = reply
+            if speaker is not None:
+                if tail:
+                    sentences.put_nowait(tail)
+                sentences.put_nowait(None)
+                await speaker
+            await send({
+                "type": "done",
+                "reply": reply,
+                "first_token": round(first_token_at - started, 4) if first_token_at else None,
+                "seconds": round(time.perf_counter() - started, 4),
+            })
+
+    async def _speak(self, sentences: asyncio.Queue, send):
+        """Synthesize sentences in order while the reply is still being generated"""
+        loop = asyncio.get_running_loop()
+        index = 0
+        while True:
+            sentence = await sentences.get()
+            if sentence is None:
+                return
+            try:
+                pcm = await loop.run_in_executor(self._tts_executor, tracing.bind(self.synthesize), sentence)
+            except Exception as e:
+                await send({"type": "error", "message": f"TTS failed: {e}"})
+                continue
+            if pcm:
+                await send({"type": "audio", "sentence": index, "text": sentence,
+                            "pcm": base64.b64encode(pcm).decode("ascii")})
+                index += 1
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self.sessions),
+            "turns": self.turns,
+            "llm": self.llm.stats(),
+            "asr": self.asr.stats(),
+            "router": self.router.stats(),
+        }
+
+    # ---------------- HTTP ----------------
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, target, _ = line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY_BYTES:
+                    await self._send_json(writer, 413, {"error": "body too large"})
+                    break
+                body = await reader.readexactly(length) if length else b""
+                await self._dispatch(method, target.split("?", 1)[0], body, writer)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, path: str, body: bytes, writer):
+        parts = [part for part in path.split("/") if part]
+        if parts == ["health"] and method == "GET":
+            await self._send_json(writer, 200, self.stats())
+        elif parts == ["metrics"] and method == "GET":
+            await self._send(writer, 200, tracing.metrics_text().encode(), "text/plain; version=0.0.4")
+        elif parts == ["sessions"] and method == "POST":
+            session = self.create_session()
+            if session is None:
+                await self._send_json(writer, 503, {"error": "too many sessions"})
+            else:
+                await self._send_json(writer, 201, {"session": session.id})
+        elif len(parts) >= 2 and parts[0] == "sessions":
+            session = self.sessions.get(parts[1])
+            if session is None:
+                await self._send_json(writer, 404, {"error": "unknown session"})
+            elif len(parts) == 2 and method == "DELETE":
+                del self.sessions[session.id]
+                await self._send_json(writer, 200, {"deleted": session.id})
+            elif parts[2:] == ["transcribe"] and method == "POST":
+                try:
+                    audio = _pcm_to_float(body)
+                except ValueError as e:
+                    await self._send_json(writer, 400, {"error": str(e)})
+                else:
+                    await self._send_json(writer, 200, {"text": await self.asr.transcribe(audio)})
+            elif parts[2:] == ["chat"] and method == "POST":
+                await self._chat_request(session, body, writer)
+            else:
+                await self._send_json(writer, 405, {"error": "method not allowed"})
+        else:
+            await self._send_json(writer, 404, {"error": "not found"})
+
+    async def _chat_request(self, session: Session, body: bytes, writer):
+        try:
+            request = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            await self._send_json(writer, 400, {"error": "invalid JSON"})
+            return
+        if not isinstance(request, dict):
+            await self._send_json(writer, 400, {"error": "expected a JSON object"})
+            return
+        text = request.get("text")
+        text = text.strip() if isinstance(text, str) else ""
+        audio = None
+        if not text and request.get("pcm"):
+            try:
+                audio = _pcm_to_float(_b64decode(request["pcm"]))
+            except ValueError as e:
+                await self._send_json(writer, 400, {"error": str(e)})
+                return
+
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\n\r\n")
+
+        async def send(event: dict):
+            data = (json.dumps(event) + "\n").encode()
+            writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+            await writer.drain()
+
+        try:
+            if audio is not None:
+                text = await self.asr.transcribe(audio)
+                await send({"type": "transcript", "text": text})
+            if not text:
+                await send({"type": "error", "message": "nothing to answer"})
+            else:
+                await self.chat(session, text, send, audio=bool(request.get("audio")))
+                if self.router.is_exit(text):
+                    self.sessions.pop(session.id, None)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            await send({"type": "error", "message": str(e)})
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _send_json(self, writer, status: int, payload: dict):
+        await self._send(writer, status, json.dumps(payload).encode(), "application/json")
+
+    async def _send(self, writer, status: int, body: bytes, content_type: str):
+        writer.write(f"HTTP/1.1 {status} {_STATUS[status]}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+
+
+def _b64decode(data) -> bytes:
+    if not isinstance(data, str):
+        raise ValueError("pcm must be a base64 string")
+    try:
+        return base64.b64decode(data, validate=True)
+    except binascii.Error:
+        raise ValueError("pcm is not valid base64")
+
+
+def _pcm_to_float(pcm: bytes) -> np.ndarray:
+    """int16 16 kHz mono PCM -> float32 samples in [-1, 1] as Whisper expects; ValueError if it isn't int16 PCM"""
+    if not pcm:
+        raise ValueError("no audio")
+    if len(pcm) % 2:
+        raise ValueError("audio must be int16 PCM (an even number of bytes)")
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--llm-workers", type=int, default=MAX_CONCURRENT_LLM)
+    args = parser.parse_args()
+    server = AgentServer(llm_limit=args.llm_workers)
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        print(f"\n{server.router.report()}")
+
+
+if __name__ == "__main__":
+    main()
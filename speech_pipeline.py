@@ -0,0 +1,192 @@
+"""
+Sentence-by-sentence speech pipeline
+Cuts streamed LLM tokens at sentence boundaries and speaks them on background
+workers, so sentence N plays while N+1 is synthesized and N+2 is generated
+"""
+import queue
+import re
+import threading
+import time
+
+import tracing
+
+# A sentence ends at . ! ? (optionally followed by closing quotes/brackets) and whitespace
+_SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+')
+
+# Don't ship tiny fragments like "Hi." on their own unless nothing else follows
+MIN_SENTENCE_CHARS = 12
+
+_STOP = object()
+
+
+def split_sentences(text: str, min_chars: int = MIN_SENTENCE_CHARS) -> list:
+    """Split a complete text into speakable sentences"""
+    chunker = SentenceChunker(min_chars=min_chars)
+    sentences = chunker.feed(text)
+    tail = chunker.flush()
+    if tail:
+        sentences.append(tail)
+    return sentences
+
+
+class SentenceChunker:
+    """Accumulates streamed tokens and returns whole sentences as soon as they are complete"""
+
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, token: str) -> list:
+        """Add a token, return the list of sentences completed by it (often empty)"""
+        self._buffer += token
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            candidate = self._buffer[start:match.end()].strip()
+            if len(candidate) < self.min_chars:
+                continue  # merge short fragments into the next sentence
+            sentences.append(candidate)
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> str:
+        """Return whatever is left once the stream has ended"""
+        tail = self._buffer.strip()
+        self._buffer = ""
+        return tail
+
+
+class SpeechPipeline:
+    """
+    Two background workers linked by queues: one synthesizes sentences,
+    the other plays them in order.
+
+    Args:
+        synthesize: callable(text) -> audio, runs on the synthesis worker
+        play: callable(audio), plays the audio or queues it on a streaming player
+        drain: optional callable() that blocks until queued audio has been played,
+            needed when play only queues the audio
+        max_pending_audio: how many synthesized sentences may wait for playback
+    """
+
+    def __init__(self, synthesize, play, drain=None, max_pending_audio: int = 2):
+        self._synthesize = synthesize
+        self._play = play
+        self._drain = drain
+        self._text_queue = queue.Queue()
+        self._audio_queue = queue.Queue(maxsize=max_pending_audio)
+        self._idle = threading.Event()
+        self._idle.set()
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._generation = 0
+
+        self.turn_started_at = None
+        self.first_audio_at = None
+
+        self._synth_thread = threading.Thread(target=self._synth_worker, daemon=True)
+        self._play_thread = threading.Thread(target=self._play_worker, daemon=True)
+        self._synth_thread.start()
+        self._play_thread.start()
+
+    def start_turn(self):
+        """Reset the latency clock for a new user turn"""
+        self.turn_started_at = time.perf_counter()
+        self.first_audio_at = None
+
+    @property
+    def time_to_first_audio(self):
+        """Seconds from start_turn() to the first sentence starting playback, or None"""
+        if self.turn_started_at is None or self.first_audio_at is None:
+            return None
+        return self.first_audio_at - self.turn_started_at
+
+    def say(self, sentence: str):
+        """Queue a sentence for synthesis and playback (non-blocking)"""
+        if not sentence or not sentence.strip():
+            return
+        with self._pending_lock:
+            self._pending += 1
+            self._idle.clear()
+        self._text_queue.put((sentence, tracing.current_turn()))
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until every queued sentence has been played"""
+        if not self._idle.wait(timeout):
+            return False
+        if self._drain is not None:
+            return self._drain() is not False
+        return True
+
+    def cancel(self):
+        """
+        Drop every sentence that hasn't been played yet (used for barge-in).
+
+        Audio already handed to a streaming player must be stopped by the caller.
+        """
+        with self._pending_lock:
+            self._generation += 1
+            dropped = 0
+            for q in (self._text_queue, self._audio_queue):
+                while True:
+                    try:
+                        item = q.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        q.put(item)
+                        break
+                    dropped += 1
+            self._pending -= dropped
+            if self._pending <= 0:
+                self._pending = 0
+                self._idle.set()
+
+    def close(self):
+        """Stop the workers once the queued sentences are done"""
+        self._text_queue.put(_STOP)
+        self._synth_thread.join()
+        self._play_thread.join()
+
+    def _done_one(self):
+        with self._pending_lock:
+            self._pending = max(0, self._pending - 1)
+            if self._pending == 0:
+                self._idle.set()
+
+    def _synth_worker(self):
+        while True:
+            item = self._text_queue.get()
+            if item is _STOP:
+                self._audio_queue.put(_STOP)
+                return
+            sentence, turn = item
+            generation = self._generation
+            try:
+                audio = tracing.bind(self._synthesize, turn)(sentence)
+            except Exception as e:
+                print(f"Error during TTS: {e}")
+                audio = None
+            if generation != self._generation:
+                # Cancelled while synthesizing
+                self._done_one()
+                continue
+            # Blocks when playback is behind, which keeps memory bounded
+            self._audio_queue.put((generation, audio))
+
+    def _play_worker(self):
+        while True:
+            item = self._audio_queue.get()
+            if item is _STOP:
+                return
+            generation, audio = item
+            try:
+                if audio and generation == self._generation:
+                    if self.first_audio_at is None:
+                        self.first_audio_at = time.perf_counter()
+                    self._play(audio)
+            except Exception as e:
+                print(f"Error during playback: {e}")
+            finally:
+                self._done_one()
@@ -1,112 +1,503 @@
-import sounddevice as sd
-import numpy as np
-import whisper
-import webrtcvad
-
-def speech_to_text():
-    # ---------------- CONFIG ----------------
-    SAMPLE_RATE = 16000
-    FRAME_DURATION = 30  # ms
-    FRAME_SIZE = int(SAMPLE_RATE * FRAME_DURATION / 1000)
-    SILENCE_DURATION = 1.5  # seconds
-    VAD_MODE = 2  # aggressive
-    MODEL_SIZE = "small"
-    NOISE_GATE = 500  # int16 units
-    # ---------------------------------------
-
-    vad = webrtcvad.Vad(VAD_MODE)
-    model = whisper.load_model(MODEL_SIZE)
-
-    audio_buffer = []
-    required_silence_frames = int(SILENCE_DURATION * 1000 / FRAME_DURATION)
-
-    print("Listening... Speak and pause.")
-    check = True
-
-    with sd.RawInputStream(
-            samplerate=SAMPLE_RATE,
-            blocksize=FRAME_SIZE,
-            dtype="int16",
-            channels=1
-    ) as stream:
-        in_speech = False
-        voiced_frames = 0
-        silence_frames = 0
-
-        MIN_VOICED_FRAMES = int(0.25 * 1000 / FRAME_DURATION)  # 250 ms
-
-        while check:
-            frame, _ = stream.read(FRAME_SIZE)
-
-            # -------- RAW AUDIO (for Whisper) --------
-            raw_int16 = np.frombuffer(frame, dtype=np.int16)
-            raw_bytes = raw_int16.tobytes()
-
-            # -------- CLEAN AUDIO (for VAD only) -----
-            vad_audio = raw_int16.astype(np.float32)
-            vad_audio -= vad_audio.mean()  # DC removal
-            vad_audio[np.abs(vad_audio) < 100] = 0  # light gate
-            vad_bytes = vad_audio.astype(np.int16).tobytes()
-            # -----------------------------------------
-
-            is_speech = vad.is_speech(vad_bytes, SAMPLE_RATE)
-            # print("Speech:", is_speech)
-
-            if is_speech:
-                audio_buffer.append(raw_bytes)  # STORE RAW AUDIO
-                voiced_frames += 1
-                silence_frames = 0
-
-                if voiced_frames >= MIN_VOICED_FRAMES:
-                    in_speech = True
-            else:
-                if in_speech:
-                    silence_frames += 1
-
-            if in_speech and silence_frames >= required_silence_frames:
-                print("Processing...")
-
-                audio_np = np.frombuffer(
-                    b"".join(audio_buffer),
-                    dtype=np.int16
-                ).astype(np.float32) / 32768.0
-
-                # Reset state
-                audio_buffer = []
-                voiced_frames = 0
-                silence_frames = 0
-                in_speech = False
-
-                duration = len(audio_np) / SAMPLE_RATE
-                # print("Audio seconds:", duration)
-
-                if duration < 0.7:
-                    print("Too short, skipping")
-                    continue
-                else:
-                    check = False
-                # VERY IMPORTANT: pad a bit of silence
-
-                audio_np = np.concatenate([
-                    audio_np,
-                    np.zeros(int(0.2 * SAMPLE_RATE), dtype=np.float32)
-                ])
-
-                result = model.transcribe(
-                    audio_np,
-                    language="en",
-                    fp16=False,
-                    temperature=0.0,
-                    condition_on_previous_text=False
-                )
-
-                # print("RAW WHISPER OUTPUT:", result)
-
-                text = result["text"].strip()
-                if text:
-                    # print(">>", text)
-                    return text  # Return only the string, not the full result dict
-                else:
-                    """Whisper returned empty text"""
-                    # print("Whisper returned empty text")
-                    return None
\ No newline at end of file
+import concurrent.futures
+import re
+import threading
+import time
+
+import numpy as np
+import webrtcvad
+from transcriber import get_transcriber
+import tracing
+
+# ---------------- CONFIG ----------------
+SAMPLE_RATE = 16000
+FRAME_DURATION = 30  # ms
+FRAME_SIZE = int(SAMPLE_RATE * FRAME_DURATION / 1000)
+SILENCE_DURATION = 1.5  # seconds, fixed hangover when ADAPTIVE_ENDPOINTING is off
+VAD_MODE = 2  # aggressive
+MODEL_SIZE = None  # None uses WHISPER_MODEL_SIZE from transcriber
+
+# Adaptive endpointing: the hangover follows the user's own mid-utterance pauses
+ADAPTIVE_ENDPOINTING = True
+MIN_SILENCE = 0.5  # seconds, shortest hangover
+MAX_SILENCE = 2.0  # seconds, longest hangover (slow speakers aren't cut off mid-sentence)
+HANGOVER_FACTOR = 1.6  # hangover = typical pause * factor
+INITIAL_PAUSE = 0.5  # seconds, pause estimate before the user has paused at all
+MIN_PAUSE = 0.15  # seconds, shorter gaps are VAD flicker, not pauses
+NOISE_FLOOR_INIT = 100.0  # int16 RMS, replaced by the measured ambient level within a second
+SPEECH_SNR = 2.5  # a voiced frame must be this many times louder than the noise floor
+EARLY_TRANSCRIBE = False  # start Whisper after EARLY_TRANSCRIBE_AFTER of silence, keep it if silence holds
+EARLY_TRANSCRIBE_AFTER = 0.4  # seconds
+
+# Speculative ASR: transcribe the utterance in the background while the user is still speaking
+SPECULATIVE_ASR = False
+SPECULATIVE_INTERVAL = 0.6  # seconds of new speech between background passes
+SPECULATIVE_MIN_AUDIO = 1.0  # seconds, shorter utterances are only transcribed at the endpoint
+VAD_GATE = 100  # int16 units, light gate applied to the VAD copy only
+PRE_ROLL_MS = 300  # audio kept from before the first voiced frame so onsets aren't clipped
+TAIL_PADDING = 0.2  # seconds of silence appended for Whisper
+MIN_DURATION = 0.7  # seconds, shorter utterances are skipped
+# ---------------------------------------
+
+
+class FramePreprocessor:
+    """
+    DC removal and light gating for the VAD, done in place in reusable scratch arrays.
+
+    process() returns a memoryview over an internal buffer that is overwritten by the next call.
+    """
+
+    def __init__(self, frame_size: int = FRAME_SIZE, gate: int = VAD_GATE):
+        self.gate = np.float32(gate)  # same dtype as the scratch, so comparisons need no cast buffer
+        self._work = np.empty(frame_size, dtype=np.float32)
+        self._abs = np.empty(frame_size, dtype=np.float32)
+        self._quiet = np.empty(frame_size, dtype=bool)
+        self._out = np.empty(frame_size, dtype=np.int16)
+
+    def process(self, raw_int16: np.ndarray) -> memoryview:
+        work = self._work
+        work[:] = raw_int16
+        # np.add.reduce is several times cheaper than .mean() on a 480-sample frame
+        np.subtract(work, np.float32(np.add.reduce(work) / len(work)), out=work)  # DC removal
+        self.rms = float(np.sqrt(np.dot(work, work) / len(work)))  # before gating, for the endpointer
+        np.less(np.abs(work, out=self._abs), self.gate, out=self._quiet)
+        np.putmask(work, self._quiet, 0)  # light gate
+        np.copyto(self._out, work, casting="unsafe")
+        return memoryview(self._out).cast("B")
+
+
+class UtteranceBuffer:
+    """
+    Growable int16 utterance storage with a matching float32 buffer for Whisper.
+
+    Capacity doubles when full, so appending a frame is amortised O(1) with no joins.
+    """
+
+    def __init__(self, initial_seconds: float = 30.0, pad_seconds: float = TAIL_PADDING):
+        self._pad = int(pad_seconds * SAMPLE_RATE)
+        self._pcm = np.empty(int(initial_seconds * SAMPLE_RATE), dtype=np.int16)
+        self._float = np.empty(0, dtype=np.float32)  # allocated on first as_float32()
+        self.length = 0
+
+    @property
+    def seconds(self) -> float:
+        return self.length / SAMPLE_RATE
+
+    def append(self, samples: np.ndarray):
+        n = len(samples)
+        if self.length + n > len(self._pcm):
+            grown = np.empty(max(2 * len(self._pcm), self.length + n), dtype=np.int16)
+            grown[:self.length] = self._pcm[:self.length]
+            self._pcm = grown
+        self._pcm[self.length:self.length + n] = samples
+        self.length += n
+
+    def pcm(self) -> np.ndarray:
+        """int16 view of the utterance (no copy)"""
+        return self._pcm[:self.length]
+
+    def as_float32(self) -> np.ndarray:
+        """
+        Float32 view for Whisper: one in-place conversion into a preallocated
+        buffer, followed by TAIL_PADDING seconds of silence.
+        """
+        n = self.length
+        if len(self._float) < n + self._pad:
+            self._float = np.empty(n + self._pad, dtype=np.float32)
+        out = self._float
+        np.multiply(self._pcm[:n], 1.0 / 32768.0, out=out[:n], casting="unsafe")
+        out[n:n + self._pad] = 0.0
+        return out[:n + self._pad]
+
+    def clear(self):
+        self.length = 0
+
+
+class PreRollBuffer:
+    """Ring of the most recent unvoiced frames, flushed into the utterance when speech starts"""
+
+    def __init__(self, frames: int = int(PRE_ROLL_MS / FRAME_DURATION), frame_size: int = FRAME_SIZE):
+        self._frames = np.zeros((frames, frame_size), dtype=np.int16)
+        self._next = 0
+        self._count = 0
+
+    def push(self, frame: np.ndarray):
+        if len(self._frames) == 0:
+            return
+        self._frames[self._next] = frame
+        self._next = (self._next + 1) % len(self._frames)
+        self._count = min(self._count + 1, len(self._frames))
+
+    def drain_into(self, utterance: UtteranceBuffer):
+        """Append the held frames oldest first, then empty the ring"""
+        start = (self._next - self._count) % max(1, len(self._frames))
+        for i in range(self._count):
+            utterance.append(self._frames[(start + i) % len(self._frames)])
+        self._count = 0
+
+
+class Endpointer:
+    """
+    Adaptive end-of-utterance detection, kept across turns.
+
+    - noise floor: running estimate of the ambient RMS from non-speech frames; a frame
+      the VAD calls voiced only counts as speech if it is SPEECH_SNR times louder
+    - hangover: silence needed to end an utterance, HANGOVER_FACTOR times the user's
+      typical mid-utterance pause, clamped to [MIN_SILENCE, MAX_SILENCE]
+    """
+
+    def __init__(self):
+        self.noise_floor = NOISE_FLOOR_INIT
+        self.pause = INITIAL_PAUSE
+
+    @property
+    def hangover(self) -> float:
+        if not ADAPTIVE_ENDPOINTING:
+            return SILENCE_DURATION
+        return min(MAX_SILENCE, max(MIN_SILENCE, self.pause * HANGOVER_FACTOR))
+
+    def classify(self, vad_speech: bool, rms: float) -> bool:
+        """Combine the VAD decision with the noise floor, learning the floor from non-speech frames"""
+        if not ADAPTIVE_ENDPOINTING:
+            return vad_speech
+        is_speech = vad_speech and rms >= self.noise_floor * SPEECH_SNR
+        if not is_speech:
+            # Follow a quieter room quickly, a louder one slowly (so speech tails don't raise it)
+            alpha = 0.2 if rms < self.noise_floor else 0.02
+            self.noise_floor += alpha * (rms - self.noise_floor)
+        return is_speech
+
+    def pause_ended(self, seconds: float):
+        """Speech resumed after a pause of this length"""
+        if seconds >= MIN_PAUSE:
+            self.pause += 0.25 * (seconds - self.pause)
+
+
+_endpointer = None
+_early_executor = None
+
+
+def _get_endpointer() -> Endpointer:
+    """Get or create the endpointer (singleton pattern), so the learned floor and pace carry over"""
+    global _endpointer
+    if _endpointer is None:
+        _endpointer = Endpointer()
+    return _endpointer
+
+
+def _get_early_executor() -> concurrent.futures.ThreadPoolExecutor:
+    global _early_executor
+    if _early_executor is None:
+        _early_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="early-asr")
+    return _early_executor
+
+
+def _normalize(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def _join(*parts) -> str:
+    return " ".join(p for p in parts if p)
+
+
+class Transcription:
+    """
+    One ASR job's text and what it cost. Jobs return their own rather than relying on
+    engine.last_* / shared state, so an abandoned early job that finishes late can't
+    change what is reported for the utterance actually transcribed.
+    """
+
+    def __init__(self, text: str, audio_seconds: float, inference_seconds: float, outcome: str = None):
+        self.text = text
+        self.audio_seconds = audio_seconds
+        self.inference_seconds = inference_seconds
+        self.outcome = outcome  # speculative path: "reused", "tail" or "full"
+
+    def report(self) -> str:
+        if self.outcome == "reused":
+            # Nothing was decoded at the endpoint
+            return f"Reused the speculative transcript of {self.audio_seconds:.2f}s of audio"
+        return f"Transcribed {self.audio_seconds:.2f}s of audio in {self.inference_seconds:.2f}s"
+
+
+def _transcribe(engine, audio: np.ndarray, outcome: str = None, **options) -> Transcription:
+    start = time.perf_counter()
+    text = engine.transcribe(audio, **options)
+    return Transcription(text, len(audio) / SAMPLE_RATE, time.perf_counter() - start, outcome)
+
+
+class SpeculativeTranscriber:
+    """
+    Transcribes the growing utterance on a worker thread while the user speaks.
+
+    Words two consecutive passes agree on (local agreement, as in speechtotextLIVE)
+    are committed together with the audio they cover. At the endpoint the last
+    hypothesis is reused if no speech arrived since it ran, otherwise only the
+    audio after the last committed word is decoded.
+    """
+
+    def __init__(self, engine, interval: float = SPECULATIVE_INTERVAL, min_audio: float = SPECULATIVE_MIN_AUDIO):
+        self.engine = engine
+        self.interval_samples = int(interval * SAMPLE_RATE)
+        self.min_samples = int(min_audio * SAMPLE_RATE)
+        self._pad = np.zeros(int(TAIL_PADDING * SAMPLE_RATE), dtype=np.float32)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="speculative-asr")
+        self._lock = threading.Lock()
+        self.passes = 0
+        self.reset()
+
+    def reset(self):
+        """Forget the current utterance (a pass still running is ignored when it returns)"""
+        with self._lock:
+            self._generation = getattr(self, "_generation", 0) + 1
+            self.committed_text = ""
+            self.committed_samples = 0
+            self.hypothesis = None
+            self.hypothesis_samples = 0
+            self._previous = []  # words of the last pass after the committed point, absolute seconds
+            self._submitted_samples = 0
+            self._job = None
+
+    def _float(self, pcm: np.ndarray) -> np.ndarray:
+        return np.concatenate([pcm.astype(np.float32) / 32768.0, self._pad])
+
+    def update(self, utterance: UtteranceBuffer, force: bool = False):
+        """
+        Called from the VAD loop after voiced frames; starts a background pass once
+        enough new speech has arrived and the worker is idle. force skips the interval
+        check (used when the user pauses, so the endpoint can reuse the result).
+        """
+        n = utterance.length
+        if n < self.min_samples or n == self._submitted_samples:
+            return
+        if not force and n - self._submitted_samples < self.interval_samples:
+            return
+        if self._job is not None and not self._job.done():
+            return
+        with self._lock:
+            start, prompt, generation = self.committed_samples, self.committed_text, self._generation
+        # Copy: the loop keeps appending (and may reallocate) while the pass runs
+        segment = utterance.pcm()[start:n].copy()
+        self._submitted_samples = n
+        self._job = self._executor.submit(self._pass, segment, start, n, prompt, generation)
+
+    def _pass(self, segment: np.ndarray, start: int, end: int, prompt: str, generation: int):
+        words = self.engine.transcribe_words(
+            self._float(segment),
+            initial_prompt=prompt or None,
+            condition_on_previous_text=False
+        )
+        offset = start / SAMPLE_RATE
+        words = [(offset + s, offset + e, w) for s, e, w in words if _normalize(w)]
+
+        with self._lock:
+            if generation != self._generation or start != self.committed_samples:
+                return
+            self.passes += 1
+            # Commit the longest prefix this pass shares with the previous one
+            n = 0
+            while (n < len(words) and n < len(self._previous)
+                   and _normalize(words[n][2]) == _normalize(self._previous[n][2])):
+                n += 1
+            stable, pending = words[:n], words[n:]
+            self.hypothesis = _join(prompt, " ".join(w for _, _, w in words))
+            self.hypothesis_samples = end
+            if stable:
+                self.committed_text = _join(prompt, " ".join(w for _, _, w in stable))
+                self.committed_samples = min(end, int(stable[-1][1] * SAMPLE_RATE))
+            self._previous = pending
+
+    def finish(self, pcm: np.ndarray) -> Transcription:
+        """Final text for the utterance pcm (int16), decoding as little as possible"""
+        job = self._job
+        if job is not None:
+            try:
+                job.result()  # let the pass in flight land first
+            except Exception as e:
+                print(f"[speculative] background pass failed: {e}")
+        with self._lock:
+            hypothesis, hypothesis_samples = self.hypothesis, self.hypothesis_samples
+            committed_text, committed_samples = self.committed_text, self.committed_samples
+
+        if hypothesis is not None and hypothesis_samples == len(pcm):
+            return Transcription(hypothesis, len(pcm) / SAMPLE_RATE, 0.0, "reused")
+        tail = _transcribe(
+            self.engine,
+            self._float(pcm[committed_samples:]),
+            outcome="tail" if committed_samples else "full",
+            initial_prompt=committed_text or None,
+            condition_on_previous_text=False
+        )
+        tail.text = _join(committed_text, tail.text)
+        return tail
+
+
+_speculative = None
+
+
+def _get_speculative(engine) -> SpeculativeTranscriber:
+    """Get or create the speculative transcriber for this engine (singleton pattern)"""
+    global _speculative
+    if _speculative is None or _speculative.engine is not engine:
+        _speculative = SpeculativeTranscriber(engine)
+    return _speculative
+
+
+# Endpoint details of the last utterance: delay, hangover, noise floor, early-transcribe outcome
+last_endpoint = {}
+
+
+def speech_to_text(read_frame=None):
+    """
+    Listen until the user speaks and pauses, then return the transcribed text (or None).
+
+    Args:
+        read_frame: optional callable returning the next FRAME_SIZE int16 frame as bytes,
+            e.g. MicCapture.read when the mic is shared with barge-in detection.
+            By default a microphone stream is opened for this call.
+    """
+    if read_frame is not None:
+        return _listen(read_frame)
+
+    # Imported here so file-fed callers (benchmarks) don't need PortAudio
+    import sounddevice as sd
+    with sd.RawInputStream(
+            samplerate=SAMPLE_RATE,
+            blocksize=FRAME_SIZE,
+            dtype="int16",
+            channels=1
+    ) as stream:
+        return _listen(lambda: stream.read(FRAME_SIZE)[0])
+
+
+def _listen(read_frame):
+    vad = webrtcvad.Vad(VAD_MODE)
+    engine = get_transcriber(MODEL_SIZE)  # loaded once per process, reused every turn
+    endpointer = _get_endpointer()
+    speculative = _get_speculative(engine) if SPECULATIVE_ASR else None
+    if speculative is not None:
+        speculative.reset()
+
+    preprocessor = FramePreprocessor()
+    utterance = UtteranceBuffer()
+    pre_roll = PreRollBuffer()
+    frame_seconds = FRAME_DURATION / 1000
+    early_frames = int(EARLY_TRANSCRIBE_AFTER / frame_seconds)
+
+    print("Listening... Speak and pause.")
+
+    in_speech = False
+    voiced_frames = 0
+    silence_frames = 0
+    early = None  # speculative transcription started during the current silence
+
+    MIN_VOICED_FRAMES = int(0.25 * 1000 / FRAME_DURATION)  # 250 ms
+
+    while True:
+        frame = read_frame()
+
+        # -------- RAW AUDIO (for Whisper) --------
+        raw_int16 = np.frombuffer(frame, dtype=np.int16)
+
+        # -------- CLEAN AUDIO (for VAD only) -----
+        vad_speech = vad.is_speech(preprocessor.process(raw_int16), SAMPLE_RATE)
+        is_speech = endpointer.classify(vad_speech, preprocessor.rms)
+        # print("Speech:", is_speech)
+
+        if is_speech:
+            if utterance.length == 0:
+                pre_roll.drain_into(utterance)  # keep the onset
+            if in_speech and silence_frames:
+                endpointer.pause_ended(silence_frames * frame_seconds)
+            if early is not None:
+                early.cancel()  # speech resumed, the early result is stale (skip it if it hasn't started)
+                early = None
+            utterance.append(raw_int16)  # STORE RAW AUDIO
+            voiced_frames += 1
+            silence_frames = 0
+
+            if voiced_frames >= MIN_VOICED_FRAMES:
+                in_speech = True
+                if speculative is not None:
+                    speculative.update(utterance)
+        else:
+            if utterance.length == 0:
+                pre_roll.push(raw_int16)
+            if in_speech:
+                silence_frames += 1
+                if speculative is not None:
+                    # Once the worker is free, run a pass over everything said so far
+                    speculative.update(utterance, force=True)
+                if (EARLY_TRANSCRIBE and early is None and silence_frames == early_frames
+                        and utterance.seconds >= MIN_DURATION):
+                    # Only voiced frames go into the utterance, so if the silence holds
+                    # this is exactly the audio the endpoint would transcribe
+                    if speculative is not None:
+                        early = _get_early_executor().submit(speculative.finish, utterance.pcm())
+                    else:
+                        early = _get_early_executor().submit(
+                            _transcribe, engine, utterance.as_float32().copy(), condition_on_previous_text=False
+                        )
+
+        hangover = endpointer.hangover
+        if in_speech and silence_frames * frame_seconds >= hangover:
+            print("Processing...")
+            endpoint_at = time.perf_counter()
+
+            duration = utterance.seconds
+            endpoint_delay = silence_frames * frame_seconds
+            # print("Audio seconds:", duration)
+
+            # Reset state
+            voiced_frames = 0
+            silence_frames = 0
+            in_speech = False
+
+            if duration < MIN_DURATION:
+                print("Too short, skipping")
+                utterance.clear()
+                if early is not None:
+                    early.cancel()
+                early = None
+                if speculative is not None:
+                    speculative.reset()
+                continue
+
+            with tracing.span("stt.asr", audio_seconds=round(duration, 3)) as span:
+                if early is not None:
+                    result = early.result()  # committed: the silence held
+                elif speculative is not None:
+                    result = speculative.finish(utterance.pcm())
+                else:
+                    # VERY IMPORTANT: pad a bit of silence (as_float32 appends it)
+                    result = _transcribe(
+                        engine,
+                        utterance.as_float32(),
+                        condition_on_previous_text=False
+                    )
+                text = result.text
+                asr_wait = time.perf_counter() - endpoint_at
+                span.set(chars=len(text or ""), endpoint_delay=round(endpoint_delay, 3),
+                         asr_wait=round(asr_wait, 3), early=early is not None, speculative=result.outcome)
+            print(result.report())
+
+            last_endpoint.clear()
+            last_endpoint.update(
+                endpoint_delay=endpoint_delay,
+                hangover=hangover,
+                noise_floor=endpointer.noise_floor,
+                early_transcribe=early is not None,
+                speculative=result.outcome,
+                asr_wait=asr_wait,
+            )
+            print(f"[endpoint] {endpoint_delay:.2f}s after speech (hangover {hangover:.2f}s, "
+                  f"noise floor {endpointer.noise_floor:.0f}), then {asr_wait:.2f}s waiting for ASR"
+                  f"{' (early transcribe)' if early is not None else ''}"
+                  f"{f' (speculative: {result.outcome})' if result.outcome else ''}")
+
+            if text:
+                # print(">>", text)
+                return text  # Return only the string, not the full result dict
+            else:
+                """Whisper returned empty text"""
+                # print("Whisper returned empty text")
+                return None
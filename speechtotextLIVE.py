@@ -1,45 +1,281 @@
-import sounddevice as sd
-import numpy as np
-import whisper
-import queue
-import time
-
-SAMPLE_RATE = 16000
-CHUNK_DURATION = 2  # seconds
-CHUNK_SIZE = SAMPLE_RATE * CHUNK_DURATION
-
-audio_queue = queue.Queue()
-
-model = whisper.load_model("tiny")  # use "base" for higher accuracy
-
-def audio_callback(indata, frames, time_info, status):
-    audio_queue.put(indata.copy())
-
-stream = sd.InputStream(
-    samplerate=SAMPLE_RATE,
-    channels=1,
-    dtype="float32",
-    callback=audio_callback
-)
-
-print("Listening... Ctrl+C to stop")
-
-buffer = np.zeros((0,), dtype=np.float32)
-
-with stream:
-    while True:
-        audio = audio_queue.get()
-        buffer = np.concatenate((buffer, audio.flatten()))
-
-        if len(buffer) >= CHUNK_SIZE:
-            chunk = buffer[:CHUNK_SIZE]
-            buffer = buffer[CHUNK_SIZE:]
-
-            result = model.transcribe(
-                chunk,
-                fp16=False,
-                language="en",
-                temperature=0.0
-            )
-
-            print(">>", result["text"].strip())
+"""
+Incremental streaming transcription
+Audio goes into a preallocated ring buffer and is re-transcribed over a sliding
+window; words are only emitted as final once two consecutive passes agree on them
+(local agreement), everything after that is reported as a partial hypothesis
+"""
+import queue
+import re
+import threading
+
+import numpy as np
+
+from transcriber import get_transcriber
+
+# ---------------- CONFIG ----------------
+SAMPLE_RATE = 16000
+MODEL_SIZE = "tiny"  # use "base" for higher accuracy
+STEP_SECONDS = 1.0  # new audio needed before the next transcription pass
+MAX_WINDOW_SECONDS = 15.0  # force-commit when the uncommitted window grows past this
+OVERLAP_SECONDS = 0.5  # audio kept before the last committed word as context
+RING_SECONDS = 30.0  # ring buffer capacity, must be larger than MAX_WINDOW_SECONDS
+QUEUE_SECONDS = 5.0  # audio the capture queue holds; when the transcriber falls further behind, blocks are dropped
+# ---------------------------------------
+
+
+def _normalize(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+class AudioRingBuffer:
+    """Fixed-size float32 ring buffer addressed by absolute sample index"""
+
+    def __init__(self, capacity: int):
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self.capacity = capacity
+        self.end = 0  # absolute index one past the newest sample
+
+    @property
+    def start(self) -> int:
+        """Absolute index of the oldest sample still held"""
+        return max(0, self.end - self.capacity)
+
+    def write(self, samples: np.ndarray):
+        samples = samples[-self.capacity:]
+        n = len(samples)
+        pos = self.end % self.capacity
+        first = min(n, self.capacity - pos)
+        self._data[pos:pos + first] = samples[:first]
+        self._data[:n - first] = samples[first:]
+        self.end += n
+
+    def read(self, start: int) -> np.ndarray:
+        """Contiguous copy of the samples from absolute index start to the newest sample"""
+        start = max(start, self.start)
+        n = self.end - start
+        pos = start % self.capacity
+        first = min(n, self.capacity - pos)
+        out = np.empty(n, dtype=np.float32)
+        out[:first] = self._data[pos:pos + first]
+        out[first:] = self._data[:n - first]
+        return out
+
+
+class StreamingTranscriber:
+    """
+    Turns a live audio stream into partial and final text.
+
+    Feed audio with feed() (or start() to capture from the microphone), then read
+    results either through the on_partial / on_final callbacks or by iterating
+    results(), which yields ("partial" | "final", text) tuples.
+    """
+
+    def __init__(self, on_partial=None, on_final=None, model_size: str = MODEL_SIZE):
+        self.on_partial = on_partial
+        self.on_final = on_final
+        self.engine = get_transcriber(model_size)
+
+        self._ring = AudioRingBuffer(int(RING_SECONDS * SAMPLE_RATE))
+        # Bounded by queued samples rather than blocks, since the block size is up to the caller
+        self._audio_queue = queue.Queue()
+        self._queue_lock = threading.Lock()
+        self._queued_samples = 0
+        self._max_queued_samples = int(QUEUE_SECONDS * SAMPLE_RATE)
+        self._unqueued_drop = 0  # samples dropped since the last block that fit
+        self._results = queue.Queue()
+        self.dropped_blocks = 0
+        self.dropped_seconds = 0.0
+
+        self._window_start = 0  # absolute sample index the next pass starts from
+        self._committed_until = 0.0  # absolute seconds, end of the last committed word
+        self._committed_text = []
+        self._previous = []  # last pass's uncommitted words as (start, end, word)
+        self._last_pass_end = 0
+
+        self._stream = None
+        self._worker = None
+        self._running = threading.Event()
+
+    # ---------------- input ----------------
+
+    def feed(self, samples: np.ndarray):
+        """
+        Queue 16 kHz mono float32 audio; never blocks. Blocks that don't fit in
+        QUEUE_SECONDS are dropped and later replaced by the same length of silence,
+        so the timestamps after a drop still line up with the audio.
+        """
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        with self._queue_lock:
+            if self._queued_samples + len(samples) > self._max_queued_samples:
+                self._unqueued_drop += len(samples)
+                self.dropped_blocks += 1
+                self.dropped_seconds += len(samples) / SAMPLE_RATE
+                return
+            self._queued_samples += len(samples)
+            dropped, self._unqueued_drop = self._unqueued_drop, 0
+        if dropped:
+            self._audio_queue.put(dropped)  # silence marker, in order with the audio around it
+        self._audio_queue.put(samples)
+
+    def _audio_callback(self, indata, frames, time_info, status):
+        self.feed(indata[:, 0].copy())
+
+    def start(self):
+        """Open the microphone and transcribe on a background thread"""
+        import sounddevice as sd
+
+        self._running.set()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+        self._stream = sd.InputStream(
+            samplerate=SAMPLE_RATE,
+            channels=1,
+            dtype="float32",
+            callback=self._audio_callback
+        )
+        self._stream.start()
+
+    def stop(self):
+        """Stop capturing, transcribe what is left and commit the last hypothesis"""
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+        self._running.clear()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+        self._drain_queue()
+        self.process(final=True)
+        self._results.put(None)
+
+    # ---------------- output ----------------
+
+    def results(self):
+        """Yield ("partial" | "final", text) until stop() has been called"""
+        while True:
+            item = self._results.get()
+            if item is None:
+                return
+            yield item
+
+    @property
+    def text(self) -> str:
+        """Everything committed so far"""
+        return " ".join(self._committed_text)
+
+    def _emit(self, kind: str, text: str):
+        if not text:
+            return
+        self._results.put((kind, text))
+        callback = self.on_final if kind == "final" else self.on_partial
+        if callback is not None:
+            callback(text)
+
+    # ---------------- transcription ----------------
+
+    def _write(self, item):
+        """Move one queued item into the ring buffer: a block of audio, or a count of dropped samples"""
+        if isinstance(item, int):
+            print(f"[streaming] transcriber fell behind, dropped {item / SAMPLE_RATE:.2f}s of audio")
+            self._ring.write(np.zeros(item, dtype=np.float32))
+            # Words heard before the gap can't be confirmed by a pass that sees silence there
+            self._previous = []
+            return
+        with self._queue_lock:
+            self._queued_samples -= len(item)
+        self._ring.write(item)
+
+    def _drain_queue(self) -> bool:
+        """Merge every queued block into the ring buffer; returns False if nothing was queued"""
+        got_audio = False
+        while True:
+            try:
+                self._write(self._audio_queue.get_nowait())
+                got_audio = True
+            except queue.Empty:
+                return got_audio
+
+    def _run(self):
+        while self._running.is_set():
+            try:
+                self._write(self._audio_queue.get(timeout=0.1))
+            except queue.Empty:
+                continue
+            self._drain_queue()
+            if self._ring.end - self._last_pass_end >= STEP_SECONDS * SAMPLE_RATE:
+                self.process()
+
+    def process(self, final: bool = False):
+        """Run one transcription pass over the uncommitted window"""
+        self._last_pass_end = self._ring.end
+        start = max(self._window_start, self._ring.start)
+        audio = self._ring.read(start)
+        if len(audio) < SAMPLE_RATE * 0.3:
+            return
+
+        offset = start / SAMPLE_RATE
+        prompt = " ".join(self._committed_text[-20:]) or None
+        words = self.engine.transcribe_words(
+            audio,
+            initial_prompt=prompt,
+            condition_on_previous_text=False
+        )
+        # Absolute times, and skip words already committed from the overlap region
+        words = [
+            (offset + s, offset + e, w) for s, e, w in words
+            if offset + e > self._committed_until + 0.05 and _normalize(w)
+        ]
+
+        if final:
+            stable, pending = words, []
+        else:
+            # Local agreement: commit the longest prefix this pass shares with the previous one
+            n = 0
+            while (n < len(words) and n < len(self._previous)
+                   and _normalize(words[n][2]) == _normalize(self._previous[n][2])):
+                n += 1
+            stable, pending = words[:n], words[n:]
+
+            window_seconds = len(audio) / SAMPLE_RATE
+            if not stable and window_seconds > MAX_WINDOW_SECONDS and pending:
+                # Nothing agrees and the window keeps growing: commit the older half
+                half = max(1, len(pending) // 2)
+                stable, pending = pending[:half], pending[half:]
+
+        if stable:
+            self._committed_text.extend(w for _, _, w in stable)
+            self._committed_until = stable[-1][1]
+            self._window_start = max(0, int((self._committed_until - OVERLAP_SECONDS) * SAMPLE_RATE))
+            self._emit("final", " ".join(w for _, _, w in stable))
+
+        if not pending:
+            # Silence or noise (no words) or everything committed: don't decode this audio
+            # again, keep just OVERLAP_SECONDS of it as context for the next pass
+            end = start + len(audio)
+            self._window_start = max(self._window_start, end - int(OVERLAP_SECONDS * SAMPLE_RATE))
+
+        self._previous = pending
+        self._emit("partial", " ".join(w for _, _, w in pending))
+
+
+def main():
+    transcriber = StreamingTranscriber(
+        on_partial=lambda text: print(f"   ... {text}"),
+        on_final=lambda text: print(">>", text),
+    )
+    print("Listening... Ctrl+C to stop")
+    transcriber.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        transcriber.stop()
+        if transcriber.dropped_blocks:
+            print(f"Dropped {transcriber.dropped_blocks} audio blocks ({transcriber.dropped_seconds:.1f}s) "
+                  f"while transcription was behind")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""ToolResultCache write generations"""
+from agent_cache import ToolResultCache
+
+
+def test_read_that_overlapped_a_write_is_not_stored():
+    cache = ToolResultCache()
+    generation = cache.generation("read_emails")  # read starts
+    cache.invalidate_after("send_email")  # a write lands while it runs
+
+    cache.put("read_emails", (5,), "before the write", 0.5, generation)
+
+    assert cache.get("read_emails", (5,)) is None
+
+
+def test_read_after_the_write_is_stored():
+    cache = ToolResultCache()
+    cache.invalidate_after("send_email")
+    generation = cache.generation("read_emails")
+
+    cache.put("read_emails", (5,), "after the write", 0.5, generation)
+
+    assert cache.get("read_emails", (5,)) == "after the write"
@@ -0,0 +1,152 @@
+"""GmailAgent listing and batched metadata fetches against a stub Gmail HTTP backend"""
+import json
+import re
+from urllib.parse import parse_qs, unquote, urlparse
+
+import httplib2
+import pytest
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpMock
+
+import gmail_agent
+from gmail_agent import GmailAgent
+
+_CONTENT_ID = re.compile(r"Content-ID: <[^>]* \+ ([^>]+)>")
+
+RATE_LIMITED = (429, {"error": {"code": 429, "message": "Too many concurrent requests",
+                                "errors": [{"reason": "rateLimitExceeded"}]}})
+USER_RATE_LIMITED = (403, {"error": {"code": 403, "message": "User-rate limit exceeded",
+                                     "errors": [{"reason": "userRateLimitExceeded"}]}})
+NOT_FOUND = (404, {"error": {"code": 404, "message": "Not Found"}})
+
+_REASONS = {200: "OK", 403: "Forbidden", 404: "Not Found", 429: "Too Many Requests"}
+
+
+class GmailHttp(HttpMock):
+    """
+    Answers messages.list (paged by maxResults / pageToken) and batch requests of
+    messages.get, building each multipart response from the request body.
+    failures maps a message ID to the (status, body) its next gets return, one per attempt.
+    """
+
+    def __init__(self, message_ids: list, failures: dict = None):
+        super().__init__(headers={"status": "200"})
+        self.message_ids = message_ids
+        self.failures = failures or {}
+        self.list_calls = []
+        self.batches = []  # message IDs of every batch request, in order
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=1, connection_type=None):
+        if uri.endswith("/batch"):
+            return self._batch(body)
+        params = {key: values[0] for key, values in parse_qs(urlparse(uri).query).items()}
+        self.list_calls.append(params)
+        offset = int(params.get("pageToken", 0))
+        end = offset + int(params["maxResults"])
+        page = {"messages": [{"id": i} for i in self.message_ids[offset:end]]}
+        if end < len(self.message_ids):
+            page["nextPageToken"] = str(end)
+        return httplib2.Response({"status": "200"}), json.dumps(page).encode()
+
+    def _batch(self, body):
+        body = body.decode() if isinstance(body, bytes) else body
+        ids = [unquote(i) for i in _CONTENT_ID.findall(body)]
+        self.batches.append(ids)
+        parts = []
+        for message_id in ids:
+            pending = self.failures.get(message_id)
+            status, payload = pending.pop(0) if pending else (200, message(message_id))
+            parts.append(
+                "--BOUNDARY\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-x + {message_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: application/json\r\n\r\n"
+                f"{json.dumps(payload)}\r\n"
+            )
+        content = "".join(parts) + "--BOUNDARY--\r\n"
+        return httplib2.Response({"status": "200", "content-type": "multipart/mixed; boundary=BOUNDARY"}), \
+            content.encode()
+
+
+def message(message_id: str) -> dict:
+    return {
+        "id": message_id,
+        "threadId": "t" + message_id,
+        "labelIds": ["INBOX"],
+        "snippet": f"snippet {message_id}",
+        "internalDate": "1000",
+        "payload": {"headers": [{"name": "From", "value": "alice@example.com"},
+                                {"name": "Subject", "value": f"subject {message_id}"}]},
+    }
+
+
+@pytest.fixture
+def make_agent(monkeypatch):
+    monkeypatch.setattr(gmail_agent, "BATCH_RETRY_BACKOFF", 0)
+
+    def make(message_ids, failures=None):
+        http = GmailHttp(message_ids, failures)
+        service = build("gmail", "v1", http=http, static_discovery=True, cache_discovery=False)
+        return GmailAgent(service=service), http
+    return make
+
+
+def ids(count: int) -> list:
+    return [f"m{i}" for i in range(count)]
+
+
+def test_list_follows_next_page_token(make_agent, monkeypatch):
+    monkeypatch.setattr(gmail_agent, "LIST_PAGE_SIZE", 3)
+    agent, http = make_agent(ids(7))
+
+    assert agent.list_message_ids(max_results=5) == ids(5)
+    assert [call["maxResults"] for call in http.list_calls] == ["3", "2"]
+
+    http.list_calls.clear()
+    assert agent.list_message_ids(max_results=100) == ids(7)
+    assert [call.get("pageToken") for call in http.list_calls] == [None, "3", "6"]
+
+
+def test_metadata_is_fetched_in_batches_of_50_in_order(make_agent):
+    agent, http = make_agent(ids(120))
+    wanted = list(reversed(ids(120)))
+
+    messages = agent.get_messages_metadata(wanted)
+
+    assert [m["id"] for m in messages] == wanted
+    assert [len(batch) for batch in http.batches] == [50, 50, 20]
+    assert agent.last_failed_ids == []
+
+
+def test_rate_limited_sub_requests_are_retried(make_agent):
+    failures = {"m3": [RATE_LIMITED], "m7": [USER_RATE_LIMITED, RATE_LIMITED], "m9": [NOT_FOUND]}
+    agent, http = make_agent(ids(60), failures)
+
+    messages = agent.get_messages_metadata(ids(60))
+
+    assert [m["id"] for m in messages] == [i for i in ids(60) if i != "m9"]
+    assert http.batches[2:] == [["m3", "m7"], ["m7"]]  # only the rate-limited IDs go again
+    assert agent.last_failed_ids == []  # the deleted message isn't worth asking for again
+
+
+def test_ids_still_rate_limited_are_reported(make_agent):
+    attempts = gmail_agent.BATCH_RETRIES + 1
+    agent, http = make_agent(ids(5), {"m2": [RATE_LIMITED] * attempts})
+
+    messages = agent.get_messages_metadata(ids(5))
+
+    assert [m["id"] for m in messages] == ["m0", "m1", "m3", "m4"]
+    assert agent.last_failed_ids == ["m2"]
+    assert len(http.batches) == attempts
+
+    http.failures["m2"] = [RATE_LIMITED] * attempts
+    summaries = agent.read_emails(max_results=5)
+    assert summaries.count("ID: ") == 4
+    assert "did not return 1 more" in summaries
+
+
+def test_batch_where_everything_failed_raises(make_agent):
+    agent, _ = make_agent(ids(2), {"m0": [NOT_FOUND], "m1": [NOT_FOUND]})
+
+    with pytest.raises(HttpError):
+        agent.get_messages_metadata(ids(2))
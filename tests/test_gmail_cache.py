@@ -0,0 +1,166 @@
+"""MailboxCache sync and lookup against a fake Gmail service"""
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+import gmail_cache
+from gmail_cache import MailboxCache
+
+
+class _Request:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self):
+        return self._fn()
+
+
+class FakeGmail:
+    """Just enough of users().getProfile / users().history().list and GmailAgent's batch helpers"""
+
+    def __init__(self, messages: list):
+        self.messages = {m['id']: m for m in messages}
+        self.history_id = '100'
+        self.history_pages = []  # responses returned by history().list, in order
+        self.history_error = None
+        self.history_calls = []
+        self.full_lists = 0
+        self.last_failed_ids = []
+        self.service = self
+
+    # service.users()...
+    def users(self):
+        return self
+
+    def getProfile(self, userId):
+        return _Request(lambda: {'historyId': self.history_id})
+
+    def history(self):
+        return self
+
+    def list(self, **kwargs):
+        self.history_calls.append(kwargs)
+
+        def run():
+            if self.history_error is not None:
+                raise self.history_error
+            return self.history_pages.pop(0)
+        return _Request(run)
+
+    # GmailAgent helpers used by the cache
+    def list_message_ids(self, max_results):
+        self.full_lists += 1
+        newest = sorted(self.messages.values(), key=lambda m: -int(m['internalDate']))
+        return [m['id'] for m in newest if not {'TRASH', 'SPAM'} & set(m['labelIds'])][:max_results]
+
+    def get_messages_metadata(self, message_ids):
+        return [self.messages[i] for i in message_ids]
+
+
+def message(i: int, subject: str = None, labels=('INBOX',), sender: str = 'alice@example.com') -> dict:
+    return {
+        'id': f'm{i}',
+        'threadId': f't{i}',
+        'internalDate': str(1_000_000 + i),
+        'labelIds': list(labels),
+        'snippet': f'snippet {i}',
+        'payload': {'headers': [
+            {'name': 'From', 'value': sender},
+            {'name': 'Subject', 'value': subject or f'subject {i}'},
+            {'name': 'Date', 'value': f'day {i}'},
+        ]},
+    }
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return MailboxCache(str(tmp_path / 'mirror.sqlite3'))
+
+
+def ids(messages):
+    return [m['id'] for m in messages]
+
+
+def test_full_sync_mirrors_newest_messages(cache):
+    gmail = FakeGmail([message(i) for i in range(5)])
+    cache.sync(gmail)  # no history ID yet -> full sync
+
+    assert gmail.full_lists == 1
+    assert cache.history_id == '100'
+    assert cache.complete
+    assert ids(cache.lookup('', 10)) == ['m4', 'm3', 'm2', 'm1', 'm0']
+
+
+def test_incremental_sync_applies_history(cache):
+    gmail = FakeGmail([message(i) for i in range(3)])
+    cache.full_sync(gmail)
+
+    gmail.messages['m3'] = message(3, subject='invoice')
+    gmail.history_pages = [
+        {'history': [{'messagesAdded': [{'message': {'id': 'm3'}}]},
+                     {'labelsAdded': [{'message': {'id': 'm1', 'labelIds': ['INBOX', 'UNREAD']}}]}],
+         'historyId': '110', 'nextPageToken': 'p2'},
+        {'history': [{'messagesDeleted': [{'message': {'id': 'm0'}}]}], 'historyId': '120'},
+    ]
+    cache.sync(gmail)
+
+    assert gmail.full_lists == 1
+    assert [call['startHistoryId'] for call in gmail.history_calls] == ['100', '100']
+    assert gmail.history_calls[1]['pageToken'] == 'p2'
+    assert cache.history_id == '120'
+    assert ids(cache.lookup('', 10)) == ['m3', 'm2', 'm1']
+    assert ids(cache.lookup('is:unread', 10)) == ['m1']
+    assert ids(cache.lookup('subject:invoice', 10)) == ['m3']
+
+
+def test_expired_history_id_falls_back_to_full_sync(cache):
+    gmail = FakeGmail([message(i) for i in range(2)])
+    cache.full_sync(gmail)
+
+    gmail.messages['m2'] = message(2)
+    gmail.history_id = '200'
+    gmail.history_error = HttpError(httplib2.Response({'status': 404}), b'history too old')
+    cache.sync(gmail)
+
+    assert gmail.full_lists == 2
+    assert cache.history_id == '200'
+    assert ids(cache.lookup('', 10)) == ['m2', 'm1', 'm0']
+
+
+def test_enforce_limits_evicts_oldest_messages_and_bodies(cache, monkeypatch):
+    gmail = FakeGmail([message(i) for i in range(6)])
+    cache.full_sync(gmail)
+    monkeypatch.setattr(gmail_cache, 'MAX_CACHED_MESSAGES', 4)
+    monkeypatch.setattr(gmail_cache, 'MAX_BODY_BYTES', 10)
+
+    cache.store_body('m5', 'x' * 6)
+    cache.store_body('m4', 'y' * 6)  # running total 12 > 10 -> the older body goes
+
+    assert not cache.complete
+    assert ids(cache.lookup('', 4)) == ['m5', 'm4', 'm3', 'm2']
+    assert cache.lookup('', 10) is None  # the mirror no longer holds the whole mailbox
+    assert cache.get_body('m5') == 'x' * 6
+    assert cache.get_body('m4') is None
+    assert cache.get_body('m0') is None
+
+
+def test_trash_and_spam_are_left_out_of_local_answers(cache):
+    gmail = FakeGmail([message(i) for i in range(3)])
+    cache.full_sync(gmail)
+    cache.update_labels('m2', ['TRASH'])
+    cache.update_labels('m1', ['SPAM', 'UNREAD'])
+
+    assert ids(cache.lookup('', 10)) == ['m0']
+    assert cache.lookup('is:unread', 10) == []
+    # Asking for them explicitly goes to the API
+    assert cache.lookup('in:trash', 10) is None
+    assert cache.lookup('in:spam is:unread', 10) is None
+
+
+def test_free_text_goes_to_the_api(cache):
+    gmail = FakeGmail([message(i, subject='quarterly report') for i in range(3)])
+    cache.full_sync(gmail)
+
+    assert cache.lookup('report', 10) is None
+    assert ids(cache.lookup('subject:report', 2)) == ['m2', 'm1']
+    assert ids(cache.lookup('from:alice', 10)) == ['m2', 'm1', 'm0']
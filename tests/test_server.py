@@ -0,0 +1,82 @@
+"""AgentServer request validation and the Ollama limiter's thread-side slots"""
+import asyncio
+import base64
+import json
+import threading
+
+import pytest
+
+import server
+
+
+class StubTranscriber:
+    def transcribe_batch(self, audios):
+        return [f"{len(audio)} samples" for audio in audios]
+
+
+async def request(port: int, method: str, path: str, body: bytes = b"") -> tuple:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+    data = await reader.read()
+    writer.close()
+    head, _, payload = data.partition(b"\r\n\r\n")
+    return int(head.split()[1]), payload
+
+
+@pytest.mark.parametrize("path, body", [
+    ("transcribe", b""),
+    ("transcribe", b"\x00\x01\x02"),
+    ("chat", json.dumps({"pcm": "not base64!"}).encode()),
+    ("chat", json.dumps({"pcm": base64.b64encode(b"odd").decode()}).encode()),
+    ("chat", json.dumps({"pcm": 5}).encode()),
+    ("chat", b"[]"),
+])
+def test_bad_audio_gets_a_400(path, body):
+    async def run():
+        agent = server.AgentServer(app=object(), synthesize=bytes, transcriber=StubTranscriber())
+        _, port = await agent.start("127.0.0.1", 0)
+        session = agent.create_session()
+        status, payload = await request(port, "POST", f"/sessions/{session.id}/{path}", body)
+        agent.server.close()
+        return status, json.loads(payload)
+
+    status, payload = asyncio.run(run())
+    assert status == 400
+    assert payload["error"]
+
+
+def test_pcm_is_transcribed():
+    async def run():
+        agent = server.AgentServer(app=object(), synthesize=bytes, transcriber=StubTranscriber())
+        _, port = await agent.start("127.0.0.1", 0)
+        session = agent.create_session()
+        result = await request(port, "POST", f"/sessions/{session.id}/transcribe", bytes(3200))
+        agent.server.close()
+        return result
+
+    status, payload = asyncio.run(run())
+    assert status == 200
+    assert json.loads(payload) == {"text": "1600 samples"}
+
+
+def test_thread_slots_share_the_limit_with_the_event_loop():
+    limiter = server.FairLimiter(limit=1)
+    order = []
+
+    def worker():
+        with limiter.thread_slot("b"):
+            order.append("worker")
+
+    async def run():
+        limiter.loop = asyncio.get_running_loop()
+        async with limiter.slot("a"):
+            thread = threading.Thread(target=worker)
+            thread.start()
+            await asyncio.sleep(0.1)
+            assert limiter.stats()["waiting"] == 1  # the worker queues behind the loop's call
+            order.append("loop")
+        await asyncio.get_running_loop().run_in_executor(None, thread.join)
+
+    asyncio.run(run())
+    assert order == ["loop", "worker"]
+    assert limiter.stats()["active"] == 0
@@ -0,0 +1,62 @@
+"""StreamingTranscriber windowing against a stub engine"""
+import numpy as np
+import pytest
+
+import speechtotextLIVE
+from speechtotextLIVE import OVERLAP_SECONDS, SAMPLE_RATE, STEP_SECONDS, StreamingTranscriber
+
+BLOCK = int(0.1 * SAMPLE_RATE)
+
+
+class StubEngine:
+    """Records how much audio each pass decodes; words(pass number, seconds of audio) gives its words"""
+
+    def __init__(self, words=None):
+        self.words = words or (lambda n, seconds: [])
+        self.decoded = []
+
+    def transcribe_words(self, audio, **options):
+        self.decoded.append(len(audio))
+        return self.words(len(self.decoded), len(audio) / SAMPLE_RATE)
+
+
+@pytest.fixture
+def make(monkeypatch):
+    def build(engine):
+        monkeypatch.setattr(speechtotextLIVE, "get_transcriber", lambda *args, **kwargs: engine)
+        return StreamingTranscriber()
+    return build
+
+
+def run(transcriber, seconds: float):
+    """What the worker thread does, without the thread: drain the queue, pass every STEP_SECONDS"""
+    for _ in range(int(seconds * SAMPLE_RATE) // BLOCK):
+        transcriber.feed(np.zeros(BLOCK, dtype=np.float32))
+        transcriber._drain_queue()
+        if transcriber._ring.end - transcriber._last_pass_end >= STEP_SECONDS * SAMPLE_RATE:
+            transcriber.process()
+
+
+def test_silence_keeps_the_decoded_window_bounded(make):
+    engine = StubEngine()
+    transcriber = make(engine)
+
+    run(transcriber, 60)
+
+    assert len(engine.decoded) >= 50
+    assert max(engine.decoded) <= (STEP_SECONDS + OVERLAP_SECONDS) * SAMPLE_RATE + BLOCK
+    assert transcriber.dropped_blocks == 0
+
+
+def test_committed_speech_then_silence_stays_bounded(make):
+    # Two words at the start of every window, agreed on by consecutive passes
+    engine = StubEngine(lambda n, seconds: [(0.0, 0.4, "hello"), (0.5, 0.9, "there")] if n <= 3 else [])
+    finals = []
+    transcriber = make(engine)
+    transcriber.on_final = finals.append
+
+    run(transcriber, 30)
+
+    assert finals == ["hello there"]
+    # Once the speech is over, passes go back to one step plus the overlap
+    assert max(engine.decoded[-20:]) <= (STEP_SECONDS + OVERLAP_SECONDS) * SAMPLE_RATE + BLOCK
@@ -0,0 +1,161 @@
+"""Google TTS chunked synthesis against a fake TextToSpeechClient"""
+import io
+import threading
+import time
+import wave
+
+import pytest
+
+pytest.importorskip("google.cloud.texttospeech")
+from google.api_core import exceptions as google_exceptions  # noqa: E402
+
+import texttospeech  # noqa: E402
+import tts_cache  # noqa: E402
+
+TEXT = ("The first sentence is the slowest one to render. "
+        "The second sentence comes back right away. "
+        "The third sentence is quick as well. "
+        "And the fourth one closes the reply.")
+
+
+def pcm(text: str) -> bytes:
+    """Stand-in audio: the text's bytes, padded to whole 16-bit samples"""
+    data = text.encode("utf-8")
+    return data + b"\0" * (len(data) % 2)
+
+
+def wav(frames: bytes) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(texttospeech.SAMPLE_RATE)
+        out.writeframes(frames)
+    return buffer.getvalue()
+
+
+class _Response:
+    def __init__(self, audio_content: bytes):
+        self.audio_content = audio_content
+
+
+class FakeClient:
+    """synthesize_speech returns the text as WAV-wrapped PCM after an optional per-text delay or error"""
+
+    def __init__(self, delays: dict = None, errors: dict = None):
+        self.delays = delays or {}
+        self.errors = errors or {}  # text -> list of exceptions raised by successive calls
+        self.calls = []
+        self.completed = []
+        self._lock = threading.Lock()
+
+    def synthesize_speech(self, input, voice, audio_config, timeout=None, retry=None):
+        text = input.text
+        with self._lock:
+            self.calls.append((text, timeout, retry))
+            pending = self.errors.get(text)
+            error = pending.pop(0) if pending else None
+        time.sleep(self.delays.get(text, 0))
+        if error is not None:
+            raise error
+        with self._lock:
+            self.completed.append(text)
+        return _Response(wav(pcm(text)))
+
+    def attempts(self, text: str) -> int:
+        return sum(1 for call in self.calls if call[0] == text)
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    def install(**kwargs):
+        fake = FakeClient(**kwargs)
+        monkeypatch.setattr(texttospeech, "_tts_client", fake)
+        return fake
+    monkeypatch.setattr(tts_cache, "CACHE_ENABLED", False)
+    monkeypatch.setattr(texttospeech, "get_phrase_cache", lambda: tts_cache.PhraseCache(str(tmp_path)))
+    monkeypatch.setattr(texttospeech, "RETRY_BACKOFF", 0)
+    return install
+
+
+def test_chunks_come_out_in_order_when_they_complete_out_of_order(client):
+    chunks = texttospeech.split_for_synthesis(TEXT)
+    fake = client(delays={chunks[0]: 0.3})
+
+    out = list(texttospeech.synthesize_stream(TEXT))
+
+    assert len(chunks) == 4
+    assert out == [pcm(chunk) for chunk in chunks]
+    assert fake.completed[0] != chunks[0]  # the later requests really finished first
+
+
+def test_wav_headers_are_stripped(client):
+    client()
+
+    audio = texttospeech.synthesize(TEXT)
+
+    assert b"RIFF" not in audio and b"WAVE" not in audio
+    assert audio == b"".join(pcm(chunk) for chunk in texttospeech.split_for_synthesis(TEXT))
+
+
+def test_every_request_has_a_timeout_and_no_client_retry(client):
+    fake = client()
+
+    list(texttospeech.synthesize_stream(TEXT))
+
+    assert fake.calls
+    assert all(timeout == texttospeech.REQUEST_TIMEOUT and retry is None for _, timeout, retry in fake.calls)
+
+
+def test_transient_errors_are_retried_per_chunk(client):
+    chunks = texttospeech.split_for_synthesis(TEXT)
+    fake = client(errors={chunks[1]: [google_exceptions.ServiceUnavailable("busy"),
+                                      google_exceptions.DeadlineExceeded("timed out")]})
+
+    out = list(texttospeech.synthesize_stream(TEXT))
+
+    assert out == [pcm(chunk) for chunk in chunks]
+    assert fake.attempts(chunks[1]) == 3
+    assert all(fake.attempts(chunk) == 1 for chunk in chunks if chunk != chunks[1])
+
+
+def test_chunk_that_keeps_timing_out_is_skipped(client):
+    chunks = texttospeech.split_for_synthesis(TEXT)
+    attempts = texttospeech.REQUEST_RETRIES + 1
+    fake = client(errors={chunks[2]: [google_exceptions.DeadlineExceeded("timed out")] * attempts})
+
+    out = list(texttospeech.synthesize_stream(TEXT))
+
+    assert out == [pcm(chunk) for chunk in chunks if chunk != chunks[2]]
+    assert fake.attempts(chunks[2]) == attempts
+
+
+def test_permanent_errors_are_not_retried(client):
+    chunks = texttospeech.split_for_synthesis(TEXT)
+    fake = client(errors={chunks[0]: [google_exceptions.InvalidArgument("bad input")]})
+
+    out = list(texttospeech.synthesize_stream(TEXT))
+
+    assert out == [pcm(chunk) for chunk in chunks[1:]]
+    assert fake.attempts(chunks[0]) == 1
+
+
+@pytest.mark.parametrize("word", ["word", "naïveté", "日本語の文章"])
+def test_split_keeps_chunks_under_the_request_limit(word):
+    sentence = " ".join([word] * 3000) + "."
+    text = "A short opening sentence here. " + sentence
+
+    chunks = texttospeech.split_for_synthesis(text)
+
+    assert len(chunks) > 2
+    assert all(0 < len(chunk.encode("utf-8")) <= texttospeech.MAX_REQUEST_BYTES for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_split_cuts_text_without_spaces():
+    text = "x" * (texttospeech.MAX_REQUEST_BYTES * 2 + 10) + "."
+
+    chunks = texttospeech.split_for_synthesis(text)
+
+    assert all(len(chunk.encode("utf-8")) <= texttospeech.MAX_REQUEST_BYTES for chunk in chunks)
+    assert "".join(chunks) == text
@@ -0,0 +1,117 @@
+"""PiperEngine streaming and lock ownership against a fake voice and a fake piper executable"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+import texttospeech_piper
+from texttospeech_piper import PiperEngine
+
+
+class FakeVoice:
+    """In-process stand-in: two chunks per utterance, the second held back until the text's gate opens"""
+
+    gates = {}
+
+    @classmethod
+    def load(cls, model_path):
+        return cls()
+
+    def synthesize_stream_raw(self, text):
+        if text == "fail":
+            raise RuntimeError("voice crashed")
+        yield f"{text}:1 ".encode()
+        gate = self.gates.get(text)
+        if gate is not None:
+            gate.wait(2)
+        yield f"{text}:2 ".encode()
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    FakeVoice.gates = {}
+    monkeypatch.setattr(texttospeech_piper, "_piper_bindings", lambda: FakeVoice)
+    return PiperEngine(model_path="fake.onnx")
+
+
+def wait_unlocked(engine, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while engine._lock.locked() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return not engine._lock.locked()
+
+
+def test_first_chunk_arrives_before_synthesis_finishes(engine):
+    gate = FakeVoice.gates["hello"] = threading.Event()
+    stream = engine.synthesize_stream("hello")
+
+    start = time.perf_counter()
+    first = next(stream)
+
+    assert first == b"hello:1 "
+    assert time.perf_counter() - start < 1.0
+    assert not gate.is_set() and engine._lock.locked()  # the rest is still being synthesized
+    gate.set()
+    assert list(stream) == [b"hello:2 "]
+    assert wait_unlocked(engine)
+
+
+def test_early_close_releases_the_lock_and_leaves_no_audio(engine):
+    gate = FakeVoice.gates["first"] = threading.Event()
+    stream = engine.synthesize_stream("first")
+    assert next(stream) == b"first:1 "
+    stream.close()
+    gate.set()
+
+    assert engine.synthesize("second") == b"second:1 second:2 "
+    assert wait_unlocked(engine)
+
+
+def test_abandoned_stream_does_not_block_the_next_utterance(engine):
+    gate = FakeVoice.gates["first"] = threading.Event()
+    stream = engine.synthesize_stream("first")
+    assert next(stream) == b"first:1 "
+    # Never resumed or closed; the worker still finishes the utterance once the voice does
+    gate.set()
+
+    assert engine.synthesize("second") == b"second:1 second:2 "
+    assert wait_unlocked(engine)
+    del stream
+
+
+def test_errors_reach_the_caller_and_the_engine_recovers(engine):
+    with pytest.raises(RuntimeError):
+        engine.synthesize("fail")
+
+    assert engine.synthesize("again") == b"again:1 again:2 "
+
+
+FAKE_PIPER = """\
+import sys, time
+for line in sys.stdin:
+    text = line.strip()
+    sys.stdout.buffer.write((text + ":1 ").encode()); sys.stdout.flush()
+    time.sleep(0.2)
+    sys.stdout.buffer.write((text + ":2 ").encode()); sys.stdout.flush()
+    sys.stderr.write("Real-time factor: 0.1\\n"); sys.stderr.flush()
+"""
+
+
+@pytest.mark.skipif(os.name == "nt", reason="the fake executable is a shebang script")
+def test_worker_process_early_close_leaves_no_audio(monkeypatch, tmp_path):
+    piper = tmp_path / "piper"
+    piper.write_text(f"#!{sys.executable}\n{FAKE_PIPER}")
+    piper.chmod(0o755)
+    monkeypatch.setattr(texttospeech_piper, "_piper_bindings", lambda: None)
+    engine = PiperEngine(piper_path=str(piper), model_path="fake.onnx")
+    try:
+        stream = engine.synthesize_stream("first")
+        assert next(stream) == b"first:1 "
+        stream.close()
+
+        assert engine.synthesize("second") == b"second:1 second:2 "
+        assert wait_unlocked(engine)
+    finally:
+        engine.close()
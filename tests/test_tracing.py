@@ -0,0 +1,53 @@
+"""Turn attribution of spans opened on worker threads"""
+import asyncio
+import concurrent.futures
+import threading
+
+import pytest
+
+import tracing
+
+
+class Records(list):
+    put = list.append
+
+
+@pytest.fixture
+def records(monkeypatch):
+    records = Records()
+    monkeypatch.setattr(tracing, "_enabled", True)
+    monkeypatch.setattr(tracing, "_writer", records)
+    monkeypatch.setattr(tracing, "_metrics", None)
+    return records
+
+
+def work(name: str):
+    with tracing.span(name):
+        pass
+
+
+def test_bound_work_keeps_its_turn_across_concurrent_sessions(records):
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+
+    async def session(name: str, delay: float):
+        turn = tracing.start_turn()
+        await asyncio.sleep(delay)  # the other session starts its turn meanwhile
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(pool, tracing.bind(work), name)
+        await loop.run_in_executor(pool, work, name + ".unbound")
+        return turn
+
+    async def main():
+        return await asyncio.gather(session("a", 0.05), session("b", 0.0))
+
+    turn_a, turn_b = asyncio.run(main())
+    turns = {record["name"]: record["turn"] for record in records}
+    assert turns == {"a": turn_a, "b": turn_b, "a.unbound": None, "b.unbound": None}
+
+
+def test_bind_to_an_explicit_turn(records):
+    thread = threading.Thread(target=tracing.bind(work, turn=42), args=("stage",))
+    thread.start()
+    thread.join()
+
+    assert [(record["name"], record["turn"]) for record in records] == [("stage", 42)]
@@ -1,68 +1,206 @@
-from google.cloud import texttospeech
-import pygame
-import io
-import time
-
-# Initialize TTS client once at module level (reusing client saves 3-4 seconds per call)
-_tts_client = None
-
-def _get_tts_client():
-    """Get or create the TTS client (singleton pattern)"""
-    global _tts_client
-    if _tts_client is None:
-        _tts_client = texttospeech.TextToSpeechClient()
-    return _tts_client
-
-# Initialize pygame mixer once at module level
-pygame.mixer.init(frequency=24000, size=-16, channels=1, buffer=512)
-
-# Pre-configure voice settings (reuse across calls)
-_voice_params = texttospeech.VoiceSelectionParams(
-    language_code="en-IN",
-    name="en-IN-Neural2-D"
-)
-
-# Use LINEAR16 for faster processing (no MP3 encoding overhead)
-_audio_config = texttospeech.AudioConfig(
-    audio_encoding=texttospeech.AudioEncoding.LINEAR16,
-    sample_rate_hertz=24000
-)
-
-def text_to_speech_live(text: str):
-    """
-    Convert text to speech and play it live without saving to file.
-    Optimized for minimal latency.
-    """
-    if not text or text.strip() == "":
-        return
-    
-    # Use the singleton client (avoids re-authentication overhead)
-    client = _get_tts_client()
-
-    synthesis_input = texttospeech.SynthesisInput(text=text)
-
-    # Synthesize speech with pre-configured settings
-    response = client.synthesize_speech(
-        input=synthesis_input,
-        voice=_voice_params,
-        audio_config=_audio_config
-    )
-
-    # Load audio from bytes and play immediately
-    audio_stream = io.BytesIO(response.audio_content)
-    
-    # Load and play with optimized settings
-    pygame.mixer.music.load(audio_stream, 'wav')
-    pygame.mixer.music.play()
-
-    # Wait for audio to finish playing
-    while pygame.mixer.music.get_busy():
-        pygame.time.wait(100)  # More efficient than time.sleep()
-
-
-if __name__ == "__main__":
-    text = (
-        "This is a simple demonstration of Google Cloud Text to Speech. "
-        "The audio you are hearing was generated using Application Default Credentials."
-    )
-    text_to_speech_live(text)
+from google.api_core import exceptions as google_exceptions
+from google.cloud import texttospeech
+import collections
+import concurrent.futures
+import io
+import threading
+import time
+import wave
+
+from audio_playback import get_player
+from speech_pipeline import split_sentences
+from tts_cache import get_phrase_cache, prerender_in_background
+import tracing
+
+# Initialize TTS client once at module level (reusing client saves 3-4 seconds per call)
+_tts_client = None
+
+def _get_tts_client():
+    """Get or create the TTS client (singleton pattern)"""
+    global _tts_client
+    if _tts_client is None:
+        _tts_client = texttospeech.TextToSpeechClient()
+    return _tts_client
+
+SAMPLE_RATE = 24000
+
+# Long texts are split into sentences that are synthesized concurrently and played in order
+MAX_PARALLEL_REQUESTS = 3
+MAX_REQUEST_BYTES = 4500  # the API rejects inputs over 5000 bytes
+REQUEST_TIMEOUT = 10.0  # seconds per synthesize_speech call
+REQUEST_RETRIES = 2  # extra attempts for a chunk after a transient error
+RETRY_BACKOFF = 0.25  # seconds, doubled after every failed attempt
+
+_RETRYABLE = (
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.TooManyRequests,
+)
+
+# Pre-configure voice settings (reuse across calls)
+_voice_params = texttospeech.VoiceSelectionParams(
+    language_code="en-IN",
+    name="en-IN-Neural2-D"
+)
+
+# Use LINEAR16 for faster processing (no MP3 encoding overhead)
+_audio_config = texttospeech.AudioConfig(
+    audio_encoding=texttospeech.AudioEncoding.LINEAR16,
+    sample_rate_hertz=SAMPLE_RATE
+)
+
+def _strip_wav_header(audio: bytes) -> bytes:
+    """LINEAR16 responses come wrapped in a WAV container; return just the PCM frames"""
+    with wave.open(io.BytesIO(audio), 'rb') as wav:
+        return wav.readframes(wav.getnframes())
+
+
+def split_for_synthesis(text: str) -> list:
+    """Sentences of the text, with any sentence over MAX_REQUEST_BYTES cut at word boundaries"""
+    chunks = []
+    for sentence in split_sentences(text):
+        while len(sentence.encode("utf-8")) > MAX_REQUEST_BYTES:
+            limit = len(sentence.encode("utf-8")[:MAX_REQUEST_BYTES].decode("utf-8", "ignore"))
+            cut = sentence.rfind(" ", 0, limit)
+            cut = cut if cut > 0 else limit
+            chunks.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentence:
+            chunks.append(sentence)
+    return chunks
+
+
+_request_pool = None
+_request_pool_lock = threading.Lock()
+
+
+def _get_request_pool() -> concurrent.futures.ThreadPoolExecutor:
+    """Get or create the request thread pool (singleton pattern)"""
+    global _request_pool
+    with _request_pool_lock:
+        if _request_pool is None:
+            _request_pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=MAX_PARALLEL_REQUESTS, thread_name_prefix="google-tts"
+            )
+        return _request_pool
+
+
+def _synthesize_with_retry(text: str) -> bytes:
+    for attempt in range(REQUEST_RETRIES + 1):
+        try:
+            return _synthesize_uncached(text)
+        except _RETRYABLE as e:
+            if attempt == REQUEST_RETRIES:
+                raise
+            delay = RETRY_BACKOFF * 2 ** attempt
+            print(f"Google TTS {type(e).__name__}, retrying in {delay:.2f}s")
+            time.sleep(delay)
+
+
+def _synthesize_chunk(text: str):
+    """PCM for one chunk (phrase cache first), or None if every attempt failed"""
+    try:
+        # Repeated phrases come from the phrase cache instead of a paid API call
+        return get_phrase_cache().get_or_synthesize(text, _voice_params.name, SAMPLE_RATE, _synthesize_with_retry)
+    except Exception as e:
+        print(f"Error during TTS: {e}")
+        return None
+
+
+def synthesize_stream(text: str):
+    """
+    Yield raw PCM for the text chunk by chunk, in order.
+
+    Up to MAX_PARALLEL_REQUESTS chunks are in flight at once, so while the
+    first sentence plays the next ones are already being synthesized.
+    A chunk that still fails after its retries is skipped.
+    """
+    if not text or text.strip() == "":
+        return
+    pool = _get_request_pool()
+    pending = collections.deque()
+    for chunk in split_for_synthesis(text):
+        pending.append(pool.submit(tracing.bind(_synthesize_chunk), chunk))
+        if len(pending) >= MAX_PARALLEL_REQUESTS:
+            audio = pending.popleft().result()
+            if audio:
+                yield audio
+    while pending:
+        audio = pending.popleft().result()
+        if audio:
+            yield audio
+
+
+def synthesize(text: str):
+    """Synthesize text with Google Cloud TTS and return raw PCM bytes, or None for empty text or failure"""
+    audio = b"".join(synthesize_stream(text))
+    return audio or None
+
+
+def _synthesize_uncached(text: str) -> bytes:
+    """One synthesize_speech call, bypassing the phrase cache"""
+    # Use the singleton client (avoids re-authentication overhead)
+    client = _get_tts_client()
+
+    synthesis_input = texttospeech.SynthesisInput(text=text)
+
+    with tracing.span("tts.synthesize", backend="google", chars=len(text)) as span:
+        # Synthesize speech with pre-configured settings
+        response = client.synthesize_speech(
+            input=synthesis_input,
+            voice=_voice_params,
+            audio_config=_audio_config,
+            timeout=REQUEST_TIMEOUT,
+            retry=None  # retried per chunk in _synthesize_with_retry
+        )
+        audio = _strip_wav_header(response.audio_content)
+        span.set(bytes=len(audio), audio_seconds=round(len(audio) / 2 / SAMPLE_RATE, 3))
+    return audio
+
+
+def play_audio(audio: bytes):
+    """Queue raw PCM bytes for gapless playback and return immediately"""
+    if audio:
+        get_player(SAMPLE_RATE).write(audio)
+
+
+def wait_for_playback(timeout: float = None) -> bool:
+    """Block until everything queued with play_audio() has been played"""
+    return get_player(SAMPLE_RATE).wait(timeout)
+
+
+def is_playing() -> bool:
+    """True while queued TTS audio is still coming out of the speaker"""
+    return get_player(SAMPLE_RATE).is_playing()
+
+
+def stop_playback():
+    """Silence the speaker and drop any queued audio"""
+    get_player(SAMPLE_RATE).stop()
+
+
+def warmup():
+    """Create the client, run one tiny synthesis and open the output device, so the first reply starts fast"""
+    synthesize("Hi.")
+    get_player(SAMPLE_RATE).start()
+    prerender_in_background(_voice_params.name, SAMPLE_RATE, _synthesize_uncached)
+
+
+def text_to_speech_live(text: str):
+    """
+    Convert text to speech and play it live without saving to file.
+    The first sentence starts playing while the rest are still being synthesized.
+    """
+    with tracing.span("tts.speak", backend="google", chars=len(text or "")):
+        for audio in synthesize_stream(text):
+            play_audio(audio)
+        wait_for_playback()
+
+
+if __name__ == "__main__":
+    text = (
+        "This is a simple demonstration of Google Cloud Text to Speech. "
+        "The audio you are hearing was generated using Application Default Credentials."
+    )
+    text_to_speech_live(text)
@@ -1,105 +1,362 @@
-"""
-Piper TTS - Fast Local Text-to-Speech
-Uses Piper for low-latency, offline speech synthesis
-"""
-import subprocess
-import pygame
-import os
-import tempfile
-import wave
-
-# Initialize pygame mixer once at module level for fast playback
-pygame.mixer.init(frequency=22050, size=-16, channels=1, buffer=512)
-
-# Piper executable path - update this after installation
-PIPER_PATH = r"piper/piper.exe"  # Windows
-# For Linux/Mac: PIPER_PATH = "./piper/piper"
-
-# Voice model path - update this based on which voice you download
-VOICE_MODEL = r"piper/voices/en_US-lessac-high.onnx"
-
-def text_to_speech_live(text: str):
-    """
-    Convert text to speech using Piper and play it live.
-    Ultra-fast, runs completely offline.
-    
-    Args:
-        text: The text to convert to speech
-    """
-    if not text or text.strip() == "":
-        return
-    
-    # Check if Piper is installed
-    if not os.path.exists(PIPER_PATH):
-        print(f"ERROR: Piper not found at {PIPER_PATH}")
-        print("Please run the installation guide first!")
-        return
-    
-    if not os.path.exists(VOICE_MODEL):
-        print(f"ERROR: Voice model not found at {VOICE_MODEL}")
-        print("Please download a voice model first!")
-        return
-    
-    # Create temporary WAV file
-    with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_wav:
-        temp_wav_path = temp_wav.name
-    
-    try:
-        # Run Piper to generate audio
-        # Piper reads from stdin and outputs to stdout
-        process = subprocess.Popen(
-            [PIPER_PATH, "--model", VOICE_MODEL, "--output_file", temp_wav_path],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        
-        # Send text to Piper
-        stdout, stderr = process.communicate(input=text, timeout=5)
-        
-        if process.returncode != 0:
-            print(f"Piper error: {stderr}")
-            return
-        
-        # Play the generated audio
-        pygame.mixer.music.load(temp_wav_path)
-        pygame.mixer.music.play()
-        
-        # Wait for playback to complete
-        while pygame.mixer.music.get_busy():
-            pygame.time.wait(100)
-            
-    except subprocess.TimeoutExpired:
-        print("Piper timed out - text might be too long")
-        process.kill()
-    except Exception as e:
-        print(f"Error during TTS: {e}")
-    finally:
-        # Clean up temporary file
-        if os.path.exists(temp_wav_path):
-            try:
-                os.unlink(temp_wav_path)
-            except:
-                pass  # File might still be in use
-
-
-def test_piper():
-    """Test if Piper is properly installed and configured"""
-    print("Testing Piper TTS...")
-    print(f"Piper path: {PIPER_PATH}")
-    print(f"Voice model: {VOICE_MODEL}")
-    print(f"Piper exists: {os.path.exists(PIPER_PATH)}")
-    print(f"Voice exists: {os.path.exists(VOICE_MODEL)}")
-    
-    if os.path.exists(PIPER_PATH) and os.path.exists(VOICE_MODEL):
-        print("\n✓ Piper is properly configured!")
-        print("Testing speech output...")
-        text_to_speech_live("Hello! This is a test of Piper text to speech. It's running locally on your computer.")
-    else:
-        print("\n✗ Piper is not properly configured.")
-        print("Please follow the installation guide.")
-
-
-if __name__ == "__main__":
-    test_piper()
+"""
+Piper TTS - Fast Local Text-to-Speech
+Uses Piper for low-latency, offline speech synthesis.
+The voice is loaded once by a long-running engine and audio stays in memory as raw PCM.
+"""
+import concurrent.futures
+import functools
+import json
+import os
+import queue
+import subprocess
+import threading
+import time
+
+from audio_playback import get_player
+from tts_cache import get_phrase_cache, prerender_in_background
+import tracing
+
+# Piper executable path - update this after installation
+PIPER_PATH = r"piper/piper.exe"  # Windows
+# For Linux/Mac: PIPER_PATH = "./piper/piper"
+
+# Voice model path - update this based on which voice you download
+VOICE_MODEL = r"piper/voices/en_US-lessac-high.onnx"
+
+# Length-aware synthesis deadline: base seconds + seconds per character of input
+PIPER_BASE_TIMEOUT = 3.0
+PIPER_SECONDS_PER_CHAR = 0.05
+
+# How long to keep draining stdout after Piper reports an utterance as done
+_STDOUT_GRACE = 0.05
+
+_END = object()  # end of an utterance's chunk queue
+
+
+def _voice_sample_rate(model_path: str) -> int:
+    """Read the sample rate from the voice's .onnx.json config (22050 for most voices)"""
+    try:
+        with open(model_path + ".json", encoding="utf-8") as f:
+            return int(json.load(f)["audio"]["sample_rate"])
+    except (OSError, KeyError, ValueError):
+        return 22050
+
+
+SAMPLE_RATE = _voice_sample_rate(VOICE_MODEL)
+
+# Phrase cache key for this voice
+VOICE_NAME = os.path.splitext(os.path.basename(VOICE_MODEL))[0]
+
+
+@functools.lru_cache(maxsize=None)
+def _piper_bindings():
+    """PiperVoice from the piper Python bindings, or None when only the executable is available (checked once)"""
+    try:
+        from piper.voice import PiperVoice
+        return PiperVoice
+    except ImportError:
+        return None
+
+
+def synthesis_deadline(text: str) -> float:
+    """Seconds we allow Piper to spend on this text before treating it as hung"""
+    return PIPER_BASE_TIMEOUT + len(text) * PIPER_SECONDS_PER_CHAR
+
+
+class PiperEngine:
+    """
+    Long-running Piper voice that returns raw 16-bit mono PCM in memory.
+
+    Uses the piper Python bindings in-process when they are installed,
+    otherwise keeps one `piper --output_raw` process alive and feeds it
+    one line of text per utterance over stdin.
+
+    Each utterance is synthesized by the engine's single worker thread, which reads it
+    to the end under the lock and hands chunks to the caller through a queue as they
+    arrive. A caller that stops early never holds the lock or leaves audio behind.
+    """
+
+    def __init__(self, piper_path: str = PIPER_PATH, model_path: str = VOICE_MODEL):
+        self.piper_path = piper_path
+        self.model_path = model_path
+        self.sample_rate = _voice_sample_rate(model_path)
+        self._lock = threading.Lock()
+        self._voice = None
+        self._process = None
+        self._chunks = None
+        self._utterance_done = None
+        self._worker = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="piper")
+        self.start()
+
+    # ---------------- lifecycle ----------------
+
+    def start(self):
+        """Load the voice (in-process) or launch the Piper worker process"""
+        start = time.perf_counter()
+        voice_class = _piper_bindings()
+        if voice_class is not None:
+            self._voice = voice_class.load(self.model_path)
+            mode = "in-process"
+        else:
+            self._start_process()
+            mode = "worker process"
+        print(f"Piper voice loaded ({mode}) in {time.perf_counter() - start:.2f}s")
+
+    def _start_process(self):
+        self._chunks = queue.Queue()
+        self._utterance_done = threading.Event()
+        self._process = subprocess.Popen(
+            [self.piper_path, "--model", self.model_path, "--output_raw"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0
+        )
+        threading.Thread(target=self._read_stdout, args=(self._process, self._chunks), daemon=True).start()
+        threading.Thread(target=self._read_stderr, args=(self._process, self._utterance_done), daemon=True).start()
+
+    def is_healthy(self) -> bool:
+        """True if the voice is loaded or the worker process is still running"""
+        if self._voice is not None:
+            return True
+        return self._process is not None and self._process.poll() is None
+
+    def restart(self):
+        """Kill the worker (if any) and start a fresh one"""
+        print("Restarting Piper engine...")
+        self.close()
+        self.start()
+
+    def close(self):
+        if self._process is not None:
+            try:
+                self._process.kill()
+                self._process.wait(timeout=2)
+            except Exception:
+                pass
+        self._process = None
+        self._voice = None
+
+    # ---------------- worker process I/O ----------------
+
+    @staticmethod
+    def _read_stdout(process, chunks):
+        while True:
+            data = process.stdout.read(4096)
+            if not data:
+                return
+            chunks.put(data)
+
+    @staticmethod
+    def _read_stderr(process, utterance_done):
+        # Piper logs one "Real-time factor" line after it has written and flushed each utterance
+        for line in iter(process.stderr.readline, b""):
+            if b"Real-time factor" in line:
+                utterance_done.set()
+
+    def _synthesize_process(self, text: str):
+        self._utterance_done.clear()
+        # Piper treats each line as one utterance, so the text must be a single line
+        line = " ".join(text.split()) + "\n"
+        self._process.stdin.write(line.encode("utf-8"))
+        self._process.stdin.flush()
+
+        deadline = time.monotonic() + synthesis_deadline(text)
+        while True:
+            try:
+                yield self._chunks.get(timeout=0.02)
+                continue
+            except queue.Empty:
+                pass
+            if self._utterance_done.is_set():
+                # The last chunk may still be on its way from the reader thread
+                try:
+                    while True:
+                        yield self._chunks.get(timeout=_STDOUT_GRACE)
+                except queue.Empty:
+                    return
+            if self._process.poll() is not None:
+                raise RuntimeError("Piper process exited during synthesis")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Piper took longer than {synthesis_deadline(text):.1f}s")
+
+    # ---------------- synthesis ----------------
+
+    def _utterance_chunks(self, text: str):
+        if self._voice is not None:
+            if hasattr(self._voice, "synthesize_stream_raw"):
+                yield from self._voice.synthesize_stream_raw(text)
+            else:
+                for chunk in self._voice.synthesize(text):
+                    yield chunk.audio_int16_bytes
+        else:
+            yield from self._synthesize_process(text)
+
+    def _produce(self, text: str, chunks: queue.Queue):
+        """Worker thread: read the whole utterance under the lock, passing chunks on as they arrive"""
+        try:
+            with self._lock:
+                if not self.is_healthy():
+                    self.restart()
+                try:
+                    for chunk in self._utterance_chunks(text):
+                        chunks.put(chunk)
+                except (TimeoutError, RuntimeError):
+                    # Leave a working engine behind for the next utterance
+                    self.restart()
+                    raise
+        except Exception as e:
+            chunks.put(e)
+        else:
+            chunks.put(_END)
+
+    def synthesize_stream(self, text: str):
+        """Yield raw PCM chunks for the text as Piper produces them"""
+        chunks = queue.Queue()
+        self._worker.submit(self._produce, text, chunks)
+        while True:
+            chunk = chunks.get()
+            if chunk is _END:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+    def synthesize(self, text: str) -> bytes:
+        """Return the whole utterance as raw PCM bytes"""
+        return b"".join(self.synthesize_stream(text))
+
+
+_engine = None
+
+
+def _get_engine():
+    """Get or create the Piper engine (singleton pattern)"""
+    global _engine
+    if _engine is None:
+        _engine = PiperEngine()
+    return _engine
+
+
+def _check_installed() -> bool:
+    # The executable is only needed by the worker process, not by the in-process bindings
+    if _piper_bindings() is None and not os.path.exists(PIPER_PATH):
+        print(f"ERROR: Piper not found at {PIPER_PATH}")
+        print("Please run the installation guide first!")
+        return False
+
+    if not os.path.exists(VOICE_MODEL):
+        print(f"ERROR: Voice model not found at {VOICE_MODEL}")
+        print("Please download a voice model first!")
+        return False
+    return True
+
+
+def synthesize_stream(text: str):
+    """
+    Yield raw PCM chunks for the text as the shared Piper engine produces them.
+
+    Args:
+        text: The text to convert to speech
+    """
+    if not text or text.strip() == "" or not _check_installed():
+        return
+    try:
+        yield from _get_engine().synthesize_stream(text)
+    except TimeoutError as e:
+        print(f"Piper timed out - {e}")
+    except Exception as e:
+        print(f"Error during TTS: {e}")
+
+
+def synthesize(text: str):
+    """
+    Synthesize text with the shared Piper engine and return raw PCM bytes, or None on failure.
+
+    Args:
+        text: The text to convert to speech
+    """
+    with tracing.span("tts.synthesize", backend="piper", chars=len(text or "")) as span:
+        cache = get_phrase_cache()
+        audio = cache.get(text, VOICE_NAME, SAMPLE_RATE)
+        cache_hit = audio is not None
+        if not cache_hit:
+            audio = b"".join(synthesize_stream(text))
+            cache.put(text, VOICE_NAME, SAMPLE_RATE, audio)
+        span.set(bytes=len(audio), audio_seconds=round(len(audio) / 2 / SAMPLE_RATE, 3), cache_hit=cache_hit)
+    return audio or None
+
+
+def play_audio(audio: bytes):
+    """Queue raw PCM bytes for gapless playback and return immediately"""
+    if audio:
+        get_player(SAMPLE_RATE).write(audio)
+
+
+def wait_for_playback(timeout: float = None) -> bool:
+    """Block until everything queued with play_audio() has been played"""
+    return get_player(SAMPLE_RATE).wait(timeout)
+
+
+def is_playing() -> bool:
+    """True while queued TTS audio is still coming out of the speaker"""
+    return get_player(SAMPLE_RATE).is_playing()
+
+
+def stop_playback():
+    """Silence the speaker and drop any queued audio"""
+    get_player(SAMPLE_RATE).stop()
+
+
+def warmup():
+    """Load the voice, run one tiny synthesis and open the output device, so the first reply starts fast"""
+    if not _check_installed():
+        raise RuntimeError("Piper is not installed")
+    _get_engine().synthesize("Hi.")
+    get_player(SAMPLE_RATE).start()
+    prerender_in_background(VOICE_NAME, SAMPLE_RATE, lambda text: b"".join(synthesize_stream(text)))
+
+
+def text_to_speech_live(text: str):
+    """
+    Convert text to speech using Piper and play it live.
+    Playback starts with the first PCM chunk, while the rest is still being synthesized.
+    
+    Args:
+        text: The text to convert to speech
+    """
+    with tracing.span("tts.speak", backend="piper", chars=len(text or "")) as span:
+        cache = get_phrase_cache()
+        audio = cache.get(text, VOICE_NAME, SAMPLE_RATE)
+        if audio is not None:
+            play_audio(audio)
+        else:
+            chunks = []
+            for chunk in synthesize_stream(text):
+                chunks.append(chunk)
+                play_audio(chunk)
+            audio = b"".join(chunks)
+            cache.put(text, VOICE_NAME, SAMPLE_RATE, audio)
+        wait_for_playback()
+        span.set(bytes=len(audio), audio_seconds=round(len(audio) / 2 / SAMPLE_RATE, 3))
+
+
+def test_piper():
+    """Test if Piper is properly installed and configured"""
+    print("Testing Piper TTS...")
+    print(f"Piper path: {PIPER_PATH}")
+    print(f"Voice model: {VOICE_MODEL}")
+    print(f"Piper exists: {os.path.exists(PIPER_PATH)}")
+    print(f"Voice exists: {os.path.exists(VOICE_MODEL)}")
+    
+    if os.path.exists(PIPER_PATH) and os.path.exists(VOICE_MODEL):
+        print("\n✓ Piper is properly configured!")
+        print("Testing speech output...")
+        text_to_speech_live("Hello! This is a test of Piper text to speech. It's running locally on your computer.")
+    else:
+        print("\n✗ Piper is not properly configured.")
+        print("Please follow the installation guide.")
+
+
+if __name__ == "__main__":
+    test_piper()
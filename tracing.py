@@ -0,0 +1,266 @@
+"""
+Per-turn tracing
+Spans with timings, sizes (audio seconds, tokens, bytes) and errors for STT, the agent,
+tools, Gmail and TTS. Finished spans are appended to a JSONL trace file by a background
+writer and aggregated for an optional Prometheus text endpoint.
+
+Off unless TRACING=1; while off, span() hands back a shared no-op object and traced()
+functions cost one flag check, so the instrumentation can stay in the hot path.
+"""
+import contextvars
+import functools
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ---------------- CONFIG ----------------
+TRACING_ENABLED = os.getenv("TRACING", "0") == "1"
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 = no Prometheus endpoint
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+# ---------------------------------------
+
+_enabled = False
+_ids = itertools.count(1)
+_turns = itertools.count(1)
+_turn = contextvars.ContextVar("trace_turn", default=None)
+_parent = contextvars.ContextVar("trace_parent", default=None)
+_writer = None
+_metrics = None
+_metrics_server = None
+
+
+class _NoopSpan:
+    """Returned by span() while tracing is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.id = next(_ids)
+        self.parent = _parent.get()
+        self.turn = _turn.get()
+
+    def set(self, **attrs):
+        """Attach sizes or results discovered while the span is open"""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._token = _parent.set(self.id)
+        self.started = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._start
+        _parent.reset(self._token)
+        record = {
+            "turn": self.turn,
+            "span": self.id,
+            "parent": self.parent,
+            "name": self.name,
+            "start": round(self.started, 6),
+            "duration_ms": round(duration * 1000, 3),
+            "thread": threading.current_thread().name,
+            "attrs": self.attrs,
+        }
+        if exc_type is not None:
+            record["error"] = f"{exc_type.__name__}: {exc}"
+        if _writer is not None:
+            _writer.put(record)
+        if _metrics is not None:
+            _metrics.observe(self.name, duration, self.attrs, exc_type is not None)
+        return False
+
+
+def span(name: str, **attrs):
+    """
+    Context manager timing one stage:
+
+        with tracing.span("tts.synthesize", chars=len(text)) as s:
+            audio = synthesize(text)
+            s.set(bytes=len(audio))
+    """
+    if not _enabled:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def traced(name: str):
+    """Decorator form of span() for functions whose only attribute is their timing"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_turn() -> int:
+    """Begin a new user turn; spans opened from here on (in this context) carry its number"""
+    if not _enabled:
+        return None
+    turn = next(_turns)
+    _turn.set(turn)
+    return turn
+
+
+def current_turn():
+    """Number of the turn spans opened here are attributed to, or None"""
+    return _turn.get()
+
+
+def bind(fn, turn=None):
+    """
+    fn wrapped to run in a copy of the caller's context, for work handed to an executor
+    or thread (they don't inherit contextvars), so its spans stay in the caller's turn:
+
+        pool.submit(tracing.bind(synthesize), text)
+
+    turn: attribute the spans to this turn instead, for stages that serve many turns
+    """
+    if not _enabled:
+        return fn
+    context = contextvars.copy_context()
+    if turn is not None:
+        context.run(_turn.set, turn)
+    return functools.partial(context.run, fn)
+
+
+# ---------------- exporters ----------------
+
+class _JsonlWriter:
+    """Appends span records to the trace file from a background thread"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue = queue.SimpleQueue()
+        threading.Thread(target=self._run, daemon=True, name="trace-writer").start()
+
+    def put(self, record: dict):
+        self._queue.put(record)
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                record = self._queue.get()
+                f.write(json.dumps(record, default=str) + "\n")
+                if self._queue.empty():
+                    f.flush()
+
+
+class _Metrics:
+    """Per-span-name latency histograms, error counts and totals of numeric attributes"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def observe(self, name: str, seconds: float, attrs: dict, error: bool):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = {
+                    "count": 0, "sum": 0.0, "errors": 0,
+                    "buckets": [0] * len(self.buckets), "attrs": {},
+                }
+            stats["count"] += 1
+            stats["sum"] += seconds
+            stats["errors"] += error
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    stats["buckets"][i] += 1
+            for key, value in attrs.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    stats["attrs"][key] = stats["attrs"].get(key, 0) + value
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        with self._lock:
+            stats = {name: dict(s, buckets=list(s["buckets"]), attrs=dict(s["attrs"]))
+                     for name, s in self._stats.items()}
+        lines = ["# TYPE brainwave_span_seconds histogram"]
+        for name, s in sorted(stats.items()):
+            for bound, count in zip(self.buckets, s["buckets"]):
+                lines.append(f'brainwave_span_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+            lines.append(f'brainwave_span_seconds_bucket{{span="{name}",le="+Inf"}} {s["count"]}')
+            lines.append(f'brainwave_span_seconds_sum{{span="{name}"}} {s["sum"]:.6f}')
+            lines.append(f'brainwave_span_seconds_count{{span="{name}"}} {s["count"]}')
+        lines.append("# TYPE brainwave_span_errors_total counter")
+        for name, s in sorted(stats.items()):
+            lines.append(f'brainwave_span_errors_total{{span="{name}"}} {s["errors"]}')
+        lines.append("# TYPE brainwave_span_attribute_total counter")
+        for name, s in sorted(stats.items()):
+            for key, value in sorted(s["attrs"].items()):
+                lines.append(f'brainwave_span_attribute_total{{span="{name}",attribute="{key}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+def _serve_metrics(port: int):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = _metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    print(f"[tracing] metrics on http://127.0.0.1:{server.server_address[1]}/metrics")
+    return server
+
+
+def enable(path: str = TRACE_FILE, metrics_port: int = METRICS_PORT):
+    """Turn tracing on (done at import when TRACING=1)"""
+    global _enabled, _writer, _metrics, _metrics_server
+    if _enabled:
+        return
+    _writer = _JsonlWriter(path) if path else None
+    _metrics = _Metrics()
+    if metrics_port:
+        _metrics_server = _serve_metrics(metrics_port)
+    _enabled = True
+    if path:
+        print(f"[tracing] writing spans to {path}")
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def metrics_text() -> str:
+    """Current metrics in Prometheus text format (empty while tracing is off)"""
+    return _metrics.render() if _metrics is not None else ""
+
+
+if TRACING_ENABLED:
+    enable()
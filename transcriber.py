@@ -0,0 +1,267 @@
+"""
+Shared Whisper transcription engine
+Loads the ASR model once per process and reuses it for every utterance.
+Two interchangeable backends: openai-whisper and faster-whisper (CTranslate2, int8 on CPU)
+"""
+import os
+import threading
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ---------------- CONFIG ----------------
+# Override any of these from .env, e.g. ASR_BACKEND=faster-whisper
+ASR_BACKEND = os.getenv("ASR_BACKEND", "openai-whisper")  # "openai-whisper" or "faster-whisper"
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "small")
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "auto")  # "auto", "cpu" or "cuda"
+# "auto", or float16 / float32 (openai-whisper); int8 / int8_float16 / float16 / float32 (faster-whisper)
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "auto")
+WHISPER_WARMUP = os.getenv("WHISPER_WARMUP", "1") == "1"
+# faster-whisper only
+WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", "0"))  # 0 lets CTranslate2 decide
+WHISPER_NUM_WORKERS = int(os.getenv("WHISPER_NUM_WORKERS", "1"))
+WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "0"))  # >0 enables batched decoding
+WHISPER_BEAM_SIZE = int(os.getenv("WHISPER_BEAM_SIZE", "1"))
+SAMPLE_RATE = 16000
+MAX_BATCH_SECONDS = 30  # Whisper's window; longer utterances are transcribed on their own
+# ---------------------------------------
+
+
+class TranscriptionEngine:
+    """
+    Long-lived ASR model with load and inference timing.
+
+    Subclasses implement _load() and _run(audio, word_timestamps, options),
+    which returns (text, words) with words as (start, end, word) tuples.
+    """
+
+    backend = None
+    supports_batch = False  # _run_batch decodes several utterances in one forward pass
+
+    def __init__(self, model_size: str = WHISPER_MODEL_SIZE, device: str = WHISPER_DEVICE,
+                 compute_type: str = WHISPER_COMPUTE_TYPE, warmup: bool = WHISPER_WARMUP):
+        self.model_size = model_size
+        self.device = device if device != "auto" else self._detect_device()
+        self.compute_type = self._resolve_compute_type(compute_type)
+
+        # The models are not safe to call from several threads at once
+        self._lock = threading.Lock()
+
+        self.load_seconds = 0.0
+        self.warmup_seconds = 0.0
+        self.last_audio_seconds = 0.0
+        self.last_inference_seconds = 0.0
+
+        start = time.perf_counter()
+        self._load()
+        self.load_seconds = time.perf_counter() - start
+        print(f"{self.backend} '{self.model_size}' loaded on {self.device} "
+              f"({self.compute_type}) in {self.load_seconds:.2f}s")
+
+        if warmup:
+            self.warmup()
+
+    def _detect_device(self) -> str:
+        import torch
+        return "cuda" if torch.cuda.is_available() else "cpu"
+
+    def _resolve_compute_type(self, compute_type: str) -> str:
+        raise NotImplementedError
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _run(self, audio: np.ndarray, word_timestamps: bool, options: dict):
+        raise NotImplementedError
+
+    def _run_batch(self, audios: list, options: dict) -> list:
+        raise NotImplementedError
+
+    def warmup(self):
+        """Run one dummy inference so the first real utterance is not slowed by lazy init"""
+        start = time.perf_counter()
+        self.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32))
+        self.warmup_seconds = time.perf_counter() - start
+        print(f"Whisper warmup took {self.warmup_seconds:.2f}s")
+
+    def _timed_run(self, audio: np.ndarray, word_timestamps: bool, options: dict):
+        options.setdefault("language", "en")
+        options.setdefault("temperature", 0.0)
+
+        with self._lock:
+            start = time.perf_counter()
+            result = self._run(audio, word_timestamps, options)
+            self.last_inference_seconds = time.perf_counter() - start
+        self.last_audio_seconds = len(audio) / SAMPLE_RATE
+        return result
+
+    def transcribe(self, audio: np.ndarray, **options) -> str:
+        """
+        Transcribe 16 kHz mono float32 audio and return the stripped text.
+
+        Extra keyword arguments (initial_prompt, condition_on_previous_text, ...)
+        are passed to the backend's transcribe().
+        """
+        text, _ = self._timed_run(audio, False, options)
+        return text
+
+    def transcribe_batch(self, audios: list, **options) -> list:
+        """
+        Transcribe several utterances at once (e.g. from concurrent server sessions).
+
+        Backends with batched decoding run all clips of up to MAX_BATCH_SECONDS in one
+        pass; other backends and longer clips are transcribed one by one.
+        """
+        texts = [None] * len(audios)
+        batch = [i for i, audio in enumerate(audios) if len(audio) <= MAX_BATCH_SECONDS * SAMPLE_RATE]
+        if self.supports_batch and len(batch) > 1:
+            batch_options = dict(options)
+            batch_options.setdefault("language", "en")
+            batch_options.setdefault("temperature", 0.0)
+            with self._lock:
+                start = time.perf_counter()
+                results = self._run_batch([audios[i] for i in batch], batch_options)
+                self.last_inference_seconds = time.perf_counter() - start
+            self.last_audio_seconds = sum(len(audios[i]) for i in batch) / SAMPLE_RATE
+            for i, text in zip(batch, results):
+                texts[i] = text
+        for i, audio in enumerate(audios):
+            if texts[i] is None:
+                texts[i] = self.transcribe(audio, **options)
+        return texts
+
+    def transcribe_words(self, audio: np.ndarray, **options) -> list:
+        """
+        Transcribe with word-level timestamps.
+
+        Returns a list of (start_seconds, end_seconds, word) relative to the start of audio.
+        """
+        _, words = self._timed_run(audio, True, options)
+        return words
+
+
+class OpenAIWhisperEngine(TranscriptionEngine):
+    """openai-whisper (PyTorch), the original backend"""
+
+    backend = "openai-whisper"
+    supports_batch = True
+
+    def _resolve_compute_type(self, compute_type: str) -> str:
+        if compute_type != "auto":
+            return compute_type
+        # fp16 is not supported on CPU, Whisper falls back to fp32 there anyway
+        return "float16" if self.device == "cuda" else "float32"
+
+    def _load(self):
+        import whisper
+        self.model = whisper.load_model(self.model_size, device=self.device)
+
+    def _run(self, audio, word_timestamps, options):
+        options.setdefault("fp16", self.compute_type == "float16")
+        result = self.model.transcribe(audio, word_timestamps=word_timestamps, **options)
+        words = [
+            (w["start"], w["end"], w["word"].strip())
+            for segment in result["segments"]
+            for w in segment.get("words", [])
+        ]
+        return result["text"].strip(), words
+
+    def _run_batch(self, audios, options):
+        import torch
+        import whisper
+
+        # whisper.decode takes a batch of 30 s mel windows
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), self.model.dims.n_mels, device=self.model.device)
+            for audio in audios
+        ])
+        decode_options = whisper.DecodingOptions(
+            language=options["language"],
+            temperature=options["temperature"],
+            fp16=self.compute_type == "float16",
+            without_timestamps=True,
+        )
+        return [result.text.strip() for result in whisper.decode(self.model, mels, decode_options)]
+
+
+class FasterWhisperEngine(TranscriptionEngine):
+    """faster-whisper on CTranslate2; int8 quantization makes it several times faster on CPU"""
+
+    backend = "faster-whisper"
+
+    def _detect_device(self) -> str:
+        # CTranslate2 doesn't need torch installed to find a GPU
+        import ctranslate2
+        return "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+
+    def _resolve_compute_type(self, compute_type: str) -> str:
+        if compute_type != "auto":
+            return compute_type
+        return "float16" if self.device == "cuda" else "int8"
+
+    def _load(self):
+        from faster_whisper import WhisperModel
+
+        self.model = WhisperModel(
+            self.model_size,
+            device=self.device,
+            compute_type=self.compute_type,
+            cpu_threads=WHISPER_CPU_THREADS,
+            num_workers=WHISPER_NUM_WORKERS
+        )
+        self.pipeline = None
+        if WHISPER_BATCH_SIZE > 0:
+            from faster_whisper import BatchedInferencePipeline
+            self.pipeline = BatchedInferencePipeline(model=self.model)
+
+    def _run(self, audio, word_timestamps, options):
+        options.pop("fp16", None)  # openai-whisper only
+        options.setdefault("beam_size", WHISPER_BEAM_SIZE)
+        if self.pipeline is not None:
+            # Batched decoding works on independent VAD chunks, there is no previous text
+            options.pop("condition_on_previous_text", None)
+            segments, _ = self.pipeline.transcribe(
+                audio, batch_size=WHISPER_BATCH_SIZE, word_timestamps=word_timestamps, **options
+            )
+        else:
+            segments, _ = self.model.transcribe(audio, word_timestamps=word_timestamps, **options)
+
+        # segments is a lazy generator, decoding happens while we iterate
+        texts = []
+        words = []
+        for segment in segments:
+            texts.append(segment.text)
+            for w in segment.words or []:
+                words.append((w.start, w.end, w.word.strip()))
+        return "".join(texts).strip(), words
+
+
+BACKENDS = {
+    OpenAIWhisperEngine.backend: OpenAIWhisperEngine,
+    FasterWhisperEngine.backend: FasterWhisperEngine,
+}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_transcriber(model_size: str = None, device: str = None,
+                    compute_type: str = None, backend: str = None) -> TranscriptionEngine:
+    """Get or create the shared engine for this configuration (singleton per config)"""
+    backend = backend or ASR_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown ASR_BACKEND '{backend}', expected one of {sorted(BACKENDS)}")
+
+    key = (
+        backend,
+        model_size or WHISPER_MODEL_SIZE,
+        device or WHISPER_DEVICE,
+        compute_type or WHISPER_COMPUTE_TYPE,
+    )
+    with _engines_lock:
+        if key not in _engines:
+            _engines[key] = BACKENDS[backend](*key[1:])
+        return _engines[key]
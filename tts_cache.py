@@ -0,0 +1,260 @@
+"""
+Phrase cache for synthesized speech
+Raw PCM keyed on normalized text, voice and sample rate: a byte-limited in-memory LRU
+in front of a directory of .pcm files.
+Both TTS backends go through it, so repeated phrases skip Piper or the Google API.
+"""
+import collections
+import hashlib
+import os
+import re
+import threading
+import time
+
+# ---------------- CONFIG ----------------
+CACHE_ENABLED = os.getenv("TTS_CACHE", "1") == "1"
+CACHE_DIR = os.getenv("TTS_CACHE_DIR", "tts_cache")
+MEMORY_LIMIT_BYTES = 32 * 1024 * 1024  # ~12 minutes of 22.05 kHz speech
+DISK_LIMIT_BYTES = 512 * 1024 * 1024  # least recently used files are deleted beyond this
+MAX_CACHED_CHARS = 200  # longer texts are one-off replies, not worth a cache slot
+# ---------------------------------------
+
+# Said often enough to pre-render at startup
+COMMON_PHRASES = [
+    "Goodbye! Have a great day!",
+    "Hello! How can I help you?",
+    "Sure.",
+    "Okay.",
+    "Done.",
+    "One moment.",
+    "Sorry, I didn't catch that.",
+    "Please try again.",
+    "Something went wrong. Please try again.",
+    "Email sent successfully!",
+    "No messages found.",
+]
+
+_QUOTES = str.maketrans({"‘": "'", "’": "'", "“": '"', "”": '"'})
+
+
+def normalize_text(text: str) -> str:
+    """
+    Whitespace and quote style don't change what the voice says. Case is kept: it
+    can ("US" is read as letters, "us" as a word), so it stays part of the key.
+    """
+    return re.sub(r"\s+", " ", text.translate(_QUOTES)).strip()
+
+
+def cache_key(text: str, voice: str, sample_rate: int) -> str:
+    return hashlib.sha256(f"{voice}\0{sample_rate}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class PhraseCache:
+    """
+    Two-tier audio cache. get() returns raw PCM bytes or None; put() stores them.
+
+    Disk entries survive restarts; their mtime is bumped on every hit so eviction
+    removes the least recently used files first.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, memory_limit: int = MEMORY_LIMIT_BYTES,
+                 disk_limit: int = DISK_LIMIT_BYTES):
+        self.directory = directory
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self._memory = collections.OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._disk_bytes = sum(entry.stat().st_size for entry in os.scandir(directory)
+                               if entry.name.endswith(".pcm"))
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bytes_saved = 0  # audio served from the cache instead of being synthesized
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".pcm")
+
+    def get(self, text: str, voice: str, sample_rate: int):
+        if not CACHE_ENABLED or not text or len(text) > MAX_CACHED_CHARS:
+            return None
+        key = cache_key(text, voice, sample_rate)
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                self.bytes_saved += len(audio)
+                return audio
+
+        audio = self._read_disk(key)
+        with self._lock:
+            if audio is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self.bytes_saved += len(audio)
+            self._remember(key, audio)
+        return audio
+
+    def put(self, text: str, voice: str, sample_rate: int, audio: bytes):
+        if not CACHE_ENABLED or not audio or not text or len(text) > MAX_CACHED_CHARS:
+            return
+        key = cache_key(text, voice, sample_rate)
+        with self._lock:
+            self._remember(key, audio)
+        self._write_disk(key, audio)
+
+    def get_or_synthesize(self, text: str, voice: str, sample_rate: int, synthesize):
+        """Cached audio for text, or synthesize(text) stored for next time"""
+        audio = self.get(text, voice, sample_rate)
+        if audio is None:
+            audio = synthesize(text)
+            self.put(text, voice, sample_rate, audio)
+        return audio
+
+    def prerender(self, phrases: list, voice: str, sample_rate: int, synthesize) -> int:
+        """Synthesize the phrases that aren't cached yet; returns how many were rendered"""
+        rendered = 0
+        if not CACHE_ENABLED:
+            return rendered
+        for phrase in phrases:
+            key = cache_key(phrase, voice, sample_rate)
+            if os.path.exists(self._path(key)):
+                continue
+            audio = synthesize(phrase)
+            if audio:
+                self.put(phrase, voice, sample_rate, audio)
+                rendered += 1
+        return rendered
+
+    # ---------------- tiers ----------------
+
+    def _remember(self, key: str, audio: bytes):
+        """Insert into the memory LRU (caller holds the lock)"""
+        if len(audio) > self.memory_limit:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.memory_limit:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _read_disk(self, key: str):
+        path = self._path(key)
+        try:
+            # The audio goes into the memory tier and out to the player as bytes,
+            # so one plain read is the only copy
+            with open(path, "rb") as f:
+                audio = f.read()
+            if not audio:
+                return None
+            os.utime(path)  # mark as recently used for disk eviction
+            return audio
+        except OSError:
+            return None
+
+    def _write_disk(self, key: str, audio: bytes):
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(audio)
+            os.replace(tmp, path)  # readers never see a partial file
+        except OSError as e:
+            print(f"[tts cache] could not write {path}: {e}")
+            return
+        with self._lock:
+            self._disk_bytes += len(audio)
+            over = self._disk_bytes > self.disk_limit
+        if over:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".pcm")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        total = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if total <= self.disk_limit * 0.9:  # leave some headroom so we don't evict on every put
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                total -= size
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_bytes = total
+
+    def clear(self):
+        """Drop both tiers"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".pcm"):
+                    os.remove(entry.path)
+            self._disk_bytes = 0
+
+    # ---------------- stats ----------------
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+            "bytes_saved": self.bytes_saved,
+            "memory_bytes": self._memory_bytes,
+            "memory_entries": len(self._memory),
+            "disk_bytes": self._disk_bytes,
+        }
+
+    def report(self) -> str:
+        return (f"[tts cache] {self.hits} hits / {self.misses} misses ({self.hit_rate:.0%}), "
+                f"{self.bytes_saved / 1024:.0f} KiB of audio not resynthesized")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_phrase_cache() -> PhraseCache:
+    """Get or create the shared phrase cache (singleton pattern)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PhraseCache()
+        return _cache
+
+
+def prerender_in_background(voice: str, sample_rate: int, synthesize, phrases: list = None):
+    """Pre-render COMMON_PHRASES on a daemon thread so startup doesn't wait for it"""
+    def run():
+        start = time.perf_counter()
+        rendered = get_phrase_cache().prerender(phrases or COMMON_PHRASES, voice, sample_rate, synthesize)
+        if rendered:
+            print(f"[tts cache] pre-rendered {rendered} phrases in {time.perf_counter() - start:.1f}s")
+
+    thread = threading.Thread(target=run, daemon=True, name="tts-prerender")
+    thread.start()
+    return thread